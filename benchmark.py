@@ -0,0 +1,705 @@
+"""
+Benchmarks for the update pipeline.
+
+The benchmarks work on synthetic binance.vision kline zip files (same 12-column layout as the real files),
+which are served by a local HTTP server that emulates the url scheme of https://data.binance.vision
+(with a configurable latency), so no network access is needed.
+
+benchmark_reformat() compares the original row by row reformat implementation with the vectorized and the exact one.
+benchmark_update() times every stage of an update (plan, download, reformat, concat) and the whole update,
+and reports the throughput in rows/s and MB/s and the peak memory usage (RSS).
+benchmark_parallel_reformat() compares reformating many zip files one by one and with worker processes.
+benchmark_memory() measures the peak memory usage of downloading, reformating and appending a monthly 1s file.
+benchmark_load() compares parsing a whole dataset with dataset_loader.load_dataset() after a day was appended
+(only the appended rows are parsed).
+benchmark_cold_start() measures how long `update_dataset.py -status` and `-plan` take in a fresh interpreter.
+The results can be saved as json to compare them across versions.
+The pass/fail checks (e.g., the memory ceiling, the planner regressions) are in tests/ (python -m pytest tests),
+which use the helpers of this file (the synthetic files and the stand-in server) as fixtures.
+
+Usage examples:
+python benchmark.py -rows 44640
+python benchmark.py -update -time_frame 1m -days 45 -latency 0.05 -workers 8 -json results.json
+python benchmark.py -parallel 4 -files 12
+python benchmark.py -memory
+python benchmark.py -cold_start
+python benchmark.py -load -rows 2628000
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import shutil
+import hashlib
+import argparse
+import datetime
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pandas as pd
+import fetch_data
+from fetch_data import download_files, fetch_file
+from reformat_data import reformat_binance_vision_kline_file, reformat_binance_vision_kline_files, reformat_binance_vision_kline_file_exact
+from csv_utils import concat_files
+from dataset_loader import load_dataset
+from update_dataset import plan_update, update_dataset
+from datetime_utils import time_frame_to_seconds, get_today_date
+
+
+def write_synthetic_kline_zip(zip_path: str, start_timestamp_in_s: int, interval_in_s: int, rows: int, seed: int = 0) -> None:
+    """
+    Writes a zip file with the same layout as the binance.vision spot kline zip files:
+    (open time in ms, open, high, low, close, volume, close time in ms, quote asset volume,
+     number of trades, taker buy base asset volume, taker buy quote asset volume, ignore)
+
+    Args:
+        zip_path (str): e.g., './BTCUSDT-1m-2024-02.zip' (the csv inside the zip gets the same name with '.csv')
+        start_timestamp_in_s (int): open time of the first candle
+        interval_in_s (int): e.g., 60 for '1m' candles
+        rows (int): number of candles
+        seed (int): seed of the random price walk
+    Returns:
+        None
+    """
+    rng = random.Random(seed)
+    price = 42000.0
+    csv_name = os.path.basename(zip_path).replace('.zip', '.csv')
+    # a fixed date of the zip entry, so the same data always gives the same zip file (and checksum):
+    info = ZipInfo(csv_name, date_time=(2024, 1, 1, 0, 0, 0))
+    info.compress_type = ZIP_DEFLATED
+    # the rows are written in batches, so large files (e.g., a month of 1s candles) do not need much memory:
+    with ZipFile(zip_path, 'w', ZIP_DEFLATED) as zip, zip.open(info, 'w', force_zip64=True) as csv_file:
+        lines = []
+        for i in range(rows):
+            open_time = (start_timestamp_in_s + i * interval_in_s) * 1000
+            open_price = price
+            close_price = max(1.0, open_price + rng.uniform(-25, 25))
+            high_price = max(open_price, close_price) + rng.uniform(0, 10)
+            low_price = min(open_price, close_price) - rng.uniform(0, 10)
+            volume = rng.uniform(1, 100)
+            lines.append(f'{open_time},{open_price:.8f},{high_price:.8f},{low_price:.8f},{close_price:.8f},'
+                         f'{volume:.8f},{open_time + interval_in_s * 1000 - 1},{volume * close_price:.8f},'
+                         f'{rng.randint(100, 5000)},{volume / 2:.8f},{volume * close_price / 2:.8f},0\n')
+            price = close_price
+            if len(lines) == 100_000:
+                csv_file.write(''.join(lines).encode())
+                lines = []
+        csv_file.write(''.join(lines).encode())
+
+
+def reformat_row_by_row(zip_path: str, output_path: str) -> int:
+    """
+    The original (row by row) reformat implementation of reformat_binance_vision_kline_files(),
+    kept here as the baseline of the benchmark.
+    """
+    csv_name = os.path.basename(zip_path).replace('.zip', '.csv')
+    folder_path = os.path.dirname(zip_path)
+    with ZipFile(zip_path, 'r') as zip:
+        zip.extract(csv_name, folder_path)
+    df = pd.read_csv(folder_path + '/' + csv_name, header=None)
+    os.remove(folder_path + '/' + csv_name)
+
+    df = df.drop(columns=[5, 6, 7, 8, 9, 10, 11])
+    ms_to_s = lambda x: x/1000
+    df[0] = df[0].apply(ms_to_s)
+
+    result_csv_file = open(output_path, 'a')
+    for i in range(len(df)):
+        reformated_row = str(int(df.iloc[i][0])) + ',' + str(df.iloc[i][1]) + ',' + str(df.iloc[i][2]) + ',' + str(df.iloc[i][3]) + ',' + str(df.iloc[i][4])
+        result_csv_file.write(reformated_row + '\n')
+    result_csv_file.close()
+    return len(df)
+
+
+def benchmark_reformat(rows: int) -> dict:
+    """
+    Times the row by row, the vectorized and the exact (byte level) reformat implementations on a synthetic zip file
+    of :param rows candles, checks that the row by row and the vectorized implementations produce the same output,
+    and that the exact implementation produces the same values (its text keeps the original digits of the prices,
+    e.g., '42000.00000000' instead of '42000.0', so it is compared after parsing both outputs).
+
+    Args:
+        rows (int)
+    Returns:
+        dict: {'rows', 'row_by_row_rows_per_s', 'vectorized_rows_per_s', 'speedup', 'identical_output',
+               'exact_rows_per_s', 'exact_speedup' (compared to the vectorized implementation), 'exact_identical_values'}
+    """
+    with tempfile.TemporaryDirectory() as folder_path:
+        zip_path = folder_path + '/BTCUSDT-1m-2024-02.zip'
+        write_synthetic_kline_zip(zip_path, 1706745600, 60, rows)
+
+        start = time.perf_counter()
+        reformat_row_by_row(zip_path, folder_path + '/row_by_row.csv')
+        row_by_row_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(folder_path + '/vectorized.csv', 'w') as output_file:
+            reformat_binance_vision_kline_file(zip_path, output_file)
+        vectorized_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with open(folder_path + '/exact.csv', 'w') as output_file:
+            reformat_binance_vision_kline_file_exact(zip_path, output_file)
+        exact_time = time.perf_counter() - start
+
+        with open(folder_path + '/row_by_row.csv', 'rb') as f1, open(folder_path + '/vectorized.csv', 'rb') as f2:
+            identical_output = f1.read() == f2.read()
+        dtype = {0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'}
+        exact_identical_values = pd.read_csv(folder_path + '/vectorized.csv', header=None, dtype=dtype).equals(
+            pd.read_csv(folder_path + '/exact.csv', header=None, dtype=dtype))
+
+    return {
+        'rows': rows,
+        'row_by_row_rows_per_s': rows / row_by_row_time,
+        'vectorized_rows_per_s': rows / vectorized_time,
+        'speedup': row_by_row_time / vectorized_time,
+        'identical_output': identical_output,
+        'exact_rows_per_s': rows / exact_time,
+        'exact_speedup': vectorized_time / exact_time,
+        'exact_identical_values': exact_identical_values,
+    }
+
+
+def benchmark_parallel_reformat(files: int = 12, rows: int = 44640, max_processes: int = None) -> dict:
+    """
+    Times reformat_binance_vision_kline_files() on :param files synthetic zip files of :param rows candles,
+    one file after the other and with :param max_processes worker processes. The efficiency is the speedup per
+    process that can run at the same time (1.0 is linear scaling), so runs on machines with a different number of
+    CPUs can be compared.
+
+    Args:
+        files (int)
+        rows (int): candles per file
+        max_processes (int): default: os.cpu_count()
+    Returns:
+        dict: {'benchmark', 'files', 'rows', 'max_processes', 'cpus', 'sequential_rows_per_s', 'parallel_rows_per_s',
+               'speedup', 'efficiency', 'python', 'platform', 'date'}
+    """
+    if max_processes is None:
+        max_processes = os.cpu_count()
+    with tempfile.TemporaryDirectory() as folder_path:
+        os.makedirs(folder_path + '/sequential')
+        for i in range(files):
+            write_synthetic_kline_zip(folder_path + f'/sequential/BTCUSDT-1m-{2000 + i}-01.zip',
+                                      946684800 + i * rows * 60, 60, rows, seed=i)
+        shutil.copytree(folder_path + '/sequential', folder_path + '/parallel')
+
+        start = time.perf_counter()
+        reformat_binance_vision_kline_files(folder_path + '/sequential', folder_path + '/sequential.csv')
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        reformat_binance_vision_kline_files(folder_path + '/parallel', folder_path + '/parallel.csv', max_processes)
+        parallel_time = time.perf_counter() - start
+
+    return {
+        'benchmark': 'parallel_reformat',
+        'files': files,
+        'rows': files * rows,
+        'max_processes': max_processes,
+        'cpus': os.cpu_count(),
+        'sequential_rows_per_s': files * rows / sequential_time,
+        'parallel_rows_per_s': files * rows / parallel_time,
+        'speedup': sequential_time / parallel_time,
+        'efficiency': sequential_time / parallel_time / min(max_processes, os.cpu_count(), files),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def get_peak_rss_mb():
+    """
+    Returns the peak memory usage (RSS) of the process in MB, or None if it is not available on this platform.
+    """
+    # on Linux, ru_maxrss of a child process starts at the peak of its parent, so VmHWM is used if available:
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status', 'r') as status_file:
+            for line in status_file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on Linux:
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+_url_pattern = re.compile(r'/data/spot/(daily|monthly)/klines/(\w+)/(\w+)/\w+-\w+-(\d{4})-(\d{2})(?:-(\d{2}))?\.zip$')
+
+
+def get_synthetic_zip(server, path: str):
+    """
+    Returns the synthetic zip file (bytes) of an url path of the stand-in server (see start_binance_vision_server()),
+    or None if the path is not a valid kline file or is set as missing. Generated files are kept in memory.
+    """
+    if path in server.missing:
+        return None
+    with server.lock:
+        if path in server.files:
+            return server.files[path]
+    match = _url_pattern.match(path)
+    if match is None:
+        return None
+    _, _, time_frame, yy, mm, dd = match.groups()
+    start = datetime.datetime(int(yy), int(mm), int(dd) if dd else 1, tzinfo=datetime.timezone.utc)
+    if dd:
+        end = start + datetime.timedelta(days=1)
+    else:
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    interval = time_frame_to_seconds(time_frame)
+    with tempfile.TemporaryDirectory() as folder_path:
+        zip_path = folder_path + '/' + os.path.basename(path)
+        write_synthetic_kline_zip(zip_path, int(start.timestamp()), interval,
+                                  int((end - start).total_seconds()) // interval, seed=int(start.timestamp()))
+        with open(zip_path, 'rb') as zip_file:
+            data = zip_file.read()
+    with server.lock:
+        server.files[path] = data
+    return data
+
+
+class _BinanceVisionHandler(BaseHTTPRequestHandler):
+    """
+    Serves synthetic kline zip files (and their .CHECKSUM files) under the url scheme of https://data.binance.vision:
+    /data/spot/daily/klines/<PAIR>/<TF>/<PAIR>-<TF>-<YYYY>-<MM>-<DD>.zip
+    /data/spot/monthly/klines/<PAIR>/<TF>/<PAIR>-<TF>-<YYYY>-<MM>.zip
+    """
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, send_body: bool):
+        time.sleep(self.server.latency)
+        path = self.path[:-len('.CHECKSUM')] if self.path.endswith('.CHECKSUM') else self.path
+        data = get_synthetic_zip(self.server, path)
+        if data is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.endswith('.CHECKSUM'):
+            data = (hashlib.sha256(data).hexdigest() + '  ' + os.path.basename(path) + '\n').encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if send_body:
+            with self.server.lock:
+                broken = self.server.broken.get(self.path, 0)
+                if broken > 0:
+                    self.server.broken[self.path] = broken - 1
+            if broken > 0:
+                # the connection breaks off in the middle of the file:
+                self.wfile.write(data[:len(data) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond(True)
+
+    def do_HEAD(self):
+        self._respond(False)
+
+
+def start_binance_vision_server(latency: float = 0.0, missing: list[str] = None, broken: dict = None):
+    """
+    Starts a local HTTP server (in a background thread) that emulates https://data.binance.vision with synthetic
+    kline zip files (see _BinanceVisionHandler and get_synthetic_zip()), and points fetch_data to it.
+
+    Args:
+        latency (float): seconds the server waits before every response
+        missing (list[str]): url paths that return 404 (e.g., to emulate files that are not published yet)
+        broken (dict): {url path: number of its next responses that break off in the middle of the file}
+    Returns:
+        ThreadingHTTPServer (call .shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _BinanceVisionHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.missing = set(missing or [])
+    server.broken = dict(broken or {})
+    server.files = {}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}/data/spot/'
+    fetch_data.main_url_daily = base_url + 'daily/klines/'
+    fetch_data.main_url_monthly = base_url + 'monthly/klines/'
+    return server
+
+
+def _stage_result(seconds: float, rows: int, size: int) -> dict:
+    return {
+        'seconds': seconds,
+        'rows': rows,
+        'bytes': size,
+        'rows_per_s': rows / seconds if seconds > 0 else None,
+        'mb_per_s': size / 1024 / 1024 / seconds if seconds > 0 else None,
+        'peak_rss_mb': get_peak_rss_mb(),
+    }
+
+
+def benchmark_update(time_frame: str = '1m', days: int = 45, latency: float = 0.0, max_workers: int = 8) -> dict:
+    """
+    Times the stages of an update of a synthetic dataset that is :param days days behind, against the local
+    stand-in server (see start_binance_vision_server()):
+    'plan' (plan_update()), 'download' (download_files()), 'reformat' (reformat_binance_vision_kline_file() of every
+    zip file), 'concat' (concat_files()), and 'update' (the whole update_dataset() on a fresh copy of the dataset).
+    The files are generated by the server before the timing, so the generation of the synthetic data is not timed.
+
+    Args:
+        time_frame (str): e.g., '1s'
+        days (int): number of days to update
+        latency (float): latency of the server in seconds
+        max_workers (int): number of concurrent downloads
+    Returns:
+        dict: {'benchmark', 'time_frame', 'days', 'latency', 'max_workers', 'python', 'platform', 'date',
+               'stages': {stage: {'seconds', 'rows', 'bytes', 'rows_per_s', 'mb_per_s', 'peak_rss_mb'}}}
+    """
+    server = start_binance_vision_server(latency)
+    result = {
+        'benchmark': 'update',
+        'time_frame': time_frame,
+        'days': days,
+        'latency': latency,
+        'max_workers': max_workers,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'stages': {},
+    }
+    stages = result['stages']
+    try:
+        with tempfile.TemporaryDirectory() as folder_path:
+            # a dataset whose last row is the last candle of the day :param days days before yesterday:
+            yy, mm, dd = get_today_date()
+            today = datetime.datetime(yy, mm, dd, tzinfo=datetime.timezone.utc)
+            last_timestamp = int((today - datetime.timedelta(days=days + 1)).timestamp()) - time_frame_to_seconds(time_frame)
+            dataset_path = folder_path + '/dataset.csv'
+            with open(dataset_path, 'w') as dataset_file:
+                dataset_file.write(f'{last_timestamp},42000.0,42000.0,42000.0,42000.0\n')
+            shutil.copyfile(dataset_path, folder_path + '/dataset-update.csv')
+
+            start = time.perf_counter()
+            downloads = plan_update('BTCUSDT', time_frame, dataset_path, folder_path)
+            stages['plan'] = _stage_result(time.perf_counter() - start, 0, 0)
+
+            # let the server generate all files before the timing:
+            for url, _ in downloads:
+                get_synthetic_zip(server, url.split(str(server.server_port), 1)[1])
+
+            start = time.perf_counter()
+            download_results = download_files(downloads, max_workers)
+            seconds = time.perf_counter() - start
+            if not all(download_result['ok'] for download_result in download_results):
+                raise Exception('Error: Not all files could be downloaded from the stand-in server.')
+            zip_bytes = sum(os.path.getsize(path) for _, path in downloads)
+
+            start = time.perf_counter()
+            rows = 0
+            csv_paths = []
+            for _, path in downloads:
+                csv_paths.append(path.replace('.zip', '.csv'))
+                with open(csv_paths[-1], 'w') as csv_file:
+                    rows += reformat_binance_vision_kline_file(path, csv_file)
+            stages['download'] = _stage_result(seconds, rows, zip_bytes)
+            stages['reformat'] = _stage_result(time.perf_counter() - start, rows, zip_bytes)
+
+            csv_bytes = sum(os.path.getsize(csv_path) for csv_path in csv_paths)
+            start = time.perf_counter()
+            concat_files([dataset_path] + csv_paths)
+            stages['concat'] = _stage_result(time.perf_counter() - start, rows, csv_bytes)
+
+            start = time.perf_counter()
+            update_dataset('BTCUSDT', time_frame, folder_path + '/dataset-update.csv', max_workers,
+                           folder_path=folder_path + '/output')
+            stages['update'] = _stage_result(time.perf_counter() - start, rows, zip_bytes)
+    finally:
+        server.shutdown()
+    return result
+
+
+def _measure_streaming_update(url: str, folder_path: str, chunk_rows: int) -> dict:
+    """
+    Downloads :param url, reformats it and appends it to an empty dataset, and returns the peak memory usage (RSS)
+    after the imports (baseline), after the download, and at the end. Runs in a fresh process (see benchmark_memory()),
+    so the peak memory usage of the benchmark process itself is not included.
+    """
+    baseline_rss_mb = get_peak_rss_mb()
+    zip_path = folder_path + '/' + os.path.basename(url)
+    download_result = fetch_file(url, zip_path)
+    if not download_result['ok']:
+        raise Exception(f"Error: {url} could not be downloaded from the stand-in server ({download_result['error']}).")
+    download_rss_mb = get_peak_rss_mb()
+    csv_path = zip_path.replace('.zip', '.csv')
+    with open(csv_path, 'w') as csv_file:
+        rows = reformat_binance_vision_kline_file(zip_path, csv_file, chunk_rows)
+    dataset_path = folder_path + '/dataset.csv'
+    open(dataset_path, 'w').close()
+    concat_files([dataset_path, csv_path])
+    return {
+        'rows': rows,
+        'zip_bytes': download_result['bytes'],
+        'baseline_rss_mb': baseline_rss_mb,
+        'download_rss_mb': download_rss_mb,
+        'peak_rss_mb': get_peak_rss_mb(),
+    }
+
+
+def benchmark_memory(rows: int = 2_678_400, chunk_rows: int = 250_000) -> dict:
+    """
+    Measures the peak memory usage of downloading, reformating and appending a large 1s file (by default a whole
+    month of 1s candles, about 2.6 million rows) from the local stand-in server (see start_binance_vision_server()).
+    The measurement runs in a fresh process. The memory usage of this path should not depend on the size of the file,
+    only on :param chunk_rows (see reformat_binance_vision_kline_file()) and fetch_data.download_chunk_size.
+
+    Args:
+        rows (int): number of 1s candles of the file
+        chunk_rows (int): see reformat_binance_vision_kline_file()
+    Returns:
+        dict: {'benchmark', 'rows', 'chunk_rows', 'zip_bytes', 'baseline_rss_mb', 'download_rss_mb', 'peak_rss_mb',
+               'extra_rss_mb', 'python', 'platform', 'date'}
+    """
+    server = start_binance_vision_server()
+    try:
+        with tempfile.TemporaryDirectory() as folder_path:
+            zip_path = folder_path + '/BTCUSDT-1s-2024-01.zip'
+            write_synthetic_kline_zip(zip_path, 1704067200, 1, rows)
+            with open(zip_path, 'rb') as zip_file:
+                server.files['/data/spot/monthly/klines/BTCUSDT/1s/BTCUSDT-1s-2024-01.zip'] = zip_file.read()
+            os.remove(zip_path)
+            url, _ = fetch_data.generate_url_and_file_name('BTCUSDT', '1s', 2024, 1, None)
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(_measure_streaming_update, url, folder_path, chunk_rows).result()
+    finally:
+        server.shutdown()
+
+    result['benchmark'] = 'memory'
+    result['chunk_rows'] = chunk_rows
+    result['extra_rss_mb'] = None
+    if result['peak_rss_mb'] is not None:
+        result['extra_rss_mb'] = result['peak_rss_mb'] - result['baseline_rss_mb']
+    result['python'] = platform.python_version()
+    result['platform'] = platform.platform()
+    result['date'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return result
+
+
+def write_synthetic_dataset(path: str, start_timestamp_in_s: int, rows: int, seed: int = 0) -> None:
+    """
+    Writes a synthetic reformated 1m dataset (unix in seconds, open, high, low, close).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    close = 42000 + np.cumsum(rng.normal(0, 10, rows)).round(2)
+    pd.DataFrame({0: np.arange(rows) * 60 + start_timestamp_in_s, 1: close, 2: close + 5, 3: close - 5, 4: close}) \
+        .to_csv(path, header=False, index=False)
+
+
+def benchmark_load(rows: int = 2_628_000, appended_rows: int = 1440) -> dict:
+    """
+    Compares parsing a whole dataset of :param rows 1m candles (by default 5 years) with dataset_loader.load_dataset():
+    the first load (which builds the cache), a load without new rows, and a load after :param appended_rows rows
+    (by default a day) were appended with concat_files().
+
+    Returns:
+        dict: {'benchmark', 'rows', 'appended_rows', 'dataset_mb', 'full_parse_seconds', 'first_load_seconds',
+               'unchanged_load_seconds', 'appended_load_seconds', 'python', 'platform', 'date'}
+    """
+    result = {'benchmark': 'load', 'rows': rows, 'appended_rows': appended_rows}
+    with tempfile.TemporaryDirectory() as folder_path:
+        dataset_path = folder_path + '/dataset-1m.csv'
+        write_synthetic_dataset(dataset_path, 1577836800, rows)
+        result['dataset_mb'] = os.path.getsize(dataset_path) / 1024 / 1024
+
+        start = time.perf_counter()
+        pd.read_csv(dataset_path, header=None, usecols=[0, 1, 2, 3, 4])
+        result['full_parse_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_dataset(dataset_path)
+        result['first_load_seconds'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_dataset(dataset_path)
+        result['unchanged_load_seconds'] = time.perf_counter() - start
+
+        write_synthetic_dataset(folder_path + '/new_data.csv', 1577836800 + rows * 60, appended_rows, seed=1)
+        concat_files([dataset_path, folder_path + '/new_data.csv'])
+        start = time.perf_counter()
+        load_dataset(dataset_path)
+        result['appended_load_seconds'] = time.perf_counter() - start
+    result['python'] = platform.python_version()
+    result['platform'] = platform.platform()
+    result['date'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return result
+
+
+# runs update_dataset.py like `python update_dataset.py ...` and reports the heavy modules it has imported on stderr:
+_cold_start_script = '''
+import os, sys, json, runpy
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+finally:
+    heavy_modules = [name for name in ("pandas", "numpy", "requests") if name in sys.modules]
+    sys.stderr.write("heavy_modules=" + json.dumps(heavy_modules) + "\\n")
+'''
+
+
+def write_batch_config(folder_path: str, datasets: int) -> str:
+    """
+    Writes :param datasets small 1m datasets (one row each) and a batch config of them (batch.json) into :param folder_path.
+
+    Returns:
+        str: path of the batch config
+    """
+    targets = []
+    for i in range(datasets):
+        path = f'{folder_path}/dataset-{i}.csv'
+        with open(path, 'w') as file:
+            file.write(f'{1704067200 + i * 86400},42000.0,42010.0,41990.0,42005.0\n')
+        targets.append({'asset_pair': 'BTCUSDT', 'time_frame': '1m', 'path': path})
+    with open(folder_path + '/batch.json', 'w') as config_file:
+        json.dump({'targets': targets}, config_file)
+    return folder_path + '/batch.json'
+
+
+def run_cold(arguments: list[str], cwd: str):
+    """
+    Runs :param arguments (a script and its arguments) in a fresh python process.
+
+    Returns:
+        seconds (float): wall time of the process (including the interpreter startup)
+        heavy_modules (list[str]): pandas, numpy and requests if they were imported
+    """
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', _cold_start_script] + arguments, cwd=cwd,
+                             capture_output=True, text=True)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise Exception(f'Error: {arguments} failed: {process.stderr}')
+    heavy_modules = json.loads(process.stderr.rsplit('heavy_modules=', 1)[1])
+    return seconds, heavy_modules
+
+
+def benchmark_cold_start(runs: int = 10, datasets: int = 20) -> dict:
+    """
+    Measures the cold start of `update_dataset.py -status` and `update_dataset.py -plan` for a batch of :param datasets
+    small datasets (every run is a fresh python process), and of `python -c "import pandas, requests"` as reference.
+    The heavy modules (pandas, numpy, requests) that -status and -plan imported are reported as well.
+
+    Args:
+        runs (int): number of runs of every command (the median is reported)
+        datasets (int): number of datasets in the batch config
+    Returns:
+        dict: {'benchmark', 'runs', 'datasets', 'status_seconds', 'plan_seconds', 'heavy_imports_seconds',
+               'heavy_modules', 'python', 'platform', 'date'}
+    """
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'update_dataset.py')
+    with tempfile.TemporaryDirectory() as folder_path:
+        write_batch_config(folder_path, datasets)
+        result = {'benchmark': 'cold_start', 'runs': runs, 'datasets': datasets, 'heavy_modules': {}}
+        for command in ['status', 'plan']:
+            times = []
+            for _ in range(runs):
+                seconds, heavy_modules = run_cold([script_path, '-' + command, '-batch', 'batch.json'], folder_path)
+                times.append(seconds)
+            result[command + '_seconds'] = statistics.median(times)
+            result['heavy_modules'][command] = heavy_modules
+
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'import pandas, requests'], check=True)
+            times.append(time.perf_counter() - start)
+        result['heavy_imports_seconds'] = statistics.median(times)
+
+    result['python'] = platform.python_version()
+    result['platform'] = platform.platform()
+    result['date'] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('-rows', '--rows', type=int, default=None, help="Number of candles of the synthetic zip file (default: one month of 1m candles, or of 1s candles for -memory).")
+    parser.add_argument('-update', '--benchmark_update', action="store_true", help="Benchmarks the stages of an update against a local stand-in server instead of the reformat implementations.")
+    parser.add_argument('-time_frame', '--time_frame', type=str, default='1m', help="Time frame of the synthetic dataset of -update (e.g., 1s).")
+    parser.add_argument('-days', '--days', type=int, default=45, help="Number of days that -update downloads.")
+    parser.add_argument('-latency', '--latency', type=float, default=0.0, help="Latency of the stand-in server in seconds.")
+    parser.add_argument('-workers', '--max_workers', type=int, default=8, help="Number of concurrent downloads of -update.")
+    parser.add_argument('-parallel', '--max_processes', type=int, default=None, help="Benchmarks the reformating of -files files with this many worker processes against one by one.")
+    parser.add_argument('-files', '--files', type=int, default=12, help="Number of zip files of -parallel.")
+    parser.add_argument('-memory', '--benchmark_memory', action="store_true", help="Measures the peak memory usage of downloading, reformating and appending a monthly 1s file.")
+    parser.add_argument('-chunk_rows', '--chunk_rows', type=int, default=250_000, help="Rows that -memory reformats at once.")
+    parser.add_argument('-load', '--benchmark_load', action="store_true", help="Compares parsing a whole dataset of -rows 1m candles with loading it after a day was appended.")
+    parser.add_argument('-cold_start', '--benchmark_cold_start', action="store_true", help="Measures the cold start of update_dataset.py -status and -plan.")
+    parser.add_argument('-runs', '--runs', type=int, default=10, help="Number of runs of every command of -cold_start.")
+    parser.add_argument('-json', '--json_output', type=str, default=None, help="Saves the results as json in this file.")
+
+    args = parser.parse_args()
+
+    if args.benchmark_load:
+        result = benchmark_load(args.rows if args.rows is not None else 2_628_000)
+        print(f"Rows: {result['rows']} ({result['dataset_mb']:.0f} MB), appended rows: {result['appended_rows']}")
+        print(f"Full parse: {result['full_parse_seconds']:.3f} s")
+        print(f"First load (builds the cache): {result['first_load_seconds']:.3f} s")
+        print(f"Load without new rows: {result['unchanged_load_seconds'] * 1000:.1f} ms")
+        print(f"Load after the append: {result['appended_load_seconds'] * 1000:.1f} ms")
+    elif args.benchmark_cold_start:
+        result = benchmark_cold_start(args.runs)
+        print(f"-status: {result['status_seconds']:.3f} s, -plan: {result['plan_seconds']:.3f} s "
+              f"({result['datasets']} datasets, median of {result['runs']} runs)")
+        for command in ['status', 'plan']:
+            if result['heavy_modules'][command]:
+                print(f"-{command} imported {', '.join(result['heavy_modules'][command])}")
+        print(f"import pandas, requests: {result['heavy_imports_seconds']:.3f} s")
+    elif args.benchmark_memory:
+        result = benchmark_memory(args.rows if args.rows is not None else 2_678_400, args.chunk_rows)
+        print(f"Rows: {result['rows']} ({result['zip_bytes'] / 1024 / 1024:.0f} MB zip file)")
+        if result['peak_rss_mb'] is not None:
+            print(f"Peak RSS: {result['peak_rss_mb']:.0f} MB (baseline {result['baseline_rss_mb']:.0f} MB, "
+                  f"after download {result['download_rss_mb']:.0f} MB, extra {result['extra_rss_mb']:.0f} MB)")
+    elif args.max_processes is not None:
+        result = benchmark_parallel_reformat(args.files, args.rows if args.rows is not None else 44640, args.max_processes)
+        print(f"Files: {result['files']}, rows: {result['rows']}, processes: {result['max_processes']}, CPUs: {result['cpus']}")
+        print(f"One by one: {result['sequential_rows_per_s']:.0f} rows/s")
+        print(f"Parallel: {result['parallel_rows_per_s']:.0f} rows/s")
+        print(f"Speedup: {result['speedup']:.2f}x (efficiency {result['efficiency']:.2f} per CPU)")
+    elif args.benchmark_update:
+        result = benchmark_update(args.time_frame, args.days, args.latency, args.max_workers)
+        for stage, stage_result in result['stages'].items():
+            line = f"{stage}: {stage_result['seconds']:.3f} s"
+            if stage_result['rows_per_s'] is not None and stage_result['rows'] > 0:
+                line += f", {stage_result['rows_per_s']:.0f} rows/s, {stage_result['mb_per_s']:.1f} MB/s"
+            if stage_result['peak_rss_mb'] is not None:
+                line += f", peak RSS {stage_result['peak_rss_mb']:.0f} MB"
+            print(line)
+    else:
+        result = benchmark_reformat(args.rows if args.rows is not None else 44640)
+        result['benchmark'] = 'reformat'
+        print(f"Rows: {result['rows']}")
+        print(f"Row by row: {result['row_by_row_rows_per_s']:.0f} rows/s")
+        print(f"Vectorized: {result['vectorized_rows_per_s']:.0f} rows/s")
+        print(f"Speedup: {result['speedup']:.1f}x")
+        print(f"Identical output: {result['identical_output']}")
+        print(f"Exact: {result['exact_rows_per_s']:.0f} rows/s ({result['exact_speedup']:.1f}x vectorized)")
+        print(f"Exact identical values: {result['exact_identical_values']}")
+
+    if args.json_output is not None:
+        with open(args.json_output, 'w') as json_file:
+            json.dump(result, json_file, indent=1)
@@ -0,0 +1,177 @@
+"""
+A binary columnar store for the reformated kline data (unix in seconds, open, high, low, close).
+
+A store is a folder with one file per column:
+timestamp.i8 (int64), open.f8, high.f8, low.f8, close.f8 (float64), all little-endian and fixed-width.
+Because every record has a fixed width, the files can be opened with numpy.memmap (zero-copy reads)
+and the last timestamp can be read with a single seek (no matter how large the store is).
+
+Usage example:
+import_csv_to_store('./dataset-5m.csv', './dataset-5m.bin')
+store = open_store('./dataset-5m.bin')
+store['close'][-10:]
+"""
+
+import os
+import struct
+
+columns: list[tuple[str, str]] = [('timestamp', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8')]
+
+
+def get_store_path(csv_path: str) -> str:
+    """
+    Returns the default store path of a csv dataset (e.g., './dataset-5m.csv' -> './dataset-5m.bin').
+    """
+    return os.path.splitext(csv_path)[0] + '.bin'
+
+
+def column_path(store_path: str, column: str) -> str:
+    """
+    Returns the path of the file of a column of the store (e.g., './dataset-5m.bin', 'close' -> './dataset-5m.bin/close.f8').
+    """
+    for name, dtype in columns:
+        if name == column:
+            return store_path + '/' + name + '.' + dtype[1:]
+    raise Exception(f'Error: Unknown column {column}.')
+
+
+def get_store_length(store_path: str) -> int:
+    """
+    Returns the number of records in the store.
+    The timestamp column is written last when appending, so its length defines the number of complete records.
+    """
+    return os.path.getsize(column_path(store_path, 'timestamp')) // 8
+
+
+def get_store_last_timestamp(store_path: str):
+    """
+    Reads the timestamp of the last record of the store (O(1), only the last 8 bytes are read).
+
+    Args:
+        store_path (str)
+    Returns:
+        int or None (None if the store is empty)
+    """
+    with open(column_path(store_path, 'timestamp'), 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell() - file.tell() % 8
+        if size == 0:
+            return None
+        file.seek(size - 8)
+        return struct.unpack('<q', file.read(8))[0]
+
+
+def create_store(store_path: str) -> None:
+    """
+    Creates an empty store (an existing store at :param store_path gets emptied).
+    """
+    if not os.path.exists(store_path):
+        os.mkdir(store_path)
+    for name, _ in columns:
+        open(column_path(store_path, name), 'wb').close()
+
+
+def _truncate_to_complete_records(store_path: str) -> int:
+    """
+    Truncates all column files to the number of complete records.
+    This removes the leftovers of an append that was interrupted before the timestamp column was written.
+    """
+    length = min(os.path.getsize(column_path(store_path, name)) // 8 for name, _ in columns)
+    for name, _ in columns:
+        path = column_path(store_path, name)
+        if os.path.getsize(path) != length * 8:
+            os.truncate(path, length * 8)
+    return length
+
+
+def append_csv_to_store(csv_path: str, store_path: str, chunk_rows: int = 1_000_000, merge: bool = False) -> int:
+    """
+    Appends the rows of a reformated csv file (unix in seconds, open, high, low, close) to the store.
+    The csv file is read in chunks of :param chunk_rows rows, so the memory usage does not depend on the file size.
+    If :param merge is True, only the rows that are newer than the last row of the store are appended
+    (see csv_utils.concat_files()).
+
+    Args:
+        csv_path (str)
+        store_path (str)
+        chunk_rows (int)
+        merge (bool): skip the rows that are not newer than the last row of the store
+    Returns:
+        int: number of appended rows
+    """
+    import pandas as pd
+
+    if not os.path.exists(store_path):
+        create_store(store_path)
+    _truncate_to_complete_records(store_path)
+
+    appended_rows = 0
+    if os.path.getsize(csv_path) == 0:
+        return appended_rows
+    chunks = pd.read_csv(csv_path, header=None, usecols=[0, 1, 2, 3, 4], chunksize=chunk_rows,
+                         dtype={0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'})
+    for chunk in chunks:
+        if merge:
+            last_timestamp = get_store_last_timestamp(store_path)
+            if last_timestamp is not None:
+                chunk = chunk[chunk[0] > last_timestamp]
+        appended_rows += append_rows_to_store(chunk, store_path)
+    return appended_rows
+
+
+def append_rows_to_store(df: 'pd.DataFrame', store_path: str) -> int:
+    """
+    Appends the rows of :param df (columns 0: unix in seconds, 1: open, 2: high, 3: low, 4: close) to an existing store.
+
+    Returns:
+        int: number of appended rows
+    """
+    # the timestamp column is written last (see get_store_length()):
+    for i, (name, dtype) in reversed(list(enumerate(columns))):
+        with open(column_path(store_path, name), 'ab') as file:
+            df[i].to_numpy().astype(dtype).tofile(file)
+    return len(df)
+
+
+def import_csv_to_store(csv_path: str, store_path: str) -> int:
+    """
+    Converts an existing csv dataset into a new store (an existing store at :param store_path gets replaced).
+
+    Args:
+        csv_path (str)
+        store_path (str)
+    Returns:
+        int: number of imported rows
+    """
+    create_store(store_path)
+    rows = append_csv_to_store(csv_path, store_path)
+    print(f'{rows} rows imported into {store_path}.')
+    return rows
+
+
+def open_store(store_path: str) -> dict:
+    """
+    Opens the columns of the store as read-only numpy.memmap arrays (zero-copy).
+
+    Args:
+        store_path (str)
+    Returns:
+        dict: {
+            'timestamp' = array of int64
+            'open' = array of float64
+            'high' = array of float64
+            'low' = array of float64
+            'close' = array of float64
+        }
+    """
+    import numpy as np
+
+    length = get_store_length(store_path)
+    store = {}
+    for name, dtype in columns:
+        if length == 0:
+            # numpy.memmap can not map empty files:
+            store[name] = np.empty(0, dtype=dtype)
+        else:
+            store[name] = np.memmap(column_path(store_path, name), dtype=dtype, mode='r', shape=(length,))
+    return store
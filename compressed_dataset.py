@@ -0,0 +1,268 @@
+"""
+A compressed, append-friendly format for the datasets (unix in seconds, open, high, low, close).
+
+A compressed dataset (e.g., dataset-5m.csv.gz) is a sequence of independent gzip members (frames): one frame per
+appended file of an update (a day or a month), and one frame per month when a csv dataset is converted.
+A file of several gzip members is still a normal gzip file, so the whole dataset can be read by every gzip reader
+(e.g., gzip -dc dataset-5m.csv.gz or pandas.read_csv('./dataset-5m.csv.gz')), and the rows are the exact bytes
+of the csv dataset.
+
+Next to the dataset, the frame index (e.g., dataset-5m.csv.gz.frames) has one fixed-width record per frame:
+(first timestamp, last timestamp, byte offset, compressed size, rows), all little-endian int64.
+So an append only compresses the new rows into a new frame (the history never gets recompressed), a range is read
+by decompressing only the frames that overlap it (see read_range()), and the last timestamp of the dataset is read
+from the last record of the index (no decompression).
+
+A frame is written (and fsynced) before its index record, so the index only describes complete frames. The leftovers
+of an interrupted append (a frame without a record) are truncated by recover_interrupted_frame().
+
+Usage example:
+import_csv_to_compressed('./dataset-5m.csv', './dataset-5m.csv.gz')
+update_dataset('BTCUSDT', '5m', './dataset-5m.csv.gz')
+read_range('./dataset-5m.csv.gz', 1706745600, 1706832000)
+"""
+
+import os
+import io
+import zlib
+import struct
+import datetime
+from csv_utils import find_first_row_after
+
+frame_record = struct.Struct('<qqqqq') # first timestamp, last timestamp, byte offset, compressed size, rows
+compress_level: int = 6 # zlib compression level of the frames (1: fastest, 9: smallest)
+
+
+def get_compressed_path(csv_path: str) -> str:
+    """
+    Returns the default compressed path of a csv dataset (e.g., './dataset-5m.csv' -> './dataset-5m.csv.gz').
+    """
+    return csv_path + '.gz'
+
+
+def is_compressed_dataset(dataset_path: str) -> bool:
+    """
+    Returns True if :param dataset_path is a compressed dataset (by its extension).
+    """
+    return dataset_path.endswith('.gz')
+
+
+def get_frame_index_path(compressed_path: str) -> str:
+    """
+    Returns the path of the frame index of a compressed dataset (e.g., './dataset-5m.csv.gz.frames').
+    """
+    return compressed_path + '.frames'
+
+
+def read_frame_index(compressed_path: str) -> list[dict]:
+    """
+    Reads the frame index of a compressed dataset.
+
+    Args:
+        compressed_path (str)
+    Returns:
+        [dict]: one dict per frame (in the order of the dataset): {
+            'first_timestamp' = int
+            'last_timestamp' = int
+            'offset' = int (byte offset of the gzip member)
+            'size' = int (compressed size in bytes)
+            'rows' = int
+        }
+    """
+    with open(get_frame_index_path(compressed_path), 'rb') as index_file:
+        data = index_file.read()
+    data = data[:len(data) - len(data) % frame_record.size]
+    return [{'first_timestamp': first_timestamp, 'last_timestamp': last_timestamp, 'offset': offset,
+             'size': size, 'rows': rows}
+            for first_timestamp, last_timestamp, offset, size, rows in frame_record.iter_unpack(data)]
+
+
+def get_compressed_last_timestamp(compressed_path: str):
+    """
+    Returns the last timestamp of a compressed dataset from the last record of its frame index (O(1), nothing is
+    decompressed), or None if the dataset is empty.
+    """
+    with open(get_frame_index_path(compressed_path), 'rb') as index_file:
+        size = index_file.seek(0, os.SEEK_END)
+        size -= size % frame_record.size
+        if size == 0:
+            return None
+        index_file.seek(size - frame_record.size)
+        return frame_record.unpack(index_file.read(frame_record.size))[1]
+
+
+def create_compressed(compressed_path: str) -> None:
+    """
+    Creates an empty compressed dataset (an existing dataset at :param compressed_path gets emptied).
+    """
+    open(compressed_path, 'wb').close()
+    open(get_frame_index_path(compressed_path), 'wb').close()
+
+
+def recover_interrupted_frame(compressed_path: str) -> bool:
+    """
+    Truncates the frame index to complete records and the dataset to the end of the last frame of the index.
+    This removes the leftovers of an append that was interrupted before its index record was written.
+
+    Returns:
+        bool: True if something was truncated else False.
+    """
+    index_path = get_frame_index_path(compressed_path)
+    if not os.path.exists(compressed_path) or not os.path.exists(index_path):
+        return False
+    truncated = False
+    index_size = os.path.getsize(index_path)
+    if index_size % frame_record.size != 0:
+        os.truncate(index_path, index_size - index_size % frame_record.size)
+        truncated = True
+    frames = read_frame_index(compressed_path)
+    end = frames[-1]['offset'] + frames[-1]['size'] if frames else 0
+    if os.path.getsize(compressed_path) > end:
+        os.truncate(compressed_path, end)
+        truncated = True
+    if truncated:
+        print(f'Interrupted append to {compressed_path} rolled back.')
+    return truncated
+
+
+def _last_timestamp_before(file, start: int, end: int) -> int:
+    """
+    Returns the timestamp of the last row of the opened (binary) csv :param file between the byte offsets
+    :param start and :param end (:param end is the end of a row).
+    """
+    position = end
+    tail = b''
+    while True:
+        block_start = max(start, position - 4096)
+        file.seek(block_start)
+        tail = file.read(position - block_start) + tail
+        position = block_start
+        lines = tail.rstrip(b'\r\n').rsplit(b'\n', 1)
+        if len(lines) == 2 or position == start:
+            return int(lines[-1].split(b',', 1)[0])
+
+
+def _write_frame(source, start: int, end: int, compressed_file, index_file, buffer_size: int) -> int:
+    """
+    Compresses the rows of the opened (binary) csv :param source from the byte :param start to :param end into a new
+    gzip member at the end of :param compressed_file, and appends its record to :param index_file (after the frame
+    is on the disk).
+
+    Returns:
+        int: number of rows of the frame
+    """
+    source.seek(start)
+    first_timestamp = int(source.readline().split(b',', 1)[0])
+    last_timestamp = _last_timestamp_before(source, start, end)
+
+    offset = compressed_file.seek(0, os.SEEK_END)
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, 31) # wbits 31: gzip header and trailer
+    rows = 0
+    last_byte = b''
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        block = source.read(min(buffer_size, remaining))
+        if block == b'':
+            break
+        remaining -= len(block)
+        rows += block.count(b'\n')
+        last_byte = block[-1:]
+        compressed_file.write(compressor.compress(block))
+    if last_byte != b'\n':
+        compressed_file.write(compressor.compress(b'\n'))
+        rows += 1
+    compressed_file.write(compressor.flush())
+    compressed_file.flush()
+    os.fsync(compressed_file.fileno())
+
+    index_file.write(frame_record.pack(first_timestamp, last_timestamp, offset, compressed_file.tell() - offset, rows))
+    index_file.flush()
+    os.fsync(index_file.fileno())
+    return rows
+
+
+def append_csv_to_compressed(csv_path: str, compressed_path: str, merge: bool = False,
+                             buffer_size: int = 1024 * 1024) -> int:
+    """
+    Appends the rows of a reformated csv file (e.g., the data of one downloaded file) to a compressed dataset
+    as a single new frame. The file is compressed in blocks of :param buffer_size bytes, so the memory usage does not
+    depend on the file size. If the dataset does not exist, it is created.
+    If :param merge is True, only the rows that are newer than the last row of the dataset are appended
+    (see csv_utils.concat_files()), so appending a file again does nothing.
+
+    Args:
+        csv_path (str)
+        compressed_path (str)
+        merge (bool): skip the rows that are not newer than the last row of the dataset
+        buffer_size (int)
+    Returns:
+        int: number of appended rows
+    """
+    if not os.path.exists(compressed_path) or not os.path.exists(get_frame_index_path(compressed_path)):
+        create_compressed(compressed_path)
+    recover_interrupted_frame(compressed_path)
+    last_timestamp = get_compressed_last_timestamp(compressed_path) if merge else None
+
+    with open(csv_path, 'rb') as source:
+        start = find_first_row_after(source, last_timestamp) if last_timestamp is not None else 0
+        end = source.seek(0, os.SEEK_END)
+        if start == end:
+            return 0
+        with open(compressed_path, 'ab') as compressed_file, open(get_frame_index_path(compressed_path), 'ab') as index_file:
+            return _write_frame(source, start, end, compressed_file, index_file, buffer_size)
+
+
+def import_csv_to_compressed(csv_path: str, compressed_path: str, buffer_size: int = 1024 * 1024) -> int:
+    """
+    Converts a csv dataset into a compressed dataset with one frame per month (UTC). The month boundaries are found
+    with a binary search (see csv_utils.find_first_row_after()), so the csv file is only read once, in blocks.
+
+    Returns:
+        int: number of imported rows
+    """
+    create_compressed(compressed_path)
+    rows = 0
+    with open(csv_path, 'rb') as source, open(compressed_path, 'ab') as compressed_file, \
+            open(get_frame_index_path(compressed_path), 'ab') as index_file:
+        size = source.seek(0, os.SEEK_END)
+        start = 0
+        while start < size:
+            source.seek(start)
+            timestamp = int(source.readline().split(b',', 1)[0])
+            date = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+            next_month = datetime.datetime(date.year + date.month // 12, date.month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+            end = find_first_row_after(source, int(next_month.timestamp()) - 1)
+            rows += _write_frame(source, start, end, compressed_file, index_file, buffer_size)
+            start = end
+    print(f'{rows} rows imported into {compressed_path}.')
+    return rows
+
+
+def read_range(compressed_path: str, start_timestamp: int, end_timestamp: int):
+    """
+    Reads the rows from :param start_timestamp to :param end_timestamp (including both) of a compressed dataset.
+    Only the frames that overlap the range are read and decompressed.
+
+    Args:
+        compressed_path (str)
+        start_timestamp (int): unix in seconds
+        end_timestamp (int): unix in seconds
+    Returns:
+        pd.DataFrame (columns 0: unix in seconds, 1: open, 2: high, 3: low, 4: close)
+    """
+    import pandas as pd
+
+    data = []
+    with open(compressed_path, 'rb') as compressed_file:
+        for frame in read_frame_index(compressed_path):
+            if frame['last_timestamp'] < start_timestamp or frame['first_timestamp'] > end_timestamp:
+                continue
+            compressed_file.seek(frame['offset'])
+            data.append(zlib.decompress(compressed_file.read(frame['size']), 31))
+    dtype = {0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'}
+    if not data:
+        # no frame overlaps the range (e.g., it is before the first row or in a gap):
+        return pd.DataFrame({column: pd.Series(dtype=column_dtype) for column, column_dtype in dtype.items()})
+    df = pd.read_csv(io.BytesIO(b''.join(data)), header=None, usecols=[0, 1, 2, 3, 4], dtype=dtype)
+    return df[(df[0] >= start_timestamp) & (df[0] <= end_timestamp)].reset_index(drop=True)
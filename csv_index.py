@@ -0,0 +1,162 @@
+"""
+A sparse sidecar index for the csv datasets (unix in seconds, open, high, low, close).
+
+The index of './dataset-5m.csv' is stored in './dataset-5m.csv.idx'. Its first line is the index step N,
+every other line is 'row,timestamp,byte offset' of every N-th row of the dataset (starting with row 0).
+With the index, range queries only have to read the rows between two index entries plus the requested rows,
+instead of scanning the whole dataset.
+
+Usage example:
+build_index('./dataset-5m.csv')
+for line in read_range('./dataset-5m.csv', 1706745600, 1706832000):
+    print(line)
+"""
+
+import os
+import bisect
+
+default_index_step: int = 1000
+
+
+def get_index_path(file_path: str) -> str:
+    """
+    Returns the path of the index of a csv file (e.g., './dataset-5m.csv' -> './dataset-5m.csv.idx').
+    """
+    return file_path + '.idx'
+
+
+def _load_index(file_path: str):
+    """
+    Loads the index of a csv file.
+
+    Returns:
+        step (int)
+        entries (list[tuple[int, int, int]]): list of (row, timestamp, byte offset)
+    """
+    with open(get_index_path(file_path), 'r') as index_file:
+        step = int(index_file.readline())
+        entries = []
+        for line in index_file:
+            row, timestamp, offset = line.split(',')
+            entries.append((int(row), int(timestamp), int(offset)))
+    return step, entries
+
+
+def _scan(file, row: int, offset: int, step: int, entries: list) -> None:
+    """
+    Reads :param file from :param offset (the beginning of row number :param row) until its end,
+    and adds an entry for every complete row whose row number is a multiple of :param step. Blank lines are skipped.
+    """
+    file.seek(offset)
+    for line in file:
+        if not line.endswith(b'\n'):
+            break # an incomplete last row is not indexed
+        if line.strip() == b'':
+            offset += len(line)
+            continue
+        if row % step == 0 and (not entries or entries[-1][0] < row):
+            entries.append((row, int(line.split(b',', 1)[0]), offset))
+        row += 1
+        offset += len(line)
+
+
+def _write_index(file_path: str, step: int, entries: list) -> None:
+    index_path = get_index_path(file_path)
+    with open(index_path + '.tmp', 'w') as index_file:
+        index_file.write(str(step) + '\n')
+        for row, timestamp, offset in entries:
+            index_file.write(f'{row},{timestamp},{offset}\n')
+    os.replace(index_path + '.tmp', index_path)
+
+
+def build_index(file_path: str, step: int = default_index_step) -> None:
+    """
+    Builds (or rebuilds) the index of a csv file with an entry for every :param step-th row.
+
+    Args:
+        file_path (str)
+        step (int)
+    Returns:
+        None
+    """
+    entries = []
+    with open(file_path, 'rb') as file:
+        _scan(file, 0, 0, step, entries)
+    _write_index(file_path, step, entries)
+
+
+def update_index(file_path: str) -> None:
+    """
+    Updates the index of a csv file after new rows were appended to the file.
+    Only the rows after the last index entry are read. If the index does not exist, or does not match the file
+    anymore (e.g., because the file was truncated or rewritten), the index gets rebuilt.
+
+    Args:
+        file_path (str)
+    Returns:
+        None
+    """
+    if not os.path.exists(get_index_path(file_path)):
+        build_index(file_path)
+        return
+    step, entries = _load_index(file_path)
+    if not entries:
+        build_index(file_path, step)
+        return
+
+    row, timestamp, offset = entries[-1]
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        line = file.readline()
+        if not line.endswith(b'\n') or int(line.split(b',', 1)[0]) != timestamp:
+            build_index(file_path, step)
+            return
+        _scan(file, row, offset, step, entries)
+    _write_index(file_path, step, entries)
+
+
+def find_offset(file_path: str, timestamp: int) -> int:
+    """
+    Returns the byte offset of the last index entry with a timestamp < :param timestamp (0 if there is none).
+    Reading the file from this offset reaches all rows with a timestamp >= :param timestamp after at most one index step.
+    The index gets built first if it does not exist.
+
+    Args:
+        file_path (str)
+        timestamp (int): unix in seconds
+    Returns:
+        int
+    """
+    if not os.path.exists(get_index_path(file_path)):
+        build_index(file_path)
+    _, entries = _load_index(file_path)
+
+    # rows with the same timestamp can be before an entry, so the entry before the first match is used:
+    i = bisect.bisect_left([entry[1] for entry in entries], timestamp) - 1
+    return entries[i][2] if i >= 0 else 0
+
+
+def read_range(file_path: str, start_timestamp: int, end_timestamp: int):
+    """
+    Streams the rows of a csv file with start_timestamp <= timestamp <= end_timestamp (the rows must be sorted by timestamp).
+    The file reader jumps directly to the last index entry before :param start_timestamp (see find_offset()),
+    so only a few rows before the requested range are read. Blank lines (e.g., a second newline at the end) are skipped.
+
+    Args:
+        file_path (str)
+        start_timestamp (int): unix in seconds
+        end_timestamp (int): unix in seconds
+    Returns:
+        generator of str (the rows, including the '\\n' at the end)
+    """
+    offset = find_offset(file_path, start_timestamp)
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        for line in file:
+            if line.strip() == b'':
+                continue
+            timestamp = int(line.split(b',', 1)[0])
+            if timestamp > end_timestamp:
+                break
+            if timestamp >= start_timestamp:
+                yield line.decode()
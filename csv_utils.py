@@ -1,5 +1,9 @@
 import os
-import pandas as pd
+import zlib
+import shutil
+from csv_index import get_index_path, update_index
+from dataset_lock import commit_length
+from metrics import timed
 
 def get_lastline(file_path: str) -> str:
     """
@@ -30,34 +34,209 @@ def get_lastline(file_path: str) -> str:
     return last_line
 
 
-def concat_files(files: list[str]) -> None:
+def get_append_marker_path(file_path: str) -> str:
+    """
+    Returns the path of the marker file that records the original length of :param file_path while data gets appended to it.
+    """
+    return file_path + '.appending'
+
+
+def recover_interrupted_append(file_path: str) -> bool:
+    """
+    If a previous append to :param file_path was interrupted (e.g., the process was killed), the marker file
+    written by concat_files() still exists. In this case the file is truncated back to its original length.
+
+    Args:
+        file_path (str)
+    Returns:
+        bool: True if the file was truncated else False.
+    """
+    marker_path = get_append_marker_path(file_path)
+    if not os.path.exists(marker_path):
+        return False
+    with open(marker_path, 'r') as marker:
+        original_size = int(marker.read())
+    with open(file_path, 'r+b') as file:
+        file.truncate(original_size)
+        os.fsync(file.fileno())
+    os.remove(marker_path)
+    print(f'Interrupted append to {file_path} rolled back.')
+    return True
+
+
+def copy_file(source, destination, buffer_size: int, start: int = 0) -> None:
+    """
+    Copies the content of the opened :param source file (from the byte :param start on) to the end of the opened
+    :param destination file.
+    os.sendfile() copies the data inside the kernel (zero-copy), if it is not available a buffered copy with a
+    buffer of :param buffer_size bytes is used. Either way the memory usage does not depend on the file size.
+
+    Args:
+        source (file object): opened in binary mode for reading
+        destination (file object): opened in binary mode for writing
+        buffer_size (int)
+        start (int): byte offset in :param source
+    Returns:
+        None
+    """
+    destination.flush()
+    if hasattr(os, 'sendfile'):
+        try:
+            offset = start
+            while True:
+                sent = os.sendfile(destination.fileno(), source.fileno(), offset, buffer_size)
+                if sent == 0:
+                    destination.seek(0, os.SEEK_END) # sync the position of the file object with the file descriptor
+                    return
+                offset += sent
+        except OSError:
+            if offset != start:
+                raise
+    source.seek(start)
+    shutil.copyfileobj(source, destination, buffer_size)
+
+
+def _ends_with_newline(file) -> bool:
+    """
+    Checks if the opened (binary) :param file ends with '\n'. Empty files count as ending with a newline.
+    """
+    size = file.seek(0, os.SEEK_END)
+    if size == 0:
+        return True
+    file.seek(-1, os.SEEK_END)
+    return file.read(1) == b'\n'
+
+
+def _get_timestamp(line: bytes):
+    """
+    Returns the timestamp (first field) of a csv line, or None if the line is empty.
+    """
+    line = line.strip()
+    return int(line.split(b',', 1)[0]) if line != b'' else None
+
+
+def find_first_row_after(file, timestamp: int) -> int:
+    """
+    Finds the first row of the opened (binary) csv :param file, whose timestamp is larger than :param timestamp,
+    with a binary search over the byte offsets of the file (the rows must be sorted by timestamp). Only about
+    2 * log2(file size) lines are read, so this is cheap even for very large files.
+
+    Args:
+        file: file object opened in binary mode
+        timestamp (int)
+    Returns:
+        int: byte offset of the row (the size of the file if all rows are older or equal)
+    """
+    def first_line_from(position: int):
+        # returns the offset and the timestamp of the first line that starts at or after :param position:
+        if position == 0:
+            file.seek(0)
+        else:
+            file.seek(position - 1)
+            file.readline() # skips the rest of the line that contains the byte position - 1
+        while True:
+            offset = file.tell()
+            line = file.readline()
+            if line == b'':
+                return offset, None
+            line_timestamp = _get_timestamp(line)
+            if line_timestamp is not None:
+                return offset, line_timestamp
+
+    low, high = 0, file.seek(0, os.SEEK_END)
+    while low < high:
+        middle = (low + high) // 2
+        _, line_timestamp = first_line_from(middle)
+        if line_timestamp is None or line_timestamp > timestamp:
+            high = middle
+        else:
+            low = middle + 1
+    return first_line_from(low)[0]
+
+
+def get_prefix_checksum(file, length: int, sample_bytes: int = 4096) -> int:
+    """
+    Returns the crc32 of the first and the last :param sample_bytes bytes of the first :param length bytes of the
+    opened (binary) :param file. Derived data (e.g., a cache or a feature store) keeps it to notice if the rows it was
+    built from were changed (only the sampled bytes are read, so this is cheap even for very large files).
+    """
+    file.seek(0)
+    checksum = zlib.crc32(file.read(min(length, sample_bytes)))
+    file.seek(max(0, length - sample_bytes))
+    return zlib.crc32(file.read(length - file.tell()), checksum)
+
+
+def concat_files(files: list[str], buffer_size: int = 1024 * 1024, merge: bool = False) -> None:
     """
     This function concatenates csv files together.
     All files (except the first file) will get concatenated to the first file of the :param files list.
     The order of the concatenation is as the order of the paths of the files in the :param files list.
     E.g., files = [f1.csv, f2.csv, f3.csv] --> concat_files(files) --> f1.csv = f1.csv + f2.csv + f3.csv 
+    If the first file has an index (see csv_index.py), the index gets updated with the appended rows.
+
+    The files are streamed into the first file (see copy_file()), so the memory usage is constant.
+    The append is crash-safe: the original length of the first file is recorded in a marker file before appending,
+    and the data is fsynced after appending. If the append fails, the first file is truncated back to its original
+    length. If the process dies during the append, the next call (or recover_interrupted_append()) truncates it back.
+    So the first file either contains all of the appended rows or none of them, and never ends with a torn line.
+    After a successful append, the new length of the first file is recorded as its committed length, so readers of
+    a snapshot (see dataset_lock.open_snapshot()) see the appended rows only when they are complete.
+    The caller should hold the writer lock of the first file (see dataset_lock.writer_lock()).
+    If :param merge is True, only the rows that are newer than the last row of the first file are appended
+    (the first newer row of every file is found with find_first_row_after()). So appending data that overlaps with
+    the end of the first file (e.g., a day that is already partly in the dataset) does not create duplicated or
+    out-of-order rows, and appending data that is already in the first file does nothing.
+    Every call emits an 'append' metrics record (see metrics.py).
 
     Args:
-        files (list[str]): list of the paths of the input csv files
+        files (list[str]): list of the paths of the input csv files (all sorted by timestamp if :param merge is True)
+        buffer_size (int): size of the copy buffer in bytes
+        merge (bool): skip the rows that are not newer than the last row of the first file
     Returns:
         None
     """
-    add_newline = False
-    first_file_last_line = get_lastline(files[0])
-    if list(first_file_last_line)[-1] != '\n':
-        add_newline = True
-
-    first_file = open(files[0], 'a')
-    if add_newline:
-        first_file.write('\n')
-
-    for i in range(1, len(files)):
-        file = open(files[i], 'r')
-        file_lines = file.readlines()
-        for line in file_lines:
-            first_file.write(line)
-        file.close()
-    first_file.close()
+    recover_interrupted_append(files[0])
+    marker_path = get_append_marker_path(files[0])
+
+    with timed('append', path=files[0], files=len(files) - 1) as metrics, open(files[0], 'r+b') as first_file:
+        original_size = first_file.seek(0, os.SEEK_END)
+        with open(marker_path + '.tmp', 'w') as marker:
+            marker.write(str(original_size))
+            marker.flush()
+            os.fsync(marker.fileno())
+        os.replace(marker_path + '.tmp', marker_path)
+
+        try:
+            add_newline = not _ends_with_newline(first_file)
+            last_timestamp = _get_timestamp(get_lastline(files[0]).encode()) if merge else None
+            first_file.seek(0, os.SEEK_END)
+            for i in range(1, len(files)):
+                with open(files[i], 'rb') as file:
+                    start = find_first_row_after(file, last_timestamp) if last_timestamp is not None else 0
+                    if start == file.seek(0, os.SEEK_END):
+                        continue # nothing new in this file
+                    if add_newline:
+                        first_file.write(b'\n')
+                    copy_file(file, first_file, buffer_size, start)
+                    add_newline = not _ends_with_newline(file)
+                    if merge:
+                        last_timestamp = _get_timestamp(get_lastline(files[i]).encode())
+            if add_newline:
+                first_file.write(b'\n')
+            first_file.flush()
+            os.fsync(first_file.fileno())
+            metrics['bytes'] = first_file.tell() - original_size
+        except BaseException:
+            first_file.truncate(original_size)
+            first_file.flush()
+            os.fsync(first_file.fileno())
+            os.remove(marker_path)
+            raise
+    os.remove(marker_path)
+    commit_length(files[0])
+
+    if os.path.exists(get_index_path(files[0])):
+        update_index(files[0])
     
     print('Files appended together.')
 
@@ -0,0 +1,176 @@
+"""
+A fast loader for the datasets (unix in seconds, open, high, low, close) that only parses the appended rows.
+
+The first load of a dataset parses the whole csv file into a cache next to it (e.g., dataset-5m.parsed), a binary
+store with one fixed-width file per column (see binary_store.py). The cache remembers which file it was parsed from
+(device and inode) and how many bytes of it were parsed. Because the updates only ever append to a dataset
+(see csv_utils.concat_files()), the next load only parses the bytes after this length and appends their rows to the
+cache, and then returns the columns as numpy memmaps. So loading a large dataset after a daily update parses a day
+of rows instead of the whole file.
+
+The cache is rebuilt from scratch if the parsed prefix of the dataset changed: if the dataset was replaced
+(e.g., by a repair, which writes a new file), got shorter, or if a sample of the parsed bytes (the first and the
+last 4096 bytes of the prefix) differs from the sample taken when they were parsed.
+The dataset is read as a consistent snapshot (see dataset_lock.open_snapshot()), so a load during an update never
+parses a partial row, and loads of the same dataset are serialized with a lock on the cache.
+
+Usage example:
+data = load_dataset('./dataset-5m.csv')
+data['close'][-10:]
+df = load_dataset('./dataset-5m.csv', as_dataframe=True)
+"""
+
+import os
+import json
+import shutil
+from binary_store import create_store, append_rows_to_store, open_store, get_store_length, columns, column_path
+from dataset_lock import writer_lock, open_snapshot
+from csv_utils import get_prefix_checksum
+
+prefix_sample_bytes: int = 4096 # bytes at the beginning and at the end of the parsed prefix that are compared
+
+
+def get_cache_path(csv_path: str) -> str:
+    """
+    Returns the default cache path of a csv dataset (e.g., './dataset-5m.csv' -> './dataset-5m.parsed').
+    """
+    return os.path.splitext(csv_path)[0] + '.parsed'
+
+
+def _load_state(cache_path: str):
+    state_path = cache_path + '/state.json'
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r') as state_file:
+        return json.load(state_file)
+
+
+def _save_state(cache_path: str, state: dict) -> None:
+    # written atomically after the columns, so the state never describes rows that are not written completely:
+    state_path = cache_path + '/state.json'
+    with open(state_path + '.tmp', 'w') as state_file:
+        json.dump(state, state_file)
+        state_file.flush()
+        os.fsync(state_file.fileno())
+    os.replace(state_path + '.tmp', state_path)
+
+
+def _is_prefix_unchanged(state: dict, stat: os.stat_result, snapshot, length: int, cache_path: str) -> bool:
+    """
+    Returns True if the bytes of the dataset that were parsed into the cache are still the same (see the module
+    docstring) and the cache has all of their rows, so only the bytes after them have to be parsed.
+    """
+    if state['device'] != stat.st_dev or state['inode'] != stat.st_ino or state['parsed_bytes'] > length:
+        return False
+    if get_store_length(cache_path) < state['rows']:
+        return False
+    if state['parsed_bytes'] == 0:
+        return True
+    snapshot.seek(state['parsed_bytes'] - 1)
+    if snapshot.read(1) != b'\n':
+        return False
+    return get_prefix_checksum(snapshot, state['parsed_bytes'], prefix_sample_bytes) == state['prefix_checksum']
+
+
+def _parse_into_cache(snapshot, length: int, cache_path: str, state: dict, chunk_rows: int) -> int:
+    """
+    Parses the bytes of the opened snapshot from state['parsed_bytes'] to :param length, appends their rows to the
+    cache and updates its state (after every chunk of :param chunk_rows rows).
+
+    Returns:
+        int: number of parsed rows
+    """
+    import pandas as pd
+
+    parsed_rows = 0
+    if length > state['parsed_bytes']:
+        snapshot.seek(state['parsed_bytes'])
+        chunks = pd.read_csv(snapshot, header=None, usecols=[0, 1, 2, 3, 4], chunksize=chunk_rows,
+                             dtype={0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'})
+        for chunk in chunks:
+            parsed_rows += append_rows_to_store(chunk, cache_path)
+            state['rows'] += len(chunk)
+            _save_state(cache_path, state)
+    state['parsed_bytes'] = length
+    state['prefix_checksum'] = get_prefix_checksum(snapshot, length, prefix_sample_bytes)
+    _save_state(cache_path, state)
+    return parsed_rows
+
+
+def update_cache(csv_path: str, cache_path: str = None, chunk_rows: int = 1_000_000) -> int:
+    """
+    Brings the cache of a dataset up to date: parses only the bytes that were appended to the dataset since the last
+    load, or rebuilds the cache from the whole dataset if it does not exist or the parsed prefix changed.
+    A rebuild is written into a new folder that replaces the old cache, so the memmaps of earlier loads stay valid.
+
+    Args:
+        csv_path (str)
+        cache_path (str): default: get_cache_path(:param csv_path)
+        chunk_rows (int)
+    Returns:
+        int: number of parsed rows
+    """
+    if cache_path is None:
+        cache_path = get_cache_path(csv_path)
+    if csv_path.endswith('.gz'):
+        raise Exception(f'Error: {csv_path} is a compressed dataset, use compressed_dataset.read_range() to read it.')
+    if not os.path.exists(csv_path):
+        raise Exception(f'Error: {csv_path} does not exist.')
+
+    os.makedirs(cache_path, exist_ok=True) # the lock of the cache needs an existing cache (see dataset_lock.writer_lock())
+    with writer_lock(cache_path), open_snapshot(csv_path) as snapshot:
+        length = snapshot.seek(0, os.SEEK_END)
+        stat = os.fstat(snapshot.fileno())
+        state = _load_state(cache_path)
+        if state is not None and _is_prefix_unchanged(state, stat, snapshot, length, cache_path):
+            # an interrupted load can leave rows that are not in the state yet, they are parsed again:
+            for name, _ in columns:
+                with open(column_path(cache_path, name), 'r+b') as file:
+                    file.truncate(state['rows'] * 8)
+            return _parse_into_cache(snapshot, length, cache_path, state, chunk_rows)
+
+        if state is not None:
+            print(f'The parsed prefix of {csv_path} changed, rebuilding {cache_path}.')
+        new_cache_path = cache_path + '.tmp'
+        for leftover_path in [new_cache_path, cache_path + '.old']: # leftovers of an interrupted rebuild
+            if os.path.exists(leftover_path):
+                shutil.rmtree(leftover_path)
+        create_store(new_cache_path)
+        state = {'device': stat.st_dev, 'inode': stat.st_ino, 'parsed_bytes': 0, 'rows': 0, 'prefix_checksum': 0}
+        parsed_rows = _parse_into_cache(snapshot, length, new_cache_path, state, chunk_rows)
+        if os.path.exists(cache_path):
+            os.replace(cache_path, cache_path + '.old')
+        os.replace(new_cache_path, cache_path)
+        if os.path.exists(cache_path + '.old'):
+            shutil.rmtree(cache_path + '.old')
+        return parsed_rows
+
+
+def load_dataset(csv_path: str, as_dataframe: bool = False, cache_path: str = None, chunk_rows: int = 1_000_000):
+    """
+    Loads a dataset (see update_cache()): the arrays are memmaps of the cache (zero-copy), so after an update only
+    the appended rows are parsed. A DataFrame is a copy of the arrays.
+
+    Args:
+        csv_path (str)
+        as_dataframe (bool): return a pd.DataFrame (columns 0: unix in seconds, 1: open, 2: high, 3: low, 4: close)
+                             instead of the arrays
+        cache_path (str): default: get_cache_path(:param csv_path)
+        chunk_rows (int)
+    Returns:
+        dict: {
+            'timestamp' = array of int64
+            'open' = array of float64
+            'high' = array of float64
+            'low' = array of float64
+            'close' = array of float64
+        } or pd.DataFrame
+    """
+    if cache_path is None:
+        cache_path = get_cache_path(csv_path)
+    update_cache(csv_path, cache_path, chunk_rows)
+    data = open_store(cache_path)
+    if as_dataframe:
+        import pandas as pd
+        return pd.DataFrame({i: data[name] for i, (name, _) in enumerate(columns)})
+    return data
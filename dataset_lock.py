@@ -0,0 +1,180 @@
+"""
+Coordination of the processes that update and read a dataset.
+
+Writers: An update (or a repair) of a dataset holds an exclusive lock on its lock file (e.g., dataset-5m.csv.lock),
+so only one process appends to a dataset at a time. A second updater of the same dataset fails immediately instead of
+appending at the same time. The lock is taken with fcntl.flock() (msvcrt.locking() on Windows), so the operating
+system releases it when the process dies, and a crashed updater never leaves a stale lock behind.
+
+Readers never take the lock. After every successful append (and after a dataset was rewritten, e.g., by a repair),
+the writer records the committed length of the dataset (e.g., in dataset-5m.csv.committed). Readers read the dataset
+only up to this length (see open_snapshot()), so they never wait for the writer, and they see the rows of the last
+complete append, but never a partial row or the rows of an append that is still running (or gets rolled back).
+
+Usage example:
+with writer_lock('./dataset-5m.csv', blocking=False):
+    concat_files(['./dataset-5m.csv', './new_data.csv'])
+
+with open_snapshot('./dataset-5m.csv') as snapshot:
+    df = pd.read_csv(snapshot, header=None)
+"""
+
+import io
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+
+def get_lock_path(dataset_path: str) -> str:
+    """
+    Returns the path of the lock file of a dataset (e.g., './dataset-5m.csv' -> './dataset-5m.csv.lock').
+    """
+    return dataset_path + '.lock'
+
+
+def get_committed_path(dataset_path: str) -> str:
+    """
+    Returns the path of the file that records the committed length of a dataset (e.g., './dataset-5m.csv.committed').
+    """
+    return dataset_path + '.committed'
+
+
+@contextmanager
+def writer_lock(dataset_path: str, blocking: bool = True):
+    """
+    Holds the exclusive writer lock of a dataset during a with-block.
+    The dataset has to exist, so a mistyped path (or a failed update of a dataset that does not exist) does not leave
+    a lock file behind.
+
+    Args:
+        dataset_path (str)
+        blocking (bool): wait until the lock is free (True), or raise an exception if another process holds it (False)
+    """
+    if not os.path.exists(dataset_path):
+        raise Exception(f'Error: {dataset_path} does not exist.')
+    lock_file = open(get_lock_path(dataset_path), 'a+b')
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise Exception(f'Error: {dataset_path} is being updated by another process.')
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        lock_file.close()
+
+
+def commit_length(dataset_path: str) -> int:
+    """
+    Records the current length of the dataset as its committed length (together with the inode of the file, so a
+    record of a file that was replaced afterwards is not used). Called by the writer after every successful append.
+
+    Returns:
+        int: the committed length in bytes
+    """
+    stat = os.stat(dataset_path)
+    committed_path = get_committed_path(dataset_path)
+    with open(committed_path + '.tmp', 'w') as committed_file:
+        committed_file.write(f'{stat.st_size} {stat.st_ino}')
+        committed_file.flush()
+        os.fsync(committed_file.fileno())
+    os.replace(committed_path + '.tmp', committed_path)
+    return stat.st_size
+
+
+def get_snapshot_length(dataset_path: str, file) -> int:
+    """
+    Returns the length of the consistent snapshot of the opened (binary) dataset :param file: the committed length,
+    or, if there is no record for this file (e.g., it was never appended to by concat_files()), the length up to the
+    end of its last complete row.
+    """
+    stat = os.fstat(file.fileno())
+    try:
+        with open(get_committed_path(dataset_path), 'r') as committed_file:
+            length, inode = (int(value) for value in committed_file.read().split())
+        if inode == stat.st_ino and length <= stat.st_size:
+            return length
+    except (OSError, ValueError):
+        pass
+    # no usable record, the last row is only used if it is complete:
+    position = stat.st_size
+    while position > 0:
+        block_start = max(0, position - 4096)
+        file.seek(block_start)
+        newline = file.read(position - block_start).rfind(b'\n')
+        if newline != -1:
+            return block_start + newline + 1
+        position = block_start
+    return 0
+
+
+class _SnapshotFile(io.RawIOBase):
+    """
+    A read-only binary file that ends at the snapshot length (see open_snapshot()).
+    """
+    def __init__(self, file, length: int):
+        self._file = file
+        self._length = length
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        remaining = self._length - self._file.tell()
+        if remaining <= 0:
+            return 0
+        return self._file.readinto(memoryview(buffer)[:remaining])
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_END:
+            return self._file.seek(self._length + offset)
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def open_snapshot(dataset_path: str):
+    """
+    Opens a consistent snapshot of a dataset without taking any lock: a read-only binary file that ends at the
+    committed length (see get_snapshot_length()), even if a writer appends to the dataset while it is read.
+    Wrap it in io.TextIOWrapper() for reading text.
+
+    Args:
+        dataset_path (str)
+    Returns:
+        io.BufferedReader
+    """
+    file = open(dataset_path, 'rb', buffering=0)
+    try:
+        length = get_snapshot_length(dataset_path, file)
+        file.seek(0)
+    except BaseException:
+        file.close()
+        raise
+    return io.BufferedReader(_SnapshotFile(file, length))
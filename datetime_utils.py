@@ -117,3 +117,20 @@ def get_last_day_of_month(yy: int, mm: int):
         dt = datetime.datetime(year=yy, month=mm+1, day=1)
     # return the previuos date as the last day of the current month:
     return get_previous_day_date(dt.year, dt.month, dt.day)
+
+
+def time_frame_to_seconds(time_frame: str) -> int:
+    """
+    Converts a binance time frame to its length in seconds.
+    Code example of how to use this function:
+    seconds = time_frame_to_seconds('5m') # 300
+
+    Args:
+        time_frame (str): e.g., '1s', '5m', '4h', '1d'
+    Returns:
+        int
+    """
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if len(time_frame) < 2 or time_frame[-1] not in units or not time_frame[:-1].isdigit():
+        raise Exception(f'Error: Time frame {time_frame} is not valid.')
+    return int(time_frame[:-1]) * units[time_frame[-1]]
@@ -0,0 +1,182 @@
+"""
+A persistent on-disk cache for the zip files downloaded from https://data.binance.vision.
+
+Every cached file is stored under the sha256 hash of its url ('<hash>.zip'), next to a json file with its metadata
+('<hash>.json': url, sha256, size, verified, etag, last_modified, last_access).
+A cached file is 'verified' if its sha256 matched the '.zip.CHECKSUM' file that binance publishes for every zip file.
+The cache can be shared by all datasets. If it grows over its size limit, the least recently used files are evicted.
+It can also be shared by several processes: files are only written as temporary files that are then renamed, and
+an entry that another process evicts (or is still writing) while it is read is skipped like a missing entry.
+
+The downloading itself is done by fetch_data.download_file(), which uses this cache if it gets a cache folder.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+default_cache_dir: str = './cache'
+
+_lock = threading.Lock() # between the threads of this process (see the module docstring for other processes)
+
+
+def _entry_paths(cache_dir: str, url: str):
+    key = hashlib.sha256(url.encode()).hexdigest()
+    return cache_dir + '/' + key + '.zip', cache_dir + '/' + key + '.json'
+
+
+def _get_temporary_path(path: str) -> str:
+    # unique per process and thread, so concurrent writers of the same entry do not write into each other's file:
+    return f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+
+
+def _write_metadata(metadata_path: str, metadata: dict) -> None:
+    temporary_path = _get_temporary_path(metadata_path)
+    with open(temporary_path, 'w') as metadata_file:
+        json.dump(metadata, metadata_file)
+    os.replace(temporary_path, metadata_path)
+
+
+def _read_metadata(metadata_path: str):
+    try:
+        with open(metadata_path, 'r') as metadata_file:
+            return json.load(metadata_file)
+    except (FileNotFoundError, json.JSONDecodeError): # evicted in the meantime, or not a complete entry
+        return None
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Calculates the sha256 hash (hex) of a file, reading it in chunks of 1 MB.
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def parse_checksum(checksum_text: str) -> str:
+    """
+    Parses the content of a binance '.CHECKSUM' file (e.g., '<sha256>  BTCUSDT-1m-2023-08-20.zip').
+
+    Args:
+        checksum_text (str)
+    Returns:
+        str: the sha256 hash (hex, lower case)
+    """
+    checksum = checksum_text.split()[0].lower() if checksum_text.split() else ''
+    if len(checksum) != 64:
+        raise Exception('Error: Checksum file is not valid.')
+    return checksum
+
+
+def get_cache_entry(cache_dir: str, url: str):
+    """
+    Returns the metadata of the cached file of :param url (see the module docstring), or None if it is not cached.
+    """
+    data_path, metadata_path = _entry_paths(cache_dir, url)
+    if not os.path.exists(data_path):
+        return None
+    return _read_metadata(metadata_path)
+
+
+def use_cache_entry(cache_dir: str, url: str, download_path: str, verified: bool = None) -> bool:
+    """
+    Copies the cached file of :param url to :param download_path and marks it as recently used.
+    If :param verified is given, the 'verified' flag of the entry is updated.
+    The entry can be evicted (by another thread or process) after get_cache_entry() found it, then it is a cache miss.
+
+    Returns:
+        bool: True if the cached file was copied, False if the entry does not exist anymore
+    """
+    data_path, metadata_path = _entry_paths(cache_dir, url)
+    with _lock:
+        try:
+            shutil.copyfile(data_path, download_path)
+        except OSError:
+            return False
+        metadata = get_cache_entry(cache_dir, url)
+        if metadata is None:
+            return False
+        metadata['last_access'] = time.time()
+        if verified is not None:
+            metadata['verified'] = verified
+        _write_metadata(metadata_path, metadata)
+    return True
+
+
+def add_to_cache(cache_dir: str, url: str, file_path: str, sha256: str, verified: bool,
+                 etag: str = None, last_modified: str = None) -> None:
+    """
+    Adds (or replaces) the downloaded file :param file_path of :param url to the cache.
+
+    Args:
+        cache_dir (str)
+        url (str)
+        file_path (str)
+        sha256 (str): sha256 hash of the file (hex)
+        verified (bool): True if :param sha256 matched the binance checksum
+        etag (str): ETag header of the response (for conditional requests)
+        last_modified (str): Last-Modified header of the response (for conditional requests)
+    Returns:
+        None
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, metadata_path = _entry_paths(cache_dir, url)
+    with _lock:
+        temporary_path = _get_temporary_path(data_path)
+        shutil.copyfile(file_path, temporary_path)
+        os.replace(temporary_path, data_path)
+        _write_metadata(metadata_path, {
+            'url': url,
+            'sha256': sha256,
+            'size': os.path.getsize(file_path), # the entry can already be evicted by another process
+            'verified': verified,
+            'etag': etag,
+            'last_modified': last_modified,
+            'last_access': time.time(),
+        })
+
+
+def evict_cache(cache_dir: str, max_bytes: int) -> int:
+    """
+    Deletes the least recently used files of the cache until it is not larger than :param max_bytes.
+    Entries that another process evicts at the same time (or is still writing) are skipped.
+
+    Args:
+        cache_dir (str)
+        max_bytes (int)
+    Returns:
+        int: number of deleted files
+    """
+    if not os.path.exists(cache_dir):
+        return 0
+    with _lock:
+        entries = []
+        for file in os.listdir(cache_dir):
+            if file.endswith('.json'):
+                entry = _read_metadata(cache_dir + '/' + file)
+                if entry is not None:
+                    entries.append(entry)
+        entries.sort(key=lambda entry: entry['last_access'])
+        total_size = sum(entry['size'] for entry in entries)
+        deleted = 0
+        for entry in entries:
+            if total_size <= max_bytes:
+                break
+            data_path, metadata_path = _entry_paths(cache_dir, entry['url'])
+            total_size -= entry['size']
+            try:
+                os.remove(metadata_path)
+            except FileNotFoundError: # evicted by another process
+                continue
+            try:
+                os.remove(data_path)
+            except FileNotFoundError: # e.g., an entry whose file was evicted before its metadata was written
+                pass
+            deleted += 1
+    return deleted
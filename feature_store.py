@@ -0,0 +1,248 @@
+"""
+An incrementally maintained store of features of a dataset for trading models (unix in seconds, open, high, low, close).
+
+The features of a row are calculated from the last :param window rows (the row and the rows before it):
+return (close / previous close - 1), rolling_mean (mean of the closes), volatility (standard deviation of the
+returns, ddof=1) and vwap_proxy (mean of the typical prices (high + low + close) / 3; the datasets have no volume
+column, so the typical prices are not weighted by volume). Rows without enough history get NaN.
+
+Like the binary store (see binary_store.py), a feature store is a folder with one fixed-width file per column
+(timestamp.i8, return.f8, rolling_mean.f8, volatility.f8, vwap_proxy.f8), which can be opened with numpy.memmap.
+Next to the columns, state.json keeps the rolling state: the number of rows, the last timestamp, and the last
+:param window closes, typical prices and returns. So after an update only the new rows of the dataset are read
+and only their features are calculated (O(new rows) instead of O(history)).
+Every window is summed in the same order, so the features are the same (bit for bit) no matter in how many
+updates they were calculated.
+The state also records which file the features were calculated from (device and inode) and a checksum of the rows
+they were calculated from (see csv_utils.get_prefix_checksum()). If the dataset was rewritten (e.g., a repair spliced
+missing rows into its history, which changes the rolling features of every later row), the store is rebuilt from
+the whole dataset instead of only adding the new rows.
+
+Usage example:
+update_features('./dataset-5m.csv')
+features = open_features('./dataset-5m.features')
+features['volatility'][-10:]
+"""
+
+import os
+import json
+import shutil
+from csv_utils import find_first_row_after, get_prefix_checksum
+
+feature_columns: list[tuple[str, str]] = [('timestamp', '<i8'), ('return', '<f8'), ('rolling_mean', '<f8'),
+                                          ('volatility', '<f8'), ('vwap_proxy', '<f8')]
+
+
+def get_feature_store_path(csv_path: str) -> str:
+    """
+    Returns the default feature store path of a csv dataset (e.g., './dataset-5m.csv' -> './dataset-5m.features').
+    """
+    return os.path.splitext(csv_path)[0] + '.features'
+
+
+def _column_path(feature_path: str, column: str) -> str:
+    for name, dtype in feature_columns:
+        if name == column:
+            return feature_path + '/' + name + '.' + dtype[1:]
+    raise Exception(f'Error: Unknown feature column {column}.')
+
+
+def _load_state(feature_path: str):
+    state_path = feature_path + '/state.json'
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r') as state_file:
+        return json.load(state_file)
+
+
+def _save_state(feature_path: str, state: dict) -> None:
+    # written atomically after the columns, so the state never describes rows that are not written completely:
+    state_path = feature_path + '/state.json'
+    with open(state_path + '.tmp', 'w') as state_file:
+        json.dump(state, state_file)
+        state_file.flush()
+        os.fsync(state_file.fileno())
+    os.replace(state_path + '.tmp', state_path)
+
+
+def _rolling(values: 'np.ndarray', window: int, n: int):
+    """
+    Returns the rolling mean and the rolling standard deviation (ddof=1) of the last :param n windows of :param values
+    (the first window starts at values[0], so len(values) = n + window - 1). Windows with NaN give NaN.
+    The windows are summed value by value in the same order, so the result of a window does not depend on :param n.
+    """
+    import numpy as np
+
+    total = np.zeros(n)
+    for j in range(window):
+        total += values[j:j + n]
+    mean = total / window
+    squares = np.zeros(n)
+    for j in range(window):
+        squares += (values[j:j + n] - mean) ** 2
+    return mean, np.sqrt(squares / (window - 1))
+
+
+def calculate_features(df: 'pd.DataFrame', state: dict) -> dict:
+    """
+    Calculates the features of the new rows :param df (columns 0: unix in seconds, 1: open, 2: high, 3: low, 4: close),
+    given the rolling state of the rows before them, and updates :param state.
+
+    Args:
+        df (pd.DataFrame)
+        state (dict): see the module docstring (gets updated)
+    Returns:
+        dict: {column: np.ndarray} (see feature_columns)
+    """
+    import numpy as np
+
+    window = state['window']
+    n = len(df)
+    closes = df[4].to_numpy(dtype='float64')
+    typical_prices = ((df[2] + df[3] + df[4]) / 3).to_numpy(dtype='float64')
+
+    # returns (the first row of the dataset has no previous close):
+    previous_closes = np.concatenate([np.array(state['closes'][-1:], dtype='float64'), closes[:-1]])
+    if len(state['closes']) == 0:
+        previous_closes = np.concatenate([[np.nan], previous_closes])
+    returns = closes / previous_closes - 1
+
+    # the windows of the first rows also contain the last window - 1 values of the rows before them
+    # (missing values at the beginning of the dataset are NaN):
+    def with_history(values: 'np.ndarray', history: list) -> 'np.ndarray':
+        history = np.array(history[-(window - 1):], dtype='float64')
+        padding = np.full(window - 1 - len(history), np.nan)
+        return np.concatenate([padding, history, values])
+
+    rolling_mean, _ = _rolling(with_history(closes, state['closes']), window, n)
+    _, volatility = _rolling(with_history(returns, state['returns']), window, n)
+    vwap_proxy, _ = _rolling(with_history(typical_prices, state['typical_prices']), window, n)
+
+    state['closes'] = (state['closes'] + closes.tolist())[-window:]
+    state['typical_prices'] = (state['typical_prices'] + typical_prices.tolist())[-window:]
+    state['returns'] = (state['returns'] + returns.tolist())[-window:]
+    state['length'] += n
+    state['last_timestamp'] = int(df[0].iloc[-1])
+    return {'timestamp': df[0].to_numpy(dtype='int64'), 'return': returns, 'rolling_mean': rolling_mean,
+            'volatility': volatility, 'vwap_proxy': vwap_proxy}
+
+
+def _is_dataset_unchanged(csv_file, state: dict) -> bool:
+    """
+    Returns True if the rows of the opened (binary) dataset :param csv_file that the features were calculated from
+    are still the same (same file, and the same checksum of these rows), so only the new rows have to be added.
+    """
+    stat = os.fstat(csv_file.fileno())
+    if state.get('device') != stat.st_dev or state.get('inode') != stat.st_ino:
+        return False
+    if state['prefix_bytes'] > stat.st_size:
+        return False
+    return get_prefix_checksum(csv_file, state['prefix_bytes']) == state['prefix_checksum']
+
+
+def _rebuild_features(csv_path: str, feature_path: str, window: int, chunk_rows: int) -> int:
+    """
+    Rebuilds a feature store from the whole dataset in a new folder that replaces the old store, so the memmaps of
+    open_features() that are still in use stay valid.
+
+    Returns:
+        int: number of rows
+    """
+    new_feature_path = feature_path + '.tmp'
+    for leftover_path in [new_feature_path, feature_path + '.old']: # leftovers of an interrupted rebuild
+        if os.path.exists(leftover_path):
+            shutil.rmtree(leftover_path)
+    rows = update_features(csv_path, new_feature_path, window, chunk_rows)
+    if os.path.exists(feature_path):
+        os.replace(feature_path, feature_path + '.old')
+    os.replace(new_feature_path, feature_path)
+    if os.path.exists(feature_path + '.old'):
+        shutil.rmtree(feature_path + '.old')
+    return rows
+
+
+def update_features(csv_path: str, feature_path: str = None, window: int = 20, chunk_rows: int = 1_000_000) -> int:
+    """
+    Calculates the features of the rows of :param csv_path that are newer than the last row of the feature store,
+    and appends them to the store. If the store does not exist, it is created from the whole dataset, and if the
+    dataset was rewritten since the last update (see the module docstring), the store is rebuilt.
+    The first new row is found with a binary search (see csv_utils.find_first_row_after()), and the new rows are read
+    in chunks of :param chunk_rows rows, so only the new rows are read and the memory usage does not depend on
+    the size of the dataset.
+
+    Args:
+        csv_path (str)
+        feature_path (str): default: get_feature_store_path(:param csv_path)
+        window (int): number of rows of the rolling features (only used when the store is created)
+        chunk_rows (int)
+    Returns:
+        int: number of new rows
+    """
+    import pandas as pd
+
+    if feature_path is None:
+        feature_path = get_feature_store_path(csv_path)
+    state = _load_state(feature_path)
+    with open(csv_path, 'rb') as csv_file:
+        if state is not None and not _is_dataset_unchanged(csv_file, state):
+            print(f'{csv_path} was rewritten, rebuilding {feature_path}.')
+            return _rebuild_features(csv_path, feature_path, state['window'], chunk_rows)
+        if state is None:
+            if window < 2:
+                raise Exception('Error: The window of the features has to be at least 2 rows.')
+            os.makedirs(feature_path, exist_ok=True)
+            stat = os.fstat(csv_file.fileno())
+            state = {'window': window, 'length': 0, 'last_timestamp': None, 'closes': [], 'typical_prices': [],
+                     'returns': [], 'device': stat.st_dev, 'inode': stat.st_ino, 'prefix_bytes': 0,
+                     'prefix_checksum': get_prefix_checksum(csv_file, 0)}
+            for name, _ in feature_columns:
+                open(_column_path(feature_path, name), 'wb').close()
+            _save_state(feature_path, state)
+        # an interrupted update can leave rows that are not in the state yet, they are calculated again:
+        for name, _ in feature_columns:
+            with open(_column_path(feature_path, name), 'r+b') as file:
+                file.truncate(state['length'] * 8)
+
+        new_rows = 0
+        start = find_first_row_after(csv_file, state['last_timestamp']) if state['last_timestamp'] is not None else 0
+        if start == csv_file.seek(0, os.SEEK_END):
+            return new_rows
+        csv_file.seek(start)
+        chunks = pd.read_csv(csv_file, header=None, usecols=[0, 1, 2, 3, 4], chunksize=chunk_rows,
+                             dtype={0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'})
+        for chunk in chunks:
+            features = calculate_features(chunk, state)
+            for name, dtype in feature_columns:
+                with open(_column_path(feature_path, name), 'ab') as file:
+                    features[name].astype(dtype).tofile(file)
+            _save_state(feature_path, state)
+            new_rows += len(chunk)
+        # the rows the features were calculated from (see _is_dataset_unchanged()):
+        state['prefix_bytes'] = find_first_row_after(csv_file, state['last_timestamp'])
+        state['prefix_checksum'] = get_prefix_checksum(csv_file, state['prefix_bytes'])
+        _save_state(feature_path, state)
+    print(f'Features of {new_rows} new rows added to {feature_path}.')
+    return new_rows
+
+
+def open_features(feature_path: str) -> dict:
+    """
+    Opens the columns of a feature store as read-only numpy memmaps (zero-copy).
+
+    Args:
+        feature_path (str)
+    Returns:
+        dict: {column: np.memmap} (see feature_columns)
+    """
+    import numpy as np
+
+    state = _load_state(feature_path)
+    if state is None:
+        raise Exception(f'Error: {feature_path} is not a feature store.')
+    features = {}
+    for name, dtype in feature_columns:
+        if state['length'] == 0:
+            features[name] = np.empty(0, dtype=dtype)
+        else:
+            features[name] = np.memmap(_column_path(feature_path, name), dtype=dtype, mode='r', shape=(state['length'],))
+    return features
@@ -5,15 +5,24 @@ Daily download url example: https://data.binance.vision/data/spot/daily/klines/B
 Monthly download url example: https://data.binance.vision/data/spot/monthly/klines/BTCUSDT/1m/BTCUSDT-1m-2023-07.zip (contains ohlc data of one month)
 
 Format of the downloaded data: (unix in ms, open, high, low, close, Volume in BTC, ...)
+
+requests is imported by the functions that send requests, so generating urls (e.g., for update_dataset.py -plan)
+does not import it.
 """
 
-import requests
+import os
+import time
+import hashlib
 import calendar
+from concurrent.futures import ThreadPoolExecutor
 from datetime_utils import check_date_validity
+from download_cache import get_cache_entry, use_cache_entry, add_to_cache, evict_cache, parse_checksum
+from metrics import emit, timed
 
 main_url_daily = 'https://data.binance.vision/data/spot/daily/klines/'
 main_url_monthly = 'https://data.binance.vision/data/spot/monthly/klines/'
 available_time_frames = ['12h', '15m', '1d', '1h', '1m', '1s', '2h', '30m', '3m', '4h', '5m', '6h', '8h']
+download_chunk_size: int = 1024 * 1024 # downloaded files are written to the disk in chunks of this size (bytes)
 
 
 def date_to_stirng(yy: int, mm: int, dd: int):
@@ -90,35 +99,329 @@ def generate_url_and_file_name(asset_pair: str, time_frame: str, yy: int, mm: in
     return url, file_name
 
 
-def download_file(url: str, download_path: str) -> None:
+def create_session(pool_size: int = 10) -> 'requests.Session':
+    """
+    Creates a requests.Session with a connection pool of :param pool_size connections.
+    Reusing one session for many downloads avoids paying a new TCP+TLS handshake for every file.
+
+    Args:
+        pool_size (int): maximum number of connections kept open per host
+    Returns:
+        requests.Session
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _get_with_retries(url: str, session: 'requests.Session', retries: int, backoff: float, headers: dict = None,
+                      stream: bool = False):
+    """
+    Sends a GET request to :param url. Connection errors and HTTP 5xx responses are retried
+    :param retries times, waiting backoff * 2^attempt seconds between the attempts.
+    Other status codes (e.g. 404) are not retried.
+    If :param stream is True, only the headers are read and the body has to be read (or the response closed) by the caller.
+
+    Returns:
+        response (requests.Response)
+        attempts (int)
+    """
+    import requests
+
+    get = requests.get if session is None else session.get
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = get(url, headers=headers, stream=stream)
+        except requests.RequestException:
+            if attempt > retries:
+                raise
+            time.sleep(backoff * 2 ** (attempt - 1))
+            continue
+        if response.status_code >= 500 and attempt <= retries:
+            response.close()
+            time.sleep(backoff * 2 ** (attempt - 1))
+            continue
+        return response, attempt
+
+
+def _get_checksum(url: str, session: 'requests.Session', retries: int, backoff: float):
+    """
+    Gets the sha256 hash that binance publishes for the file of :param url (in url + '.CHECKSUM'), or None if it is not available.
+    """
+    try:
+        response, _ = _get_with_retries(url + '.CHECKSUM', session, retries, backoff)
+        if response.status_code == 200:
+            return parse_checksum(response.text)
+    except Exception:
+        pass
+    return None
+
+
+def _download_with_retries(url: str, download_path: str, session: 'requests.Session', retries: int, backoff: float,
+                           headers: dict = None) -> dict:
+    """
+    Downloads the file of :param url into :param download_path. Like _get_with_retries(), connection errors and
+    HTTP 5xx responses are retried, and so is a body that breaks off (e.g., a connection reset in the middle of the
+    file, or fewer bytes than its Content-Length): the partial file is deleted and the whole download is attempted
+    again. The file is written chunk by chunk (and hashed on the way), so the memory usage does not depend on its size.
+
+    Returns:
+        dict: {
+            'status_code' = int or None (None if no response was received)
+            'attempts' = int
+            'bytes' = int
+            'sha256' = str or None (None if the file was not downloaded)
+            'etag' = str or None
+            'last_modified' = str or None
+            'error' = str or None (None for a complete download or a response without a body to download, e.g. 404)
+        }
+    """
+    import requests
+
+    download = {'status_code': None, 'attempts': 0, 'bytes': 0, 'sha256': None, 'etag': None, 'last_modified': None,
+                'error': None}
+    while True:
+        try:
+            response, attempts = _get_with_retries(url, session, retries - download['attempts'], backoff, headers, stream=True)
+        except requests.RequestException as e:
+            download['attempts'] = retries + 1
+            download['error'] = str(e)
+            return download
+        download['attempts'] += attempts
+        download['status_code'] = response.status_code
+        if response.status_code != 200:
+            response.close()
+            return download
+
+        sha256 = hashlib.sha256()
+        size = 0
+        try:
+            with response, open(download_path, 'wb') as file:
+                for chunk in response.iter_content(chunk_size=download_chunk_size):
+                    file.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+            length = response.headers.get('Content-Length')
+            if length is not None and 'Content-Encoding' not in response.headers and int(length) != size:
+                raise requests.exceptions.ChunkedEncodingError(f'{size} of {length} bytes received')
+        except requests.RequestException as e:
+            os.remove(download_path)
+            if download['attempts'] > retries:
+                download['error'] = url + ' could not be downloaded completely: ' + str(e)
+                return download
+            time.sleep(backoff * 2 ** (download['attempts'] - 1))
+            continue
+        download.update({'bytes': size, 'sha256': sha256.hexdigest(), 'etag': response.headers.get('ETag'),
+                         'last_modified': response.headers.get('Last-Modified')})
+        return download
+
+
+def _fetch_file(url: str, download_path: str, session: 'requests.Session', retries: int, backoff: float,
+                cache_dir: str, cache_max_bytes: int) -> dict:
+    """
+    Does the work of fetch_file().
+    """
+    result = {'url': url, 'path': download_path, 'ok': False, 'status_code': None, 'attempts': 0,
+              'cache_hit': False, 'bytes': 0, 'error': None}
+    headers = None
+    checksum = None
+    if cache_dir is not None:
+        entry = get_cache_entry(cache_dir, url)
+        if entry is not None and entry['verified']:
+            if use_cache_entry(cache_dir, url, download_path):
+                result.update({'ok': True, 'cache_hit': True})
+                return result
+            entry = None # evicted in the meantime, so the file gets downloaded
+        checksum = _get_checksum(url, session, retries, backoff)
+        if entry is not None and checksum is not None and entry['sha256'] == checksum:
+            if use_cache_entry(cache_dir, url, download_path, verified=True):
+                result.update({'ok': True, 'cache_hit': True})
+                return result
+        if entry is not None and checksum is None:
+            headers = {}
+            if entry['etag'] is not None:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified'] is not None:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+    download = _download_with_retries(url, download_path, session, retries, backoff, headers)
+    if download['status_code'] == 304:
+        if use_cache_entry(cache_dir, url, download_path):
+            result.update({'status_code': 304, 'ok': True, 'cache_hit': True, 'attempts': download['attempts']})
+            return result
+        # the entry was evicted after the request, so the file is requested again without the conditional headers:
+        attempts = download['attempts']
+        download = _download_with_retries(url, download_path, session, retries, backoff)
+        download['attempts'] += attempts
+    for key in ['status_code', 'attempts', 'bytes', 'error']:
+        result[key] = download[key]
+    if download['sha256'] is None:
+        if result['error'] is None:
+            result['error'] = url + ' got HTTP status code ' + str(download['status_code']) + '.'
+        return result
+
+    result['ok'] = True
+    if cache_dir is not None:
+        if checksum is not None and download['sha256'] != checksum:
+            os.remove(download_path)
+            result['ok'] = False
+            result['error'] = url + ' does not match its checksum.'
+            return result
+        add_to_cache(cache_dir, url, download_path, download['sha256'], checksum is not None,
+                     download['etag'], download['last_modified'])
+        if cache_max_bytes is not None:
+            evict_cache(cache_dir, cache_max_bytes)
+    return result
+
+
+def fetch_file(url: str, download_path: str, session: 'requests.Session' = None, retries: int = 0, backoff: float = 0.5,
+               cache_dir: str = None, cache_max_bytes: int = None) -> dict:
     """
-    Downloads and saves a file in :param download_path given a :param url.
+    Downloads and saves a file in :param download_path given a :param url, and returns the result instead of raising
+    an exception if the download fails.
+
+    If :param cache_dir is given, the download cache (see download_cache.py) is used:
+    A cached file that was verified against the binance '.CHECKSUM' file is used without downloading it again.
+    A cached file that could not be verified yet is checked against the checksum, or revalidated with a
+    conditional request (If-None-Match / If-Modified-Since) if there is no checksum.
+    Newly downloaded files are verified against the checksum (if available) and added to the cache.
+    The file is streamed to the disk in chunks of download_chunk_size bytes (it is never held in memory as a whole).
+    Every call emits a 'download' metrics record (see metrics.py).
 
     Args:
         url (str)
         download_path (str)
+        session (requests.Session): if None, a bare requests.get is used
+        retries (int): number of extra attempts for connection errors, HTTP 5xx responses and broken off downloads
+        backoff (float): base waiting time in seconds between attempts
+        cache_dir (str): folder of the download cache (None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+    Returns:
+        dict: {
+            'url' = str
+            'path' = str
+            'ok' = bool
+            'status_code' = int or None (None if no response was received)
+            'attempts' = int
+            'cache_hit' = bool
+            'bytes' = int (number of downloaded bytes, 0 for cache hits)
+            'error' = str or None
+        }
+    """
+    start = time.perf_counter()
+    result = _fetch_file(url, download_path, session, retries, backoff, cache_dir, cache_max_bytes)
+    emit('download', **result, retries=max(result['attempts'] - 1, 0), seconds=round(time.perf_counter() - start, 6))
+    return result
+
+
+def download_file(url: str, download_path: str, session: 'requests.Session' = None,
+                  retries: int = 0, backoff: float = 0.5, cache_dir: str = None, cache_max_bytes: int = None) -> None:
+    """
+    Downloads and saves a file in :param download_path given a :param url (see fetch_file()).
+
+    Args:
+        url (str)
+        download_path (str)
+        session (requests.Session): if None, a bare requests.get is used
+        retries (int): number of extra attempts for connection errors and HTTP 5xx responses
+        backoff (float): base waiting time in seconds between attempts
+        cache_dir (str): folder of the download cache (None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
     Returns:
         None
     """
-    response = requests.get(url)
-    if response.status_code == 200:
-        # saveing the file:
-        file = open(download_path, 'wb')
-        file.write(response.content)
-        file.close
-    else:
-        raise Exception(url + ' got HTTP status code ' + str(response.status_code) + '. Binance has not yet updated their dataset. Try again in a couple of hours.')
+    result = fetch_file(url, download_path, session, retries, backoff, cache_dir, cache_max_bytes)
+    if not result['ok']:
+        if result['status_code'] is not None and result['status_code'] != 200:
+            raise Exception(url + ' got HTTP status code ' + str(result['status_code']) + '. Binance has not yet updated their dataset. Try again in a couple of hours.')
+        raise Exception(result['error'])
+
 
+def download_files(downloads: list[tuple[str, str]], max_workers: int = 8, session: 'requests.Session' = None,
+                   retries: int = 3, backoff: float = 0.5, cache_dir: str = None, cache_max_bytes: int = None) -> list[dict]:
+    """
+    Downloads many files concurrently with at most :param max_workers downloads running at the same time.
+    All downloads share one pooled session. A failing file does not stop the other downloads,
+    instead every file gets its own result. The totals are emitted as a 'download_files' metrics record.
+
+    Args:
+        downloads (list[tuple[str, str]]): list of (url, download_path)
+        max_workers (int)
+        session (requests.Session): if None, a session with a pool of :param max_workers connections is created
+        retries (int): see fetch_file()
+        backoff (float): see fetch_file()
+        cache_dir (str): see fetch_file()
+        cache_max_bytes (int): see fetch_file()
+    Returns:
+        [dict] (list of the results of fetch_file(), in the same order as :param downloads)
+    """
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+
+    def download(url_and_path: tuple[str, str]) -> dict:
+        url, path = url_and_path
+        return fetch_file(url, path, session, retries, backoff, cache_dir, cache_max_bytes)
+
+    try:
+        with timed('download_files', files=len(downloads)) as metrics:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(download, downloads))
+            metrics['ok'] = sum(result['ok'] for result in results)
+            metrics['failed'] = len(results) - metrics['ok']
+            metrics['cache_hits'] = sum(result['cache_hit'] for result in results)
+            metrics['bytes'] = sum(result['bytes'] for result in results)
+    finally:
+        if own_session:
+            session.close()
+    return results
+
+
+def file_exists(url: str, session: 'requests.Session' = None, retries: int = 0, backoff: float = 0.5) -> bool:
+    """
+    Checks cheaply (with a HEAD request, nothing is downloaded) if a file is available under :param url,
+    e.g., if binance has already published the daily file of yesterday.
+
+    Args:
+        url (str)
+        session (requests.Session): if None, a bare requests.head is used
+        retries (int): number of extra attempts for connection errors and HTTP 5xx responses
+        backoff (float): base waiting time in seconds between attempts
+    Returns:
+        bool
+    """
+    import requests
+
+    head = requests.head if session is None else session.head
+    for attempt in range(retries + 1):
+        try:
+            response = head(url, allow_redirects=True)
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code < 500 or attempt == retries:
+                return response.status_code == 200
+        time.sleep(backoff * 2 ** attempt)
 
 
 def download_range_days(asset_pair: str, time_frame: str, 
                         yy_start: int, mm_start: int, dd_start: int, 
                         yy_last: int, mm_last: int, dd_last: int, 
-                        folder_path: str):
+                        folder_path: str, max_workers: int = None):
     """
     Downloads all of the availabe data in a range of days (from start date to last date, including both).
     The data will get downloaded day by day (no monthly data will get downloaded).
     Note: If you want to download a range that is over some months use the download_range_months() function and not this function.
+    If :param max_workers is None, the files are downloaded one by one and the first failed download raises an exception.
+    Otherwise the files are downloaded concurrently by download_files() and every file gets its own result.
 
     Args:
         asset_pair (str): e.g., 'BTCUSDT'
@@ -130,8 +433,9 @@ def download_range_days(asset_pair: str, time_frame: str,
         mm_last (int)
         dd_last (int)
         folder_path (str)
+        max_workers (int): number of concurrent downloads (None for sequential downloading)
     Returns:
-        None
+        None or [dict] (the results of download_files() if :param max_workers is not None)
     """
     if not check_date_validity(yy_start, mm_start, dd_start) or not check_date_validity(yy_last, mm_last, dd_last):
         raise Exception('Error: Date is not valid.')
@@ -170,19 +474,25 @@ def download_range_days(asset_pair: str, time_frame: str,
             date[0] += 1
     
     # create url and download data per day:
+    downloads: list[tuple[str, str]] = []
     for date in days_to_download:
         url, file_name = generate_url_and_file_name(asset_pair, time_frame, date[0], date[1], date[2])
-        path = folder_path + '/' + file_name
+        downloads.append((url, folder_path + '/' + file_name))
+    if max_workers is not None:
+        return download_files(downloads, max_workers)
+    for url, path in downloads:
         download_file(url, path)
 
 
 def download_range_months(asset_pair: str, time_frame: str, 
                           yy_start: int, mm_start: int,
                           yy_last: int, mm_last: int, 
-                          folder_path: str):
+                          folder_path: str, max_workers: int = None):
     """
     Downloads all of the availabe data in a range of months (from start date to last date, including both).
     The data will get downloaded month by month (not daily).
+    If :param max_workers is None, the files are downloaded one by one and the first failed download raises an exception.
+    Otherwise the files are downloaded concurrently by download_files() and every file gets its own result.
 
     Args:
         asset_pair (str): e.g., 'BTCUSDT'
@@ -192,8 +502,9 @@ def download_range_months(asset_pair: str, time_frame: str,
         yy_last (int)
         mm_last (int)
         folder_path (str)
+        max_workers (int): number of concurrent downloads (None for sequential downloading)
     Returns:
-        None
+        None or [dict] (the results of download_files() if :param max_workers is not None)
     """
     if not check_date_validity(yy_start, mm_start, 1) or not check_date_validity(yy_last, mm_last, 1):
         raise Exception('Error: Date is not valid.')
@@ -224,8 +535,12 @@ def download_range_months(asset_pair: str, time_frame: str,
         date[1] = 1
         date[0] += 1
     
-    # create url and download data per day:
+    # create url and download data per month:
+    downloads: list[tuple[str, str]] = []
     for date in months_to_download:
         url, file_name = generate_url_and_file_name(asset_pair, time_frame, date[0], date[1], None)
-        path = folder_path + '/' + file_name
+        downloads.append((url, folder_path + '/' + file_name))
+    if max_workers is not None:
+        return download_files(downloads, max_workers)
+    for url, path in downloads:
         download_file(url, path)
@@ -0,0 +1,140 @@
+"""
+Structured instrumentation of the update pipeline (downloading, reformating, appending).
+
+Every stage of an update emits a metrics record, a dict with the name of the event, a unix timestamp, and the
+fields of the stage, e.g.:
+{"event": "download", "time": 1692576000.5, "url": "...", "ok": true, "attempts": 1, "retries": 0, "cache_hit": false, "bytes": 51234, "seconds": 0.31}
+
+The records are passed to hooks (callables that take the record). There are no hooks by default, so importing the
+modules of the updater (e.g., as a library) prints nothing. The command line of update_dataset.py adds a hook that
+writes every record as a json line to stderr (see create_json_log_hook()), so the normal print output on stdout stays
+readable. Own hooks can be added with add_hook(), e.g., for collecting the records of a run:
+
+records = []
+add_hook(records.append)
+
+Note: Hooks only see the records of their own process. The updates of update_dataset.update_datasets() that run
+in worker processes are only reported by the hooks that the workers inherited, e.g., the json hook of the command line.
+
+Events:
+download (fetch_data.fetch_file): url, path, ok, status_code, attempts, retries, cache_hit, bytes, error, seconds
+download_files (fetch_data.download_files): files, ok, failed, cache_hits, bytes, seconds
+reformat (reformat_data.reformat_binance_vision_kline_file): zip_path, bytes, rows, seconds
+reformat_files (reformat_data.reformat_binance_vision_kline_files): files, rows, seconds
+append (csv_utils.concat_files): path, files, bytes, seconds
+update_stage (update_dataset.update_dataset): dataset_path, stage ('plan', 'download', 'apply' or 'pipeline'), seconds, ...
+update (update_dataset.update_dataset): asset_pair, time_frame, dataset_path, up_to_date, seconds
+"""
+
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+
+
+def create_json_log_hook(file=None):
+    """
+    Creates a hook that writes every record as a json line to the opened :param file (default: sys.stderr).
+    """
+    def json_log_hook(record: dict) -> None:
+        output = sys.stderr if file is None else file
+        with _lock:
+            output.write(json.dumps(record, default=str) + '\n')
+            output.flush()
+    return json_log_hook
+
+
+_hooks: list = []
+
+
+def add_hook(hook) -> None:
+    """
+    Adds a hook (a callable that takes the record dict) that gets every emitted record.
+    """
+    with _lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook) -> None:
+    """
+    Removes a hook added by add_hook().
+    """
+    with _lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def set_hooks(hooks: list) -> None:
+    """
+    Replaces all hooks, e.g., set_hooks([]) turns the instrumentation off.
+    """
+    with _lock:
+        _hooks[:] = hooks
+
+
+def emit(event: str, **fields) -> None:
+    """
+    Emits the record {'event': :param event, 'time': unix time, **fields} to all hooks.
+    A failing hook is reported, but never stops the update.
+    """
+    if not _hooks:
+        return
+    record = {'event': event, 'time': round(time.time(), 6)}
+    record.update(fields)
+    with _lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            print(f'Metrics hook {hook} failed: {e}')
+
+
+@contextmanager
+def timed(event: str, **fields):
+    """
+    Measures the duration of a with-block and emits it as the 'seconds' field of :param event.
+    The block gets the dict of :param fields, so it can add fields that are only known at the end (e.g., rows).
+    If the block raises an exception, the record gets an 'error' field and the exception is raised again.
+
+    Usage example:
+    with timed('reformat', zip_path=zip_path) as metrics:
+        metrics['rows'] = reformat(...)
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields['error'] = repr(e)
+        raise
+    finally:
+        fields['seconds'] = round(time.perf_counter() - start, 6)
+        emit(event, **fields)
+
+
+def run_profiled(function, *args, output_path: str = None, top: int = 30, **kwargs):
+    """
+    Runs function(*args, **kwargs) under cProfile and prints the :param top functions by cumulative time to stderr.
+
+    Args:
+        function (callable)
+        output_path (str): if given, the raw profile is also saved there (can be opened with pstats or snakeviz)
+        top (int): number of printed functions
+    Returns:
+        the return value of :param function
+    """
+    import cProfile
+    import pstats
+
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.disable()
+        if output_path is not None:
+            profile.dump_stats(output_path)
+        pstats.Stats(profile, stream=sys.stderr).sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,130 @@
+"""
+Some functions for building coarser time frames (e.g., 15m, 1h, 4h) from an up-to-date 1m (or 1s) dataset,
+instead of downloading every time frame separately from https://data.binance.vision.
+
+Both the input and the output have the format (unix in seconds, open, high, low, close).
+The candles are aligned to UTC boundaries like the binance candles (e.g., a 4h candle starts at 00:00, 04:00, ... UTC),
+and are aggregated as (first open, max high, min low, last close), so the output has the same values as the
+aggregated files of binance.
+
+Usage example:
+resample_dataset('./dataset-1m.csv', './dataset-1h.csv', '1h')
+"""
+
+import os
+from csv_utils import get_lastline, concat_files
+from csv_index import get_index_path, find_offset
+from datetime_utils import time_frame_to_seconds
+
+
+def resample_klines(df: 'pd.DataFrame', time_frame: str) -> 'pd.DataFrame':
+    """
+    Aggregates candles (columns 0: unix in seconds, 1: open, 2: high, 3: low, 4: close) into candles of :param time_frame.
+    The rows of :param df must be sorted by timestamp.
+
+    Args:
+        df (pd.DataFrame)
+        time_frame (str): e.g., '1h'
+    Returns:
+        pd.DataFrame (same columns as :param df, one row per candle of :param time_frame)
+    """
+    seconds = time_frame_to_seconds(time_frame)
+    buckets = df[0] - df[0] % seconds
+    resampled = df.groupby(buckets, sort=True).agg({1: 'first', 2: 'max', 3: 'min', 4: 'last'})
+    resampled.insert(0, 0, resampled.index.to_numpy())
+    return resampled.reset_index(drop=True)
+
+
+def _read_chunks_from(file_path: str, start_timestamp: int, chunk_rows: int):
+    """
+    Reads the rows of a dataset with timestamp >= :param start_timestamp in chunks of (up to) :param chunk_rows rows.
+    If the dataset has an index (see csv_index.py), the reading starts at the nearest index entry instead of the beginning.
+    """
+    import pandas as pd
+
+    offset = 0
+    if start_timestamp is not None and os.path.exists(get_index_path(file_path)):
+        offset = find_offset(file_path, start_timestamp)
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        chunks = pd.read_csv(file, header=None, usecols=[0, 1, 2, 3, 4], chunksize=chunk_rows,
+                             dtype={0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'})
+        for chunk in chunks:
+            if start_timestamp is not None:
+                chunk = chunk[chunk[0] >= start_timestamp]
+            if len(chunk) > 0:
+                yield chunk
+
+
+def _get_source_step(source_path: str):
+    """
+    Returns the step of the dataset :param source_path in seconds (the difference of the timestamps of its first
+    two rows), or None if it has less than two rows.
+    """
+    with open(source_path, 'rb') as source_file:
+        first_line, second_line = source_file.readline(), source_file.readline()
+    if not second_line.strip():
+        return None
+    return int(second_line.split(b',', 1)[0]) - int(first_line.split(b',', 1)[0])
+
+
+def resample_dataset(source_path: str, output_path: str, time_frame: str, chunk_rows: int = 1_000_000) -> int:
+    """
+    Builds (or updates) the dataset :param output_path of :param time_frame candles from the finer dataset :param source_path.
+    If :param output_path already exists, it is updated incrementally: only its last candle (which may have been
+    incomplete) is recomputed, and only the source rows from the start of this candle on are read.
+    The source is read in chunks of :param chunk_rows rows, so the memory usage does not depend on the dataset size.
+    :param output_path has to be another file than :param source_path (its last candle gets truncated), and
+    :param time_frame has to be a multiple of the step of the source (e.g., 5m, 15m or 1h from a 5m dataset).
+
+    Args:
+        source_path (str): e.g., './dataset-1m.csv'
+        output_path (str): e.g., './dataset-1h.csv'
+        time_frame (str): e.g., '1h'
+        chunk_rows (int)
+    Returns:
+        int: number of written candles (including the recomputed last candle)
+    """
+    import pandas as pd
+
+    if os.path.realpath(output_path) == os.path.realpath(source_path):
+        raise Exception(f'Error: The resampled dataset {output_path} can not be the source dataset {source_path}.')
+    seconds = time_frame_to_seconds(time_frame)
+    source_step = _get_source_step(source_path)
+    if source_step is not None and (seconds < source_step or seconds % source_step != 0):
+        raise Exception(f'Error: {time_frame} candles can not be built from {source_path} '
+                        f'(a dataset of {source_step} s candles).')
+
+    start_timestamp = None
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        last_line = get_lastline(output_path)
+        start_timestamp = int(last_line.split(',')[0])
+        # remove the last candle of the output, it gets recomputed:
+        with open(output_path, 'r+b') as output_file:
+            output_file.truncate(os.path.getsize(output_path) - len(last_line.encode()))
+    else:
+        open(output_path, 'w').close()
+
+    new_data_path = output_path + '.new'
+    written_rows = 0
+    with open(new_data_path, 'w') as new_data_file:
+        carry = None # rows of the last (maybe incomplete) candle of the previous chunk
+        for chunk in _read_chunks_from(source_path, start_timestamp, chunk_rows):
+            if carry is not None:
+                chunk = pd.concat([carry, chunk], ignore_index=True)
+            resampled = resample_klines(chunk, time_frame)
+            # the last candle can continue in the next chunk:
+            last_bucket = resampled[0].iloc[-1]
+            carry = chunk[chunk[0] - chunk[0] % seconds == last_bucket]
+            resampled = resampled.iloc[:-1]
+            resampled.to_csv(new_data_file, header=False, index=False, lineterminator='\n')
+            written_rows += len(resampled)
+        if carry is not None:
+            resampled = resample_klines(carry, time_frame)
+            resampled.to_csv(new_data_file, header=False, index=False, lineterminator='\n')
+            written_rows += len(resampled)
+
+    concat_files([output_path, new_data_path])
+    os.remove(new_data_path)
+    print(f'{output_path} resampled to {time_frame} from {source_path}.')
+    return written_rows
@@ -0,0 +1,126 @@
+"""
+An optional SQLite copy of a dataset (unix in seconds, open, high, low, close), for consumers that want SQL access
+to the candles without importing the csv file after every update.
+
+The candles are stored in the table klines (timestamp INTEGER PRIMARY KEY, open REAL, high REAL, low REAL, close REAL).
+The timestamp is the primary key (the rowid of SQLite), so range queries and MAX(timestamp) are index lookups, and
+appending the same rows again replaces them instead of duplicating them (upsert).
+The database runs in WAL mode, so readers are not blocked while an update appends new rows.
+
+Usage example:
+import_csv_to_database('./dataset-5m.csv', './dataset-5m.sqlite')
+query_range('./dataset-5m.sqlite', 1706745600, 1706832000)
+"""
+
+import os
+import sqlite3
+
+_upsert = ('INSERT INTO klines (timestamp, open, high, low, close) VALUES (?, ?, ?, ?, ?) '
+           'ON CONFLICT(timestamp) DO UPDATE SET open = excluded.open, high = excluded.high, '
+           'low = excluded.low, close = excluded.close')
+
+
+def get_database_path(csv_path: str) -> str:
+    """
+    Returns the default database path of a csv dataset (e.g., './dataset-5m.csv' -> './dataset-5m.sqlite').
+    """
+    return os.path.splitext(csv_path)[0] + '.sqlite'
+
+
+def open_database(database_path: str) -> sqlite3.Connection:
+    """
+    Opens (or creates) the database of a dataset in WAL mode and creates the klines table if it does not exist.
+
+    Args:
+        database_path (str)
+    Returns:
+        sqlite3.Connection
+    """
+    connection = sqlite3.connect(database_path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('CREATE TABLE IF NOT EXISTS klines '
+                       '(timestamp INTEGER PRIMARY KEY, open REAL, high REAL, low REAL, close REAL)')
+    return connection
+
+
+def append_csv_to_database(csv_path: str, database_path: str, chunk_rows: int = 100_000, merge: bool = False) -> int:
+    """
+    Writes the rows of a reformated csv file (e.g., the data of one downloaded file) into the database.
+    All rows are written in a single transaction with batched inserts (executemany of :param chunk_rows rows),
+    so the file is either written completely or not at all. Rows with a timestamp that is already in the database
+    replace the old row, so writing a file again does not create duplicates.
+    If :param merge is True, only the rows that are newer than the last row of the database are written
+    (see csv_utils.concat_files()), so a file that starts before the end of the dataset (e.g., a monthly file)
+    does not add or change older rows.
+
+    Args:
+        csv_path (str)
+        database_path (str)
+        chunk_rows (int)
+        merge (bool): skip the rows that are not newer than the last row of the database
+    Returns:
+        int: number of written rows
+    """
+    import pandas as pd
+
+    rows = 0
+    if os.path.getsize(csv_path) == 0:
+        return rows
+    connection = open_database(database_path)
+    try:
+        with connection: # one transaction (commits at the end, rolls back on an exception)
+            last_timestamp = connection.execute('SELECT MAX(timestamp) FROM klines').fetchone()[0] if merge else None
+            chunks = pd.read_csv(csv_path, header=None, usecols=[0, 1, 2, 3, 4], chunksize=chunk_rows,
+                                 dtype={0: 'int64', 1: 'float64', 2: 'float64', 3: 'float64', 4: 'float64'})
+            for chunk in chunks:
+                if last_timestamp is not None:
+                    chunk = chunk[chunk[0] > last_timestamp]
+                connection.executemany(_upsert, chunk.itertuples(index=False, name=None))
+                rows += len(chunk)
+    finally:
+        connection.close()
+    return rows
+
+
+def import_csv_to_database(csv_path: str, database_path: str) -> int:
+    """
+    Creates the database of a csv dataset (see append_csv_to_database()).
+
+    Returns:
+        int: number of imported rows
+    """
+    rows = append_csv_to_database(csv_path, database_path)
+    print(f'{rows} rows imported into {database_path}.')
+    return rows
+
+
+def get_database_last_timestamp(database_path: str):
+    """
+    Returns the last timestamp of the database (a single MAX() lookup on the primary key), or None if it is empty.
+    """
+    connection = open_database(database_path)
+    try:
+        return connection.execute('SELECT MAX(timestamp) FROM klines').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def query_range(database_path: str, start_timestamp: int, end_timestamp: int) -> list[tuple]:
+    """
+    Returns the candles from :param start_timestamp to :param end_timestamp (including both), ordered by timestamp.
+
+    Args:
+        database_path (str)
+        start_timestamp (int): unix in seconds
+        end_timestamp (int): unix in seconds
+    Returns:
+        [(timestamp, open, high, low, close)]
+    """
+    connection = open_database(database_path)
+    try:
+        return connection.execute('SELECT timestamp, open, high, low, close FROM klines '
+                                  'WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp',
+                                  (start_timestamp, end_timestamp)).fetchall()
+    finally:
+        connection.close()
@@ -0,0 +1,47 @@
+"""
+Shared fixtures of the tests. The synthetic files and the stand-in server of https://data.binance.vision are the
+ones of benchmark.py, so the tests and the benchmarks work on the same data.
+"""
+
+import os
+import sys
+import shutil
+import pytest
+
+repository_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repository_path)
+
+from benchmark import start_binance_vision_server, write_synthetic_dataset
+
+
+@pytest.fixture
+def binance_vision_server():
+    """
+    A local stand-in server of https://data.binance.vision (see benchmark.start_binance_vision_server()).
+    """
+    server = start_binance_vision_server()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def bundled_dataset(tmp_path) -> str:
+    """
+    Path of a copy of the bundled dataset-5m.csv.
+    """
+    path = str(tmp_path / 'dataset-5m.csv')
+    shutil.copyfile(os.path.join(repository_path, 'dataset-5m.csv'), path)
+    return path
+
+
+@pytest.fixture
+def synthetic_dataset(tmp_path):
+    """
+    Returns a function that writes a synthetic 1m dataset (see benchmark.write_synthetic_dataset()) of a number of
+    rows into the temporary folder and returns its path.
+    """
+    def write(rows: int, start_timestamp_in_s: int = 1577836800, name: str = 'dataset-1m.csv', seed: int = 0) -> str:
+        path = str(tmp_path / name)
+        write_synthetic_dataset(path, start_timestamp_in_s, rows, seed)
+        return path
+    return write
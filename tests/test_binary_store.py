@@ -0,0 +1,87 @@
+"""
+The binary columnar store of a dataset (see binary_store.py).
+"""
+
+import os
+import datetime
+import pytest
+import numpy as np
+import pandas as pd
+import binary_store
+import update_dataset as update_module
+from binary_store import import_csv_to_store, append_csv_to_store, open_store, get_store_length
+from binary_store import get_store_last_timestamp, column_path
+from update_dataset import update_dataset
+from datetime_utils import get_today_date
+
+
+def assert_store_equals_csv(store_path: str, csv_path: str) -> None:
+    store = open_store(store_path)
+    df = pd.read_csv(csv_path, header=None)
+    for i, (name, _) in enumerate(binary_store.columns):
+        assert np.array_equal(store[name], df[i].to_numpy())
+
+
+def test_import_and_open_store(synthetic_dataset, tmp_path):
+    dataset_path, store_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.bin')
+    assert import_csv_to_store(dataset_path, store_path) == 1000
+    assert get_store_length(store_path) == 1000
+    assert get_store_last_timestamp(store_path) == 1577836800 + 999 * 60
+    assert_store_equals_csv(store_path, dataset_path)
+
+
+def test_merge_appends_only_the_newer_rows(synthetic_dataset, tmp_path):
+    dataset_path, store_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.bin')
+    new_data_path = synthetic_dataset(100, 1577836800 + 950 * 60, 'new_data.csv', seed=1)
+    import_csv_to_store(dataset_path, store_path)
+    assert append_csv_to_store(new_data_path, store_path, chunk_rows=30, merge=True) == 50
+    assert append_csv_to_store(new_data_path, store_path, chunk_rows=30, merge=True) == 0
+    assert get_store_length(store_path) == 1050
+    assert get_store_last_timestamp(store_path) == 1577836800 + 1049 * 60
+
+
+def test_interrupted_append_is_truncated(synthetic_dataset, tmp_path):
+    dataset_path, store_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.bin')
+    import_csv_to_store(dataset_path, store_path)
+    # an append that was interrupted after the close column and a part of the timestamp column:
+    with open(column_path(store_path, 'close'), 'ab') as file:
+        file.write(np.zeros(10, dtype='<f8').tobytes())
+    with open(column_path(store_path, 'timestamp'), 'ab') as file:
+        file.write(b'\x01\x02\x03')
+    assert get_store_length(store_path) == 1000
+    assert append_csv_to_store(synthetic_dataset(10, 1577836800 + 1000 * 60, 'new_data.csv', seed=1), store_path) == 10
+    sizes = {os.path.getsize(column_path(store_path, name)) for name, _ in binary_store.columns}
+    assert sizes == {1010 * 8}
+    assert get_store_last_timestamp(store_path) == 1577836800 + 1009 * 60
+
+
+def test_update_resumes_an_append_to_the_store_that_was_interrupted_between_chunks(binance_vision_server, tmp_path,
+                                                                                   monkeypatch):
+    today = datetime.datetime(*get_today_date(), tzinfo=datetime.timezone.utc)
+    dataset_path, store_path = str(tmp_path / 'dataset-1h.csv'), str(tmp_path / 'dataset-1h.bin')
+    with open(dataset_path, 'w') as dataset_file:
+        for timestamp in range(int((today - datetime.timedelta(days=4)).timestamp()),
+                               int((today - datetime.timedelta(days=3)).timestamp()), 3600):
+            dataset_file.write(f'{timestamp},42000.0,42010.0,41990.0,42005.0\n')
+
+    # the process is killed in the second chunk of the first unit, in the middle of its timestamp column:
+    append_rows_to_store = binary_store.append_rows_to_store
+    def interrupted_append_rows_to_store(df: pd.DataFrame, store_path: str) -> int:
+        if get_store_length(store_path) > 24:
+            for i, (name, dtype) in reversed(list(enumerate(binary_store.columns))):
+                with open(column_path(store_path, name), 'ab') as file:
+                    data = df[i].to_numpy().astype(dtype).tobytes()
+                    file.write(data[:len(data) // 2 + 3] if name == 'timestamp' else data)
+            raise KeyboardInterrupt()
+        return append_rows_to_store(df, store_path)
+    def append_csv_to_store_in_chunks(csv_path: str, store_path: str, merge: bool = False) -> int:
+        return append_csv_to_store(csv_path, store_path, chunk_rows=10, merge=merge)
+    monkeypatch.setattr(binary_store, 'append_rows_to_store', interrupted_append_rows_to_store)
+    monkeypatch.setattr(update_module, 'append_csv_to_store', append_csv_to_store_in_chunks)
+    with pytest.raises(KeyboardInterrupt):
+        update_dataset('BTCUSDT', '1h', dataset_path, store_path=store_path, folder_path=str(tmp_path / 'update'))
+    assert 24 < get_store_length(store_path) < 48
+
+    monkeypatch.setattr(binary_store, 'append_rows_to_store', append_rows_to_store)
+    assert update_dataset('BTCUSDT', '1h', dataset_path, store_path=store_path, folder_path=str(tmp_path / 'update'))
+    assert_store_equals_csv(store_path, dataset_path)
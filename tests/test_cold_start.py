@@ -0,0 +1,23 @@
+"""
+The cold start of `update_dataset.py -status` and `-plan` (see benchmark.benchmark_cold_start()).
+"""
+
+import os
+import statistics
+import pytest
+from benchmark import run_cold, write_batch_config
+from conftest import repository_path
+
+max_start_seconds: float = 1.0 # ceiling of the median time of a run (including the interpreter startup)
+
+
+@pytest.mark.parametrize('command', ['status', 'plan'])
+def test_cold_start(tmp_path, command):
+    write_batch_config(str(tmp_path), 20)
+    times = []
+    for _ in range(3):
+        seconds, heavy_modules = run_cold([os.path.join(repository_path, 'update_dataset.py'), '-' + command,
+                                           '-batch', 'batch.json'], str(tmp_path))
+        assert heavy_modules == []
+        times.append(seconds)
+    assert statistics.median(times) < max_start_seconds
@@ -0,0 +1,29 @@
+"""
+The compressed dataset format (see compressed_dataset.py).
+"""
+
+import gzip
+import pandas as pd
+from compressed_dataset import import_csv_to_compressed, read_range
+
+
+def test_round_trip(bundled_dataset):
+    import_csv_to_compressed(bundled_dataset, bundled_dataset + '.gz')
+    with open(bundled_dataset, 'rb') as csv_file, gzip.open(bundled_dataset + '.gz', 'rb') as compressed_file:
+        assert compressed_file.read() == csv_file.read()
+
+
+def test_read_range(bundled_dataset):
+    import_csv_to_compressed(bundled_dataset, bundled_dataset + '.gz')
+    df = pd.read_csv(bundled_dataset, header=None)
+    start_timestamp, end_timestamp = int(df[0].iloc[100]), int(df[0].iloc[2000])
+    expected = df[(df[0] >= start_timestamp) & (df[0] <= end_timestamp)].reset_index(drop=True)
+    assert read_range(bundled_dataset + '.gz', start_timestamp, end_timestamp).equals(expected)
+
+
+def test_read_range_without_frames(bundled_dataset):
+    import_csv_to_compressed(bundled_dataset, bundled_dataset + '.gz')
+    df = read_range(bundled_dataset + '.gz', 1, 2)
+    assert len(df) == 0
+    assert list(df.columns) == [0, 1, 2, 3, 4]
+    assert df.dtypes.tolist() == ['int64', 'float64', 'float64', 'float64', 'float64']
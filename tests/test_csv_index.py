@@ -0,0 +1,71 @@
+"""
+The sparse sidecar index of the csv datasets (see csv_index.py).
+"""
+
+import os
+from csv_utils import concat_files
+from csv_index import build_index, update_index, find_offset, read_range, get_index_path, _load_index
+
+
+def read_lines(path: str) -> list[str]:
+    with open(path, 'r') as file:
+        return file.readlines()
+
+
+def get_timestamp(line: str) -> int:
+    return int(line.split(',', 1)[0])
+
+
+def test_index_has_every_step_th_row(synthetic_dataset):
+    dataset_path = synthetic_dataset(1050)
+    build_index(dataset_path, step=100)
+    step, entries = _load_index(dataset_path)
+    lines = read_lines(dataset_path)
+    assert step == 100
+    assert [row for row, _, _ in entries] == list(range(0, 1050, 100))
+    for row, timestamp, offset in entries:
+        assert offset == sum(len(line) for line in lines[:row])
+        assert timestamp == get_timestamp(lines[row])
+
+
+def test_update_index_reads_the_appended_rows(synthetic_dataset):
+    dataset_path = synthetic_dataset(1050)
+    build_index(dataset_path, step=100)
+    concat_files([dataset_path, synthetic_dataset(500, 1577836800 + 1050 * 60, 'new_data.csv', seed=1)])
+    update_index(dataset_path)
+    updated = _load_index(dataset_path)
+    build_index(dataset_path, step=100)
+    assert updated == _load_index(dataset_path)
+    assert updated[1][-1][0] == 1500
+
+
+def test_update_index_rebuilds_the_index_of_a_rewritten_file(synthetic_dataset):
+    dataset_path = synthetic_dataset(1050)
+    build_index(dataset_path, step=100)
+    synthetic_dataset(300, 1577836800 + 60 * 60, seed=2) # the same file, with other rows
+    update_index(dataset_path)
+    step, entries = _load_index(dataset_path)
+    assert (step, [row for row, _, _ in entries]) == (100, [0, 100, 200])
+    assert entries[0][1] == 1577836800 + 60 * 60
+
+
+def test_find_offset_is_before_the_first_matching_row(synthetic_dataset):
+    dataset_path = synthetic_dataset(1050)
+    assert not os.path.exists(get_index_path(dataset_path))
+    assert find_offset(dataset_path, 0) == 0 # builds the index
+    _, entries = _load_index(dataset_path)
+    assert entries[1][0] == 1000
+    assert find_offset(dataset_path, entries[1][1]) == 0
+    assert find_offset(dataset_path, entries[1][1] + 1) == entries[1][2]
+    assert find_offset(dataset_path, 2 ** 40) == entries[1][2]
+
+
+def test_read_range_gives_the_rows_of_the_range(synthetic_dataset):
+    dataset_path = synthetic_dataset(3000)
+    with open(dataset_path, 'a') as dataset_file:
+        dataset_file.write('\n') # a second newline at the end
+    build_index(dataset_path, step=100)
+    lines = [line for line in read_lines(dataset_path) if line != '\n']
+    for start, end in [(0, 2 ** 40), (1577836800 + 150 * 60, 1577836800 + 250 * 60),
+                       (1577836800 + 150 * 60 + 1, 1577836800 + 150 * 60 + 59), (1577836800 + 2999 * 60, 2 ** 40)]:
+        assert list(read_range(dataset_path, start, end)) == [line for line in lines if start <= get_timestamp(line) <= end]
@@ -0,0 +1,66 @@
+"""
+Appending to csv datasets (see csv_utils.py).
+"""
+
+import os
+import pytest
+import csv_utils
+from csv_utils import concat_files, recover_interrupted_append, get_append_marker_path
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_failed_append_is_rolled_back(synthetic_dataset, monkeypatch):
+    dataset_path = synthetic_dataset(1000)
+    new_data_path = synthetic_dataset(100, 1577836800 + 1000 * 60, 'new_data.csv', seed=1)
+    original = read_bytes(dataset_path)
+
+    def failing_copy_file(source, destination, buffer_size: int, start: int = 0):
+        destination.write(read_bytes(new_data_path)[:100]) # a part of the rows, ending in a torn line
+        destination.flush()
+        raise OSError('No space left on device')
+    monkeypatch.setattr(csv_utils, 'copy_file', failing_copy_file)
+    with pytest.raises(OSError):
+        concat_files([dataset_path, new_data_path])
+    assert read_bytes(dataset_path) == original
+    assert not os.path.exists(get_append_marker_path(dataset_path))
+
+
+def test_interrupted_append_is_rolled_back(synthetic_dataset):
+    dataset_path = synthetic_dataset(1000)
+    new_data_path = synthetic_dataset(100, 1577836800 + 1000 * 60, 'new_data.csv', seed=1)
+    original = read_bytes(dataset_path)
+
+    # a process that was killed while appending leaves the marker with the original length and a torn line:
+    with open(get_append_marker_path(dataset_path), 'w') as marker:
+        marker.write(str(len(original)))
+    with open(dataset_path, 'ab') as dataset_file:
+        dataset_file.write(b'1577896800,42000.0,420')
+    assert recover_interrupted_append(dataset_path)
+    assert read_bytes(dataset_path) == original
+    assert not os.path.exists(get_append_marker_path(dataset_path))
+    assert not recover_interrupted_append(dataset_path)
+
+    # the next append rolls a leftover marker back too:
+    with open(get_append_marker_path(dataset_path), 'w') as marker:
+        marker.write(str(len(original)))
+    with open(dataset_path, 'ab') as dataset_file:
+        dataset_file.write(b'1577896800,42000.0,420')
+    concat_files([dataset_path, new_data_path])
+    assert read_bytes(dataset_path) == original + read_bytes(new_data_path)
+
+
+def test_merge_skips_the_rows_that_are_already_in_the_dataset(synthetic_dataset, tmp_path):
+    lines = open(synthetic_dataset(1100), 'r').readlines()
+    dataset_path, overlapping_path, old_path = (str(tmp_path / name) for name in ['dataset.csv', 'overlapping.csv', 'old.csv'])
+    for path, part in [(dataset_path, lines[:1000]), (overlapping_path, lines[900:]), (old_path, lines[100:500])]:
+        with open(path, 'w') as file:
+            file.writelines(part)
+
+    concat_files([dataset_path, old_path], merge=True) # only rows that are already in the dataset
+    assert open(dataset_path, 'r').readlines() == lines[:1000]
+    concat_files([dataset_path, overlapping_path], merge=True)
+    assert open(dataset_path, 'r').readlines() == lines
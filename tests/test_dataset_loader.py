@@ -0,0 +1,53 @@
+"""
+The incremental-parse loader (see dataset_loader.py).
+"""
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from csv_utils import concat_files
+from dataset_loader import load_dataset, update_cache, get_cache_path
+
+
+def assert_loaded(dataset_path: str):
+    data = load_dataset(dataset_path)
+    df = pd.read_csv(dataset_path, header=None, usecols=[0, 1, 2, 3, 4])
+    for i, name in enumerate(['timestamp', 'open', 'high', 'low', 'close']):
+        assert np.array_equal(data[name], df[i].to_numpy())
+    assert load_dataset(dataset_path, as_dataframe=True).equals(df)
+
+
+def test_only_appended_rows_are_parsed(synthetic_dataset):
+    dataset_path = synthetic_dataset(10_000)
+    assert update_cache(dataset_path) == 10_000
+    assert update_cache(dataset_path) == 0
+    concat_files([dataset_path, synthetic_dataset(1440, 1577836800 + 10_000 * 60, 'new_data.csv', seed=1)])
+    assert update_cache(dataset_path) == 1440
+    assert_loaded(dataset_path)
+
+
+def test_changed_prefix_rebuilds_the_cache(synthetic_dataset):
+    dataset_path = synthetic_dataset(10_000)
+    load_dataset(dataset_path)
+    with open(dataset_path, 'r+b') as dataset_file:
+        dataset_file.write(b'2') # same length, same inode
+    assert update_cache(dataset_path) == 10_000
+    assert_loaded(dataset_path)
+
+
+def test_replaced_dataset_rebuilds_the_cache(synthetic_dataset):
+    dataset_path = synthetic_dataset(10_000)
+    load_dataset(dataset_path)
+    shutil.copyfile(dataset_path, dataset_path + '.copy')
+    os.replace(dataset_path + '.copy', dataset_path)
+    assert update_cache(dataset_path) == 10_000
+    assert os.path.isdir(get_cache_path(dataset_path))
+    assert_loaded(dataset_path)
+
+
+def test_partial_row_is_not_parsed(synthetic_dataset):
+    dataset_path = synthetic_dataset(10_000)
+    with open(dataset_path, 'ab') as dataset_file:
+        dataset_file.write(b'1578436800,42000.0,42') # a row that is still being written
+    assert len(load_dataset(dataset_path)['timestamp']) == 10_000
@@ -0,0 +1,68 @@
+"""
+The writer lock and the snapshot reads of a dataset (see dataset_lock.py).
+"""
+
+import os
+import sys
+import subprocess
+import pytest
+from csv_utils import concat_files
+from dataset_lock import writer_lock, open_snapshot, get_lock_path
+from update_dataset import update_dataset
+from conftest import repository_path
+
+# takes the writer lock of a dataset in another process, and prints whether it got it:
+_second_writer_script = '''
+import sys
+from dataset_lock import writer_lock
+try:
+    with writer_lock(sys.argv[1], blocking=False):
+        print('locked')
+except Exception as e:
+    print(e)
+'''
+
+
+def run_second_writer(dataset_path: str) -> str:
+    process = subprocess.run([sys.executable, '-c', _second_writer_script, dataset_path], cwd=repository_path,
+                             capture_output=True, text=True, check=True)
+    return process.stdout.strip()
+
+
+def test_second_writer_fails(bundled_dataset):
+    with writer_lock(bundled_dataset, blocking=False):
+        assert run_second_writer(bundled_dataset) == f'Error: {bundled_dataset} is being updated by another process.'
+        with pytest.raises(Exception, match='being updated by another process'):
+            update_dataset('BTCUSDT', '5m', bundled_dataset)
+    assert run_second_writer(bundled_dataset) == 'locked'
+
+
+def test_missing_dataset_gets_no_lock_file(tmp_path):
+    dataset_path = str(tmp_path / 'missing.csv')
+    with pytest.raises(Exception, match='does not exist'):
+        update_dataset('BTCUSDT', '5m', dataset_path)
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_snapshot_ends_at_the_committed_length(synthetic_dataset):
+    dataset_path = synthetic_dataset(1000)
+    concat_files([dataset_path, synthetic_dataset(100, 1577836800 + 1000 * 60, 'new_data.csv', seed=1)])
+    with open(dataset_path, 'rb') as dataset_file:
+        committed = dataset_file.read()
+
+    # rows of an append that is still running:
+    with open(dataset_path, 'ab') as dataset_file:
+        dataset_file.write(b'1577902800,42000.0,42005.0,41995.0,42000.0\n1577902860,42000.0,4')
+    with open_snapshot(dataset_path) as snapshot:
+        assert snapshot.read() == committed
+        assert snapshot.seek(0, os.SEEK_END) == len(committed)
+
+
+def test_snapshot_without_record_ends_at_the_last_complete_row(synthetic_dataset):
+    dataset_path = synthetic_dataset(1000)
+    with open(dataset_path, 'rb') as dataset_file:
+        complete = dataset_file.read()
+    with open(dataset_path, 'ab') as dataset_file:
+        dataset_file.write(b'1577896800,42000.0,4')
+    with open_snapshot(dataset_path) as snapshot:
+        assert snapshot.read() == complete
@@ -0,0 +1,99 @@
+"""
+The download cache (see download_cache.py) with the stand-in server of https://data.binance.vision.
+"""
+
+import os
+import sys
+import subprocess
+import fetch_data
+import download_cache
+from fetch_data import fetch_file, download_files, generate_url_and_file_name
+from download_cache import get_cache_entry, use_cache_entry, evict_cache
+from conftest import repository_path
+
+
+def test_entry_evicted_after_the_hit_is_downloaded(binance_vision_server, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / 'cache')
+    url, file_name = generate_url_and_file_name('BTCUSDT', '1m', 2024, 1, 1)
+    assert fetch_file(url, str(tmp_path / file_name), cache_dir=cache_dir)['ok']
+    assert get_cache_entry(cache_dir, url)['verified']
+
+    # another thread evicts the entry between get_cache_entry() and use_cache_entry():
+    def get_cache_entry_then_evict(cache_dir: str, url: str):
+        entry = download_cache.get_cache_entry(cache_dir, url)
+        evict_cache(cache_dir, 0)
+        return entry
+    monkeypatch.setattr(fetch_data, 'get_cache_entry', get_cache_entry_then_evict)
+    os.remove(str(tmp_path / file_name))
+    result = fetch_file(url, str(tmp_path / file_name), cache_dir=cache_dir)
+    assert result['ok'] and not result['cache_hit']
+    with open(str(tmp_path / file_name), 'rb') as file:
+        assert file.read() == binance_vision_server.files['/data/spot/daily/klines/BTCUSDT/1m/' + file_name]
+
+
+def test_use_of_an_evicted_entry_is_a_miss(binance_vision_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    url, file_name = generate_url_and_file_name('BTCUSDT', '1m', 2024, 1, 1)
+    fetch_file(url, str(tmp_path / file_name), cache_dir=cache_dir)
+    evict_cache(cache_dir, 0)
+    assert not use_cache_entry(cache_dir, url, str(tmp_path / 'copy.zip'))
+    assert not os.path.exists(str(tmp_path / 'copy.zip'))
+
+
+def test_concurrent_downloads_with_a_small_cache(binance_vision_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    downloads = []
+    for dd in range(1, 21):
+        url, file_name = generate_url_and_file_name('BTCUSDT', '1m', 2024, 1, dd)
+        downloads.append((url, str(tmp_path / file_name)))
+    for _ in range(3):
+        results = list(download_files(downloads, 8, cache_dir=cache_dir, cache_max_bytes=1))
+        assert all(result['ok'] for result in results)
+
+
+def test_incomplete_entries_are_skipped(binance_vision_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    urls = []
+    for dd in range(1, 4):
+        url, file_name = generate_url_and_file_name('BTCUSDT', '1m', 2024, 1, dd)
+        assert fetch_file(url, str(tmp_path / file_name), cache_dir=cache_dir)['ok']
+        urls.append(url)
+
+    # another process is writing the metadata of the first entry, and has evicted the file of the second one:
+    data_path, metadata_path = download_cache._entry_paths(cache_dir, urls[0])
+    with open(metadata_path, 'w') as metadata_file:
+        metadata_file.write('{"url": "' + urls[0][:10])
+    data_path, metadata_path = download_cache._entry_paths(cache_dir, urls[1])
+    os.remove(data_path)
+    assert get_cache_entry(cache_dir, urls[0]) is None
+    assert get_cache_entry(cache_dir, urls[1]) is None
+    assert not use_cache_entry(cache_dir, urls[1], str(tmp_path / 'copy.zip'))
+    assert evict_cache(cache_dir, 0) == 2
+    entry_paths = download_cache._entry_paths(cache_dir, urls[0])
+    assert sorted(os.listdir(cache_dir)) == sorted(os.path.basename(path) for path in entry_paths)
+
+
+def test_processes_sharing_a_cache(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    file_path = str(tmp_path / 'file.zip')
+    with open(file_path, 'wb') as file:
+        file.write(os.urandom(1000))
+    # every process adds and evicts the same entries, reading them in between:
+    script = '''
+import sys
+from download_cache import add_to_cache, get_cache_entry, use_cache_entry, evict_cache
+cache_dir, file_path = sys.argv[1], sys.argv[2]
+for i in range(200):
+    url = f'https://data.binance.vision/{i % 5}.zip'
+    add_to_cache(cache_dir, url, file_path, 'sha256', True)
+    get_cache_entry(cache_dir, url)
+    use_cache_entry(cache_dir, url, file_path + sys.argv[3])
+    evict_cache(cache_dir, 2000)
+'''
+    processes = [subprocess.Popen([sys.executable, '-c', script, cache_dir, file_path, str(i)], cwd=repository_path,
+                                  stderr=subprocess.PIPE, text=True) for i in range(4)]
+    for process in processes:
+        assert process.wait() == 0, process.stderr.read()
+        process.stderr.close()
+    assert evict_cache(cache_dir, 0) <= 2
+    assert os.listdir(cache_dir) == []
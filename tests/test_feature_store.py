@@ -0,0 +1,80 @@
+"""
+The incrementally maintained feature store (see feature_store.py).
+"""
+
+import os
+import datetime
+import numpy as np
+from csv_utils import concat_files
+from feature_store import update_features, open_features, get_feature_store_path, feature_columns
+from update_dataset import update_dataset, repair_dataset
+
+
+def assert_same_features(feature_path: str, expected_feature_path: str):
+    features, expected = open_features(feature_path), open_features(expected_feature_path)
+    for name, _ in feature_columns:
+        assert np.array_equal(features[name], expected[name], equal_nan=True)
+
+
+def test_incremental_update_equals_full_build(synthetic_dataset, tmp_path):
+    lines = open(synthetic_dataset(5000), 'r').readlines()
+    dataset_path = str(tmp_path / 'growing-1m.csv')
+    with open(dataset_path, 'w') as dataset_file:
+        dataset_file.writelines(lines[:1234])
+    update_features(dataset_path, chunk_rows=500)
+    with open(str(tmp_path / 'new_data.csv'), 'w') as new_data_file:
+        new_data_file.writelines(lines[1234:])
+    concat_files([dataset_path, str(tmp_path / 'new_data.csv')])
+    assert update_features(dataset_path, chunk_rows=500) == 5000 - 1234
+
+    update_features(str(tmp_path / 'dataset-1m.csv'), str(tmp_path / 'full.features'))
+    assert_same_features(get_feature_store_path(dataset_path), str(tmp_path / 'full.features'))
+
+
+def test_rows_spliced_into_the_history_rebuild_the_store(synthetic_dataset, tmp_path):
+    full_path = synthetic_dataset(5000)
+    lines = open(full_path, 'r').readlines()
+    dataset_path = str(tmp_path / 'holes-1m.csv')
+    with open(dataset_path, 'w') as dataset_file:
+        dataset_file.writelines(lines[:1000] + lines[1100:])
+    update_features(dataset_path)
+
+    # like a repair: the missing rows are spliced in, and the dataset is replaced:
+    with open(dataset_path + '.tmp', 'w') as dataset_file:
+        dataset_file.writelines(lines)
+    os.replace(dataset_path + '.tmp', dataset_path)
+    assert update_features(dataset_path) == 5000
+
+    update_features(full_path, str(tmp_path / 'full.features'))
+    assert_same_features(get_feature_store_path(dataset_path), str(tmp_path / 'full.features'))
+
+
+def test_changed_rows_in_place_rebuild_the_store(synthetic_dataset, tmp_path):
+    dataset_path = synthetic_dataset(5000)
+    update_features(dataset_path)
+    with open(dataset_path, 'r+b') as dataset_file:
+        dataset_file.seek(12) # a digit of the open price of the first row (same length, same inode)
+        digit = dataset_file.read(1)
+        dataset_file.seek(12)
+        dataset_file.write(b'1' if digit != b'1' else b'2')
+    assert update_features(dataset_path) == 5000
+
+
+def test_repair_rebuilds_the_feature_store(binance_vision_server, tmp_path):
+    dataset_path = str(tmp_path / 'dataset-5m.csv')
+    start = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) \
+        - datetime.timedelta(days=4)
+    with open(dataset_path, 'w') as dataset_file:
+        dataset_file.write(f'{int(start.timestamp()) - 300},42000.0,42010.0,41990.0,42005.0\n')
+    update_dataset('BTCUSDT', '5m', dataset_path, folder_path=str(tmp_path / 'update'))
+
+    lines = open(dataset_path, 'r').readlines()
+    with open(dataset_path + '.tmp', 'w') as dataset_file:
+        dataset_file.writelines(lines[:400] + lines[500:]) # a hole of 100 rows on the second day
+    os.replace(dataset_path + '.tmp', dataset_path)
+    update_features(dataset_path)
+
+    report = repair_dataset('BTCUSDT', '5m', dataset_path, folder_path=str(tmp_path / 'repair'))
+    assert report['inserted_rows'] == 100
+    update_features(dataset_path, str(tmp_path / 'full.features'))
+    assert_same_features(get_feature_store_path(dataset_path), str(tmp_path / 'full.features'))
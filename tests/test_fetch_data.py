@@ -0,0 +1,67 @@
+"""
+Concurrent downloads from the stand-in server of https://data.binance.vision (see fetch_data.py).
+"""
+
+import os
+import zipfile
+from urllib.parse import urlparse
+from fetch_data import download_files, generate_url_and_file_name
+
+
+def get_downloads(folder_path: str, days: list[int]) -> list[tuple[str, str]]:
+    """
+    Returns (url, download_path) of the 1h files of the given days of January 2024.
+    """
+    downloads = []
+    for day in days:
+        url, file_name = generate_url_and_file_name('BTCUSDT', '1h', 2024, 1, day)
+        downloads.append((url, os.path.join(folder_path, file_name)))
+    return downloads
+
+
+def test_every_file_gets_its_own_result(binance_vision_server, tmp_path):
+    downloads = get_downloads(str(tmp_path), [1, 2, 3, 4])
+    binance_vision_server.missing.add(urlparse(downloads[1][0]).path)
+
+    results = download_files(downloads, max_workers=4, backoff=0)
+    assert [result['url'] for result in results] == [url for url, _ in downloads]
+    assert [result['ok'] for result in results] == [True, False, True, True]
+    assert (results[1]['status_code'], results[1]['attempts']) == (404, 1)
+    assert not os.path.exists(downloads[1][1])
+    for (_, path), result in zip(downloads, results):
+        if result['ok']:
+            assert result['bytes'] == os.path.getsize(path)
+            assert zipfile.ZipFile(path).namelist() == [os.path.basename(path)[:-len('.zip')] + '.csv']
+
+
+def test_download_that_breaks_off_is_retried(binance_vision_server, tmp_path):
+    downloads = get_downloads(str(tmp_path), [1, 2])
+    binance_vision_server.broken[urlparse(downloads[0][0]).path] = 2
+
+    results = download_files(downloads, max_workers=2, retries=3, backoff=0)
+    assert [(result['ok'], result['attempts']) for result in results] == [(True, 3), (True, 1)]
+    assert results[0]['bytes'] == os.path.getsize(downloads[0][1])
+    zipfile.ZipFile(downloads[0][1]).testzip()
+
+
+def test_download_that_keeps_breaking_off_fails(binance_vision_server, tmp_path):
+    downloads = get_downloads(str(tmp_path), [1, 2])
+    binance_vision_server.broken[urlparse(downloads[0][0]).path] = 3
+
+    results = download_files(downloads, max_workers=2, retries=2, backoff=0)
+    assert [(result['ok'], result['attempts']) for result in results] == [(False, 3), (True, 1)]
+    assert 'could not be downloaded completely' in results[0]['error']
+    assert not os.path.exists(downloads[0][1])
+
+
+def test_cached_files_are_not_downloaded_again(binance_vision_server, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    os.makedirs(str(tmp_path / 'first'))
+    results = download_files(get_downloads(str(tmp_path / 'first'), [1, 2]), cache_dir=cache_dir)
+    assert [(result['ok'], result['cache_hit']) for result in results] == [(True, False), (True, False)]
+
+    os.makedirs(str(tmp_path / 'second'))
+    downloads = get_downloads(str(tmp_path / 'second'), [1, 2])
+    results = download_files(downloads, cache_dir=cache_dir)
+    assert [(result['ok'], result['cache_hit']) for result in results] == [(True, True), (True, True)]
+    assert open(downloads[0][1], 'rb').read() == open(str(tmp_path / 'first' / os.path.basename(downloads[0][1])), 'rb').read()
@@ -0,0 +1,15 @@
+"""
+The memory ceiling of downloading, reformating and appending a large 1s file (see benchmark.benchmark_memory()).
+"""
+
+import pytest
+from benchmark import benchmark_memory
+
+max_extra_rss_mb: float = 150 # ceiling of the memory used on top of the baseline (python + pandas)
+
+
+def test_memory_ceiling():
+    result = benchmark_memory(rows=500_000, chunk_rows=100_000)
+    if result['extra_rss_mb'] is None:
+        pytest.skip('The peak memory usage is not available on this platform.')
+    assert result['extra_rss_mb'] < max_extra_rss_mb
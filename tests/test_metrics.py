@@ -0,0 +1,55 @@
+"""
+The metrics records of the update pipeline (see metrics.py).
+"""
+
+import sys
+import subprocess
+import pytest
+from metrics import timed, emit, add_hook, remove_hook
+from conftest import repository_path
+
+
+@pytest.fixture
+def records():
+    records = []
+    add_hook(records.append)
+    yield records
+    remove_hook(records.append)
+
+
+def test_timed_emits_the_fields_and_the_duration(records):
+    with timed('reformat', zip_path='BTCUSDT-1m-2024-01-01.zip') as fields:
+        fields['rows'] = 1440
+    assert len(records) == 1
+    record = records[0]
+    assert (record['event'], record['zip_path'], record['rows']) == ('reformat', 'BTCUSDT-1m-2024-01-01.zip', 1440)
+    assert record['seconds'] >= 0 and record['time'] > 0
+    assert 'error' not in record
+
+
+def test_timed_emits_the_error_of_the_block(records):
+    with pytest.raises(ValueError):
+        with timed('append', path='dataset-1m.csv'):
+            raise ValueError('torn line')
+    assert records[0]['event'] == 'append' and records[0]['error'] == "ValueError('torn line')"
+
+
+def test_failing_hook_does_not_stop_the_other_hooks(records, capsys):
+    def failing_hook(record: dict) -> None:
+        raise Exception('full')
+    add_hook(failing_hook)
+    try:
+        emit('download', ok=True)
+    finally:
+        remove_hook(failing_hook)
+    assert [record['event'] for record in records] == ['download']
+    assert 'failed: full' in capsys.readouterr().out
+    emit('download', ok=False)
+    assert len(records) == 2
+
+
+def test_no_records_without_a_hook():
+    # importing and running the updater as a library writes nothing to stderr:
+    process = subprocess.run([sys.executable, '-c', 'import metrics, update_dataset; metrics.emit("update", ok=True)'],
+                             cwd=repository_path, capture_output=True, text=True, check=True)
+    assert process.stderr == ''
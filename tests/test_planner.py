@@ -0,0 +1,99 @@
+"""
+Regression tests of the download planner (update_dataset.plan_downloads()) against the original planner, which
+planned every missing range on its own, with monthly files only for whole calendar months.
+"""
+
+import datetime
+import pytest
+from update_dataset import plan_downloads, request_cost_bytes, zip_bytes_per_row, monthly_publication_lag_days
+from datetime_utils import time_frame_to_seconds, get_last_day_of_month
+
+
+def download_plan_full_months(yy_start: int, mm_start: int, dd_start: int, yy_last: int, mm_last: int, dd_last: int) -> list[dict]:
+    """
+    The original planner of update_dataset.get_download_plan() (monthly files only for whole calendar months inside
+    the range, daily files for everything else).
+    """
+    start_date = datetime.datetime(yy_start, mm_start, dd_start)
+    end_date = datetime.datetime(yy_last, mm_last, dd_last)
+    if start_date == end_date:
+        return [{'data_type': 'd', 'start_date': [yy_start, mm_start, dd_start], 'end_date': [yy_last, mm_last, dd_last]}]
+    download_plan = []
+    temp_date = start_date - datetime.timedelta(days=1)
+    while temp_date != end_date:
+        temp_date = temp_date + datetime.timedelta(days=1)
+        _, _, temp_date_ldm = get_last_day_of_month(temp_date.year, temp_date.month)
+        if temp_date.day == 1 and datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm) <= end_date:
+            download_plan.append({'data_type': 'm', 'start_date': [temp_date.year, temp_date.month], 'end_date': []})
+            temp_date = datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm)
+        elif temp_date.year == end_date.year and temp_date.month == end_date.month:
+            download_plan.append({'data_type': 'd', 'start_date': [temp_date.year, temp_date.month, temp_date.day],
+                                  'end_date': [end_date.year, end_date.month, end_date.day]})
+            temp_date = end_date
+        else:
+            download_plan.append({'data_type': 'd', 'start_date': [temp_date.year, temp_date.month, temp_date.day],
+                                  'end_date': [temp_date.year, temp_date.month, temp_date_ldm]})
+            temp_date = datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm)
+    return download_plan
+
+
+def _day(yy: int, mm: int, dd: int) -> int:
+    return datetime.date(yy, mm, dd).toordinal() - datetime.date(1970, 1, 1).toordinal()
+
+
+def _plan_cost(download_plan: list[dict], time_frame: str, today: tuple[int, int, int]) -> dict:
+    """
+    Returns the number of requests, the estimated bytes (see zip_bytes_per_row), the number of monthly files that are
+    not published yet (see monthly_publication_lag_days) and the covered days of a plan.
+    """
+    day_bytes = max(1, 86400 // time_frame_to_seconds(time_frame)) * zip_bytes_per_row
+    cost = {'requests': 0, 'bytes': 0, 'unpublished': 0, 'days': set()}
+    for entry in download_plan:
+        if entry['data_type'] == 'm':
+            _, _, last_day_of_month = get_last_day_of_month(*entry['start_date'])
+            first_day = _day(*entry['start_date'], 1)
+            last_day = _day(*entry['start_date'], last_day_of_month)
+            cost['requests'] += 1
+            if _day(*today) - last_day <= monthly_publication_lag_days:
+                cost['unpublished'] += 1
+        else:
+            first_day, last_day = _day(*entry['start_date']), _day(*entry['end_date'])
+            cost['requests'] += last_day - first_day + 1
+        cost['bytes'] += (last_day - first_day + 1) * day_bytes
+        cost['days'].update(range(first_day, last_day + 1))
+    return cost
+
+
+# (case, time frame, today, missing ranges [(first date, last date)], requests of the original plan, requests of the plan)
+cases = [
+    ('update from early last month', '1m', (2024, 10, 25), [((2024, 9, 4), (2024, 10, 24))], 51, 25),
+    ('update from late last month', '1m', (2024, 10, 25), [((2024, 9, 24), (2024, 10, 24))], 31, 25),
+    ('backfill of 14 months', '1m', (2024, 10, 25), [((2023, 8, 17), (2024, 10, 24))], 52, 38),
+    ('update from early last month, 5m', '5m', (2024, 10, 25), [((2024, 9, 4), (2024, 10, 24))], 51, 25),
+    ('update from early last month, 1s', '1s', (2024, 10, 25), [((2024, 9, 4), (2024, 10, 24))], 51, 51),
+    ('update from early last month, 1h', '1h', (2024, 10, 25), [((2024, 9, 4), (2024, 10, 24))], 51, 25),
+    ('repair of 8 holes in one month', '1m', (2024, 10, 25),
+     [((2024, 7, dd), (2024, 7, dd + 1)) for dd in range(2, 30, 4)], 14, 1),
+    ('repair of 2 holes in one month', '1m', (2024, 10, 25),
+     [((2024, 7, 3), (2024, 7, 3)), ((2024, 7, 20), (2024, 7, 21))], 3, 3),
+    ('update early in the month', '1m', (2024, 10, 2), [((2024, 9, 1), (2024, 10, 1))], 2, 31),
+]
+
+
+@pytest.mark.parametrize('case, time_frame, today, ranges, original_requests, requests', cases, ids=[case[0] for case in cases])
+def test_plan_downloads(case, time_frame, today, ranges, original_requests, requests):
+    original_plan = []
+    for start, last in ranges:
+        original_plan += download_plan_full_months(*start, *last)
+    plan = plan_downloads([(_day(*start), _day(*last)) for start, last in ranges], time_frame, today)
+    original, new = _plan_cost(original_plan, time_frame, today), _plan_cost(plan, time_frame, today)
+
+    missing_days = set()
+    for start, last in ranges:
+        missing_days.update(range(_day(*start), _day(*last) + 1))
+    assert missing_days <= new['days']
+    assert new['unpublished'] == 0
+    assert (original['requests'], new['requests']) == (original_requests, requests)
+    if original['unpublished'] == 0:
+        cost = lambda plan_cost: plan_cost['requests'] * request_cost_bytes + plan_cost['bytes']
+        assert cost(new) <= cost(original)
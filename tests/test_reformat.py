@@ -0,0 +1,86 @@
+"""
+Reformating of the binance.vision zip files (see reformat_data.py).
+"""
+
+import os
+import io
+import shutil
+import datetime
+import pytest
+import pandas as pd
+from zipfile import ZipFile
+import reformat_data
+from reformat_data import reformat_binance_vision_kline_files, _reformat_in_worker
+from reformat_data import reformat_binance_vision_kline_file, reformat_binance_vision_kline_file_exact
+from benchmark import write_synthetic_kline_zip
+from verify_dataset import scan_dataset
+from update_dataset import update_dataset, repair_dataset
+
+
+def write_zip_files(folder_path: str, files: int, rows: int):
+    os.makedirs(folder_path)
+    for i in range(files):
+        write_synthetic_kline_zip(f'{folder_path}/BTCUSDT-1m-{2000 + i}-01.zip', 946684800 + i * rows * 60, 60, rows, seed=i)
+
+
+def test_exact_reformat_gives_the_same_values(tmp_path):
+    zip_path = str(tmp_path / 'BTCUSDT-1m-2024-01.zip')
+    write_synthetic_kline_zip(zip_path, 1704067200, 60, 5000)
+    parsed_file, exact_file = io.StringIO(), io.StringIO()
+    assert reformat_binance_vision_kline_file(zip_path, parsed_file, chunk_rows=1000) == 5000
+    assert reformat_binance_vision_kline_file_exact(zip_path, exact_file, chunk_size=4096) == 5000
+
+    # the exact output keeps the digits of the zip file:
+    assert exact_file.getvalue().startswith('1704067200,42000.00000000,')
+    assert parsed_file.getvalue().startswith('1704067200,42000.0,')
+    parsed_file.seek(0)
+    exact_file.seek(0)
+    assert pd.read_csv(parsed_file, header=None).equals(pd.read_csv(exact_file, header=None))
+
+
+def test_exact_reformat_rejects_lines_that_are_not_klines(tmp_path):
+    zip_path = str(tmp_path / 'BTCUSDT-1m-2024-01.zip')
+    with ZipFile(zip_path, 'w') as zip:
+        zip.writestr('BTCUSDT-1m-2024-01.csv', 'open_time,open,high,low,close,volume\n'
+                                               '1704067200000,42000.00,42010.00,41990.00,42005.00,1.5\n')
+    with pytest.raises(Exception, match='not binance.vision klines'):
+        reformat_binance_vision_kline_file_exact(zip_path, io.StringIO())
+
+
+def test_worker_processes_give_the_same_output(tmp_path):
+    write_zip_files(str(tmp_path / 'sequential'), 6, 2000)
+    shutil.copytree(str(tmp_path / 'sequential'), str(tmp_path / 'parallel'))
+    reformat_binance_vision_kline_files(str(tmp_path / 'sequential'), str(tmp_path / 'sequential.csv'))
+    reformat_binance_vision_kline_files(str(tmp_path / 'parallel'), str(tmp_path / 'parallel.csv'), max_processes=2)
+    with open(str(tmp_path / 'sequential.csv'), 'rb') as f1, open(str(tmp_path / 'parallel.csv'), 'rb') as f2:
+        assert f1.read() == f2.read()
+    assert os.listdir(str(tmp_path / 'parallel')) == []
+
+
+def test_large_files_are_written_next_to_the_zip_file(tmp_path, monkeypatch):
+    write_zip_files(str(tmp_path / 'zip'), 1, 2000)
+    zip_path = str(tmp_path / 'zip' / 'BTCUSDT-1m-2000-01.zip')
+    data, csv_path, rows = _reformat_in_worker(zip_path)
+    assert (csv_path, rows) == (None, 2000)
+
+    monkeypatch.setattr(reformat_data, 'max_worker_result_bytes', 0)
+    large_data, csv_path, rows = _reformat_in_worker(zip_path)
+    assert (large_data, rows) == (None, 2000)
+    with open(csv_path, 'rb') as csv_file:
+        assert csv_file.read() == data
+
+
+def test_repair_with_worker_processes(binance_vision_server, tmp_path):
+    dataset_path = str(tmp_path / 'dataset-5m.csv')
+    start = datetime.datetime.now(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) \
+        - datetime.timedelta(days=4)
+    with open(dataset_path, 'w') as dataset_file:
+        dataset_file.write(f'{int(start.timestamp()) - 300},42000.0,42010.0,41990.0,42005.0\n')
+    update_dataset('BTCUSDT', '5m', dataset_path, folder_path=str(tmp_path / 'update'))
+    lines = open(dataset_path, 'r').readlines()
+    with open(dataset_path, 'w') as dataset_file:
+        dataset_file.writelines(lines[:100] + lines[200:400] + lines[700:]) # holes on two days
+
+    report = repair_dataset('BTCUSDT', '5m', dataset_path, folder_path=str(tmp_path / 'repair'), max_processes=2)
+    assert report['inserted_rows'] == 400
+    assert scan_dataset(dataset_path, '5m')['missing'] == []
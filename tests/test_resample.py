@@ -0,0 +1,53 @@
+"""
+Resampling of the bundled dataset-5m.csv (see resample.py).
+"""
+
+import pytest
+from csv_utils import concat_files
+from resample import resample_dataset
+
+
+def test_same_time_frame_is_byte_identical(bundled_dataset, tmp_path):
+    output_path = str(tmp_path / 'dataset-5m-resampled.csv')
+    resample_dataset(bundled_dataset, output_path, '5m')
+    with open(bundled_dataset, 'rb') as source_file, open(output_path, 'rb') as output_file:
+        assert output_file.read() == source_file.read()
+
+
+def test_incremental_update_equals_full_rebuild(bundled_dataset, tmp_path):
+    full_path = str(tmp_path / 'dataset-1h-full.csv')
+    resample_dataset(bundled_dataset, full_path, '1h')
+
+    with open(bundled_dataset, 'r') as source_file:
+        lines = source_file.readlines()
+    # the source grows in 3 updates that end in the middle of an hour, read in small chunks:
+    source_path = str(tmp_path / 'growing-5m.csv')
+    incremental_path = str(tmp_path / 'dataset-1h-incremental.csv')
+    with open(source_path, 'w') as source_file:
+        source_file.writelines(lines[:1003])
+    resample_dataset(source_path, incremental_path, '1h', chunk_rows=500)
+    new_data_path = str(tmp_path / 'new_data.csv')
+    for start, cut in [(1003, 4507), (4507, len(lines))]:
+        with open(new_data_path, 'w') as new_data_file:
+            new_data_file.writelines(lines[start:cut])
+        concat_files([source_path, new_data_path])
+        resample_dataset(source_path, incremental_path, '1h', chunk_rows=500)
+
+    with open(full_path, 'rb') as full_file, open(incremental_path, 'rb') as incremental_file:
+        assert incremental_file.read() == full_file.read()
+
+
+def test_source_can_not_be_the_output(bundled_dataset):
+    with open(bundled_dataset, 'rb') as source_file:
+        data = source_file.read()
+    with pytest.raises(Exception, match='can not be the source dataset'):
+        resample_dataset(bundled_dataset, bundled_dataset, '5m')
+    with open(bundled_dataset, 'rb') as source_file:
+        assert source_file.read() == data
+
+
+def test_finer_time_frame_is_rejected(bundled_dataset, tmp_path):
+    with pytest.raises(Exception, match='can not be built'):
+        resample_dataset(bundled_dataset, str(tmp_path / 'dataset-1m.csv'), '1m')
+    with pytest.raises(Exception, match='can not be built'):
+        resample_dataset(bundled_dataset, str(tmp_path / 'dataset-7m.csv'), '7m')
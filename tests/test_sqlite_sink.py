@@ -0,0 +1,52 @@
+"""
+The SQLite copy of a dataset (see sqlite_sink.py).
+"""
+
+import pytest
+import pandas as pd
+from sqlite_sink import import_csv_to_database, append_csv_to_database, get_database_last_timestamp, query_range
+
+
+def read_rows(dataset_path: str) -> list[tuple]:
+    return list(pd.read_csv(dataset_path, header=None).itertuples(index=False, name=None))
+
+
+def test_import_and_query_range(synthetic_dataset, tmp_path):
+    dataset_path, database_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.sqlite')
+    assert get_database_last_timestamp(database_path) is None
+    assert import_csv_to_database(dataset_path, database_path) == 1000
+    rows = read_rows(dataset_path)
+    assert get_database_last_timestamp(database_path) == rows[-1][0]
+    assert query_range(database_path, 0, 2 ** 40) == rows
+    assert query_range(database_path, rows[100][0], rows[199][0]) == rows[100:200]
+    assert query_range(database_path, rows[100][0] + 1, rows[100][0] + 59) == []
+
+
+def test_appending_again_does_not_duplicate_rows(synthetic_dataset, tmp_path):
+    dataset_path, database_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.sqlite')
+    new_data_path = synthetic_dataset(100, 1577836800 + 950 * 60, 'new_data.csv', seed=1) # overlaps 50 rows
+    import_csv_to_database(dataset_path, database_path)
+    assert append_csv_to_database(new_data_path, database_path, chunk_rows=30) == 100
+    assert append_csv_to_database(new_data_path, database_path, chunk_rows=30) == 100 # applied again
+    rows = query_range(database_path, 0, 2 ** 40)
+    assert rows == read_rows(dataset_path)[:950] + read_rows(new_data_path) # the overlapping rows are replaced
+
+
+def test_merge_keeps_the_rows_before_the_last_row(synthetic_dataset, tmp_path):
+    dataset_path, database_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.sqlite')
+    new_data_path = synthetic_dataset(100, 1577836800 + 950 * 60, 'new_data.csv', seed=1)
+    import_csv_to_database(dataset_path, database_path)
+    assert append_csv_to_database(new_data_path, database_path, chunk_rows=30, merge=True) == 50
+    assert append_csv_to_database(new_data_path, database_path, chunk_rows=30, merge=True) == 0
+    assert query_range(database_path, 0, 2 ** 40) == read_rows(dataset_path) + read_rows(new_data_path)[50:]
+
+
+def test_failed_append_writes_nothing(synthetic_dataset, tmp_path):
+    dataset_path, database_path = synthetic_dataset(1000), str(tmp_path / 'dataset-1m.sqlite')
+    new_data_path = synthetic_dataset(100, 1577836800 + 1000 * 60, 'new_data.csv', seed=1)
+    import_csv_to_database(dataset_path, database_path)
+    with open(new_data_path, 'a') as new_data_file:
+        new_data_file.write('1577902800,42000.0,not a price,41995.0,42000.0\n')
+    with pytest.raises(ValueError):
+        append_csv_to_database(new_data_path, database_path, chunk_rows=30)
+    assert query_range(database_path, 0, 2 ** 40) == read_rows(dataset_path)
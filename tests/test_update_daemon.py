@@ -0,0 +1,74 @@
+"""
+The resident updater that polls for newly published daily files (see update_daemon.py).
+"""
+
+import datetime
+import pytest
+import fetch_data
+from urllib.parse import urlparse
+from update_daemon import get_next_daily_url, watch_datasets
+from datetime_utils import get_today_date
+
+
+def get_today() -> datetime.datetime:
+    return datetime.datetime(*get_today_date(), tzinfo=datetime.timezone.utc)
+
+
+def write_dataset(dataset_path: str, start: datetime.datetime, end: datetime.datetime, interval_in_s: int = 3600) -> None:
+    with open(dataset_path, 'w') as dataset_file:
+        for timestamp in range(int(start.timestamp()), int(end.timestamp()), interval_in_s):
+            dataset_file.write(f'{timestamp},42000.0,42010.0,41990.0,42005.0\n')
+
+
+def get_daily_url(day: datetime.datetime, time_frame: str = '1h') -> str:
+    return fetch_data.main_url_daily + f'BTCUSDT/{time_frame}/BTCUSDT-{time_frame}-' + day.strftime('%Y-%m-%d') + '.zip'
+
+
+def read_last_timestamp(dataset_path: str) -> int:
+    with open(dataset_path, 'r') as dataset_file:
+        return int(dataset_file.readlines()[-1].split(',')[0])
+
+
+@pytest.mark.parametrize('end, next_day', [
+    (datetime.timedelta(days=-3), datetime.timedelta(days=-3)), # ends with the last candle of a day
+    (datetime.timedelta(days=-3, hours=12), datetime.timedelta(days=-3)), # ends in the middle of a day
+    (datetime.timedelta(days=-1, hours=-12), datetime.timedelta(days=-2)),
+    (datetime.timedelta(days=0), None), # the next day is today, whose file is not published yet
+    (datetime.timedelta(hours=6), None),
+])
+def test_next_daily_url(tmp_path, end, next_day):
+    today = get_today()
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    write_dataset(dataset_path, today - datetime.timedelta(days=6), today + end)
+    expected = get_daily_url(today + next_day) if next_day is not None else None
+    assert get_next_daily_url('BTCUSDT', '1h', dataset_path) == expected
+
+
+def test_next_daily_url_of_an_empty_dataset(tmp_path):
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    open(dataset_path, 'w').close()
+    with pytest.raises(Exception, match='is empty, it needs a full download'):
+        get_next_daily_url('BTCUSDT', '1h', dataset_path)
+
+
+def test_watch_updates_the_datasets_whose_next_file_is_published(binance_vision_server, tmp_path, capsys):
+    today = get_today()
+    published_path, unpublished_path = str(tmp_path / 'dataset-1h.csv'), str(tmp_path / 'dataset-15m.csv')
+    write_dataset(published_path, today - datetime.timedelta(days=5), today - datetime.timedelta(days=3))
+    write_dataset(unpublished_path, today - datetime.timedelta(days=5), today - datetime.timedelta(days=1), 900)
+    binance_vision_server.missing.add(urlparse(get_daily_url(today - datetime.timedelta(days=1), '15m')).path)
+    targets = [{'asset_pair': 'BTCUSDT', 'time_frame': '1h', 'path': published_path},
+               {'asset_pair': 'BTCUSDT', 'time_frame': '15m', 'path': unpublished_path}]
+
+    watch_datasets(targets, poll_interval=0, max_workers=2, max_processes=1, max_polls=2)
+    output = capsys.readouterr().out
+    # the second poll finds nothing to do:
+    assert output.count('datasets have new data.') == 1
+    assert '1 of 2 datasets have new data.' in output and f'{published_path}: updated' in output
+    assert read_last_timestamp(published_path) == int(today.timestamp()) - 3600
+    assert read_last_timestamp(unpublished_path) == int(today.timestamp()) - 86400 - 900
+
+    binance_vision_server.missing.clear()
+    watch_datasets(targets, poll_interval=0, max_workers=2, max_processes=1, max_polls=1)
+    assert '1 of 2 datasets have new data.' in capsys.readouterr().out
+    assert read_last_timestamp(unpublished_path) == int(today.timestamp()) - 900
@@ -0,0 +1,252 @@
+"""
+Updates of a dataset from the stand-in server of https://data.binance.vision (see update_dataset.py).
+"""
+
+import os
+import json
+import time
+import datetime
+import threading
+import pytest
+import pandas as pd
+import update_dataset as update_module
+from urllib.parse import urlparse
+from update_dataset import update_dataset, plan_update, prepare_update, run_update_pipeline, get_update_status
+from update_dataset import get_missing_date_range, load_batch_config, update_datasets
+from compressed_dataset import create_compressed
+from update_journal import load_journal, get_journal_path
+from sqlite_sink import query_range
+from datetime_utils import get_today_date
+
+
+def write_dataset(dataset_path: str, start: datetime.datetime, end: datetime.datetime, interval_in_s: int) -> None:
+    """
+    Writes a dataset with a row every :param interval_in_s seconds from :param start until before :param end.
+    """
+    with open(dataset_path, 'w') as dataset_file:
+        for timestamp in range(int(start.timestamp()), int(end.timestamp()), interval_in_s):
+            dataset_file.write(f'{timestamp},42000.0,42010.0,41990.0,42005.0\n')
+
+
+def read_rows(dataset_path: str) -> list[tuple]:
+    return list(pd.read_csv(dataset_path, header=None).itertuples(index=False, name=None))
+
+
+def get_today() -> datetime.datetime:
+    return datetime.datetime(*get_today_date(), tzinfo=datetime.timezone.utc)
+
+
+def assert_up_to_date(dataset_path: str, interval_in_s: int) -> None:
+    """
+    Checks that the dataset has a row every :param interval_in_s seconds until the last candle of yesterday.
+    """
+    timestamps = [row[0] for row in read_rows(dataset_path)]
+    assert all(next_timestamp - timestamp == interval_in_s for timestamp, next_timestamp in zip(timestamps, timestamps[1:]))
+    assert timestamps[-1] == int(get_today().timestamp()) - interval_in_s
+
+
+def test_monthly_file_is_not_written_before_the_end_of_the_database(binance_vision_server, tmp_path):
+    # a dataset that ends on the 4th of the month before the last month, whose monthly file is published:
+    yy, mm, _ = get_today_date()
+    yy, mm = (yy, mm - 2) if mm > 2 else (yy - 1, mm + 10)
+    dataset_path, database_path = str(tmp_path / 'dataset-1h.csv'), str(tmp_path / 'dataset-1h.sqlite')
+    write_dataset(dataset_path, datetime.datetime(yy, mm, 3, tzinfo=datetime.timezone.utc),
+                  datetime.datetime(yy, mm, 5, tzinfo=datetime.timezone.utc), 3600)
+    downloads = plan_update('BTCUSDT', '1h', dataset_path, str(tmp_path / 'update'), database_path=database_path)
+    assert downloads[0][0].endswith(f'BTCUSDT-1h-{yy}-{mm:02d}.zip')
+
+    assert update_dataset('BTCUSDT', '1h', dataset_path, folder_path=str(tmp_path / 'update'),
+                          database_path=database_path)
+    rows = read_rows(dataset_path)
+    assert all(row[0] < next_row[0] for row, next_row in zip(rows, rows[1:]))
+    assert query_range(database_path, 0, 2 ** 40) == rows
+
+
+def test_update_is_resumed_after_a_missing_file(binance_vision_server, tmp_path):
+    today = get_today()
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    write_dataset(dataset_path, today - datetime.timedelta(days=6), today - datetime.timedelta(days=4), 3600)
+    missing_day = today - datetime.timedelta(days=2)
+    binance_vision_server.missing.add('/data/spot/daily/klines/BTCUSDT/1h/BTCUSDT-1h-' + missing_day.strftime('%Y-%m-%d') + '.zip')
+
+    # the day before the missing file is appended, the rest is left in the journal:
+    assert not update_dataset('BTCUSDT', '1h', dataset_path, folder_path=str(tmp_path / 'update'))
+    assert read_rows(dataset_path)[-1][0] == int(missing_day.timestamp()) - 3600
+    states = [unit['state'] for unit in load_journal(dataset_path)['units']]
+    assert states == ['appended', 'appended', 'planned', 'planned']
+
+    binance_vision_server.missing.clear()
+    assert update_dataset('BTCUSDT', '1h', dataset_path, folder_path=str(tmp_path / 'update'))
+    assert_up_to_date(dataset_path, 3600)
+    assert not os.path.exists(get_journal_path(dataset_path))
+    assert not os.path.exists(str(tmp_path / 'update'))
+
+
+def test_update_is_resumed_after_a_crash_after_reformating(binance_vision_server, tmp_path, monkeypatch):
+    today = get_today()
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    write_dataset(dataset_path, today - datetime.timedelta(days=5), today - datetime.timedelta(days=3), 3600)
+
+    set_unit_state = update_module.set_unit_state
+    def crashing_set_unit_state(journal: dict, i: int, state: str, **fields):
+        if state == 'reformatted' and i == 1:
+            raise KeyboardInterrupt() # the process is killed before the state of the reformated file is saved
+        set_unit_state(journal, i, state, **fields)
+    monkeypatch.setattr(update_module, 'set_unit_state', crashing_set_unit_state)
+    with pytest.raises(KeyboardInterrupt):
+        update_dataset('BTCUSDT', '1h', dataset_path, folder_path=str(tmp_path / 'update'))
+    assert [unit['state'] for unit in load_journal(dataset_path)['units']] == ['reformatted', 'verified', 'downloaded']
+
+    monkeypatch.setattr(update_module, 'set_unit_state', set_unit_state)
+    assert update_dataset('BTCUSDT', '1h', dataset_path, folder_path=str(tmp_path / 'update'))
+    assert_up_to_date(dataset_path, 3600)
+
+
+def prepare_pipeline(tmp_path) -> tuple[str, dict]:
+    """
+    Writes a 1h dataset that ends 9 days ago and prepares its update (see update_dataset.prepare_update()).
+    """
+    today = get_today()
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    write_dataset(dataset_path, today - datetime.timedelta(days=10), today - datetime.timedelta(days=8), 3600)
+    journal = prepare_update('BTCUSDT', '1h', dataset_path, str(tmp_path / 'update'))
+    assert len(journal['units']) >= 3
+    return dataset_path, journal
+
+
+def test_pipeline_appends_in_order_when_downloads_finish_out_of_order(binance_vision_server, tmp_path, monkeypatch):
+    dataset_path, journal = prepare_pipeline(tmp_path)
+    unit_numbers = {unit['url']: i for i, unit in enumerate(journal['units'])}
+    finished, appended = [], []
+
+    fetch_file = update_module.fetch_file
+    def slow_fetch_file(url: str, *args):
+        time.sleep(0.05 * (len(unit_numbers) - unit_numbers[url])) # the first unit is the slowest
+        result = fetch_file(url, *args)
+        finished.append(unit_numbers[url])
+        return result
+    append_unit = update_module._append_unit
+    def recorded_append_unit(journal: dict, i: int, *args):
+        appended.append(i)
+        append_unit(journal, i, *args)
+    monkeypatch.setattr(update_module, 'fetch_file', slow_fetch_file)
+    monkeypatch.setattr(update_module, '_append_unit', recorded_append_unit)
+
+    assert run_update_pipeline(dataset_path, max_workers=len(unit_numbers))
+    assert finished != sorted(finished)
+    assert appended == sorted(appended) == list(range(len(unit_numbers)))
+    assert_up_to_date(dataset_path, 3600)
+
+
+def test_pipeline_holds_at_most_max_buffered_units(binance_vision_server, tmp_path, monkeypatch):
+    dataset_path, journal = prepare_pipeline(tmp_path)
+    lock = threading.Lock()
+    buffered = {'now': 0, 'max': 0}
+
+    fetch_file = update_module.fetch_file
+    def counted_fetch_file(*args):
+        with lock:
+            buffered['now'] += 1
+            buffered['max'] = max(buffered['max'], buffered['now'])
+        return fetch_file(*args)
+    append_unit = update_module._append_unit
+    def slow_append_unit(*args):
+        time.sleep(0.05) # the downloads are faster than the appending
+        append_unit(*args)
+        with lock:
+            buffered['now'] -= 1
+    monkeypatch.setattr(update_module, 'fetch_file', counted_fetch_file)
+    monkeypatch.setattr(update_module, '_append_unit', slow_append_unit)
+
+    assert run_update_pipeline(dataset_path, max_workers=4, max_buffered=2)
+    assert buffered['max'] == 2
+    assert_up_to_date(dataset_path, 3600)
+
+
+def test_pipeline_stops_at_a_failed_unit(binance_vision_server, tmp_path):
+    dataset_path, journal = prepare_pipeline(tmp_path)
+    binance_vision_server.missing.add(urlparse(journal['units'][1]['url']).path)
+
+    assert not run_update_pipeline(dataset_path, max_workers=4)
+    states = [unit['state'] for unit in load_journal(dataset_path)['units']]
+    assert states[:2] == ['appended', 'planned']
+    assert 'appended' not in states[2:]
+    assert read_rows(dataset_path)[-1][0] < int(get_today().timestamp()) - 3600
+
+    binance_vision_server.missing.clear()
+    assert run_update_pipeline(dataset_path, max_workers=4)
+    assert_up_to_date(dataset_path, 3600)
+    assert not os.path.exists(get_journal_path(dataset_path))
+
+
+@pytest.mark.parametrize('name', ['dataset-5m.csv', 'dataset-5m.csv.gz'])
+def test_status_of_an_empty_dataset(tmp_path, name):
+    dataset_path = str(tmp_path / name)
+    if name.endswith('.gz'):
+        create_compressed(dataset_path)
+    else:
+        open(dataset_path, 'w').close()
+    status = get_update_status('BTCUSDT', '5m', dataset_path, with_plan=True)
+    assert (status['empty'], status['up_to_date'], status['last_timestamp'], status['last_utc'], status['downloads']) \
+        == (True, False, None, None, [])
+    with pytest.raises(Exception, match='is empty, it needs a full download'):
+        update_dataset('BTCUSDT', '5m', dataset_path, folder_path=str(tmp_path / 'update'))
+
+
+def test_day_of_a_dataset_that_ends_in_the_middle_of_it_is_refilled(binance_vision_server, tmp_path):
+    today = get_today()
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    write_dataset(dataset_path, today - datetime.timedelta(days=5), today - datetime.timedelta(days=2, hours=12), 3600)
+    assert update_dataset('BTCUSDT', '1h', dataset_path, folder_path=str(tmp_path / 'update'))
+    assert_up_to_date(dataset_path, 3600)
+
+
+def test_dataset_that_ends_today_is_up_to_date(tmp_path):
+    today = get_today()
+    dataset_path = str(tmp_path / 'dataset-1h.csv')
+    write_dataset(dataset_path, today - datetime.timedelta(days=1), today + datetime.timedelta(hours=6), 3600)
+    assert get_missing_date_range('1h', int(today.timestamp()) + 5 * 3600) is None
+    status = get_update_status('BTCUSDT', '1h', dataset_path, with_plan=True)
+    assert (status['up_to_date'], status['downloads']) == (True, [])
+
+
+def write_config(tmp_path, config: dict) -> str:
+    config_path = str(tmp_path / 'config.json')
+    with open(config_path, 'w') as config_file:
+        json.dump(config, config_file)
+    return config_path
+
+
+@pytest.mark.parametrize('target, error', [
+    ({'asset_pair': 'BTCUSDT', 'time_frame': '5m'}, 'has no "path"'),
+    ({'asset_pair': 'BTCUSDT', 'time_frame': '7m', 'path': './dataset-7m.csv'}, 'Time frame 7m is not available'),
+    ({'asset_pair': 'BTCUSDT', 'time_frame': '5m', 'path': './dataset-5m.csv.gz', 'resample': {'1h': './dataset-1h.csv'}},
+     'is a compressed dataset'),
+    ({'asset_pair': 'BTCUSDT', 'time_frame': '5m', 'path': './dataset-5m.csv.gz', 'features': True},
+     'is a compressed dataset'),
+])
+def test_batch_config_with_an_invalid_target_is_rejected(tmp_path, target, error):
+    valid_target = {'asset_pair': 'ETHUSDT', 'time_frame': '1m', 'path': './eth-1m.csv'}
+    with pytest.raises(Exception, match=error):
+        load_batch_config(write_config(tmp_path, {'targets': [valid_target, target]}))
+
+
+def test_batch_update_of_many_targets(binance_vision_server, tmp_path):
+    today = get_today()
+    targets = []
+    for time_frame, interval_in_s in [('1h', 3600), ('15m', 900)]:
+        dataset_path = str(tmp_path / f'dataset-{time_frame}.csv')
+        write_dataset(dataset_path, today - datetime.timedelta(days=5), today - datetime.timedelta(days=3), interval_in_s)
+        targets.append({'asset_pair': 'BTCUSDT', 'time_frame': time_frame, 'path': dataset_path,
+                        'resample': {'4h': str(tmp_path / 'dataset-4h.csv')} if time_frame == '1h' else {}})
+    targets.append({'asset_pair': 'BTCUSDT', 'time_frame': '1h', 'path': str(tmp_path / 'missing-1h.csv')})
+    config = load_batch_config(write_config(tmp_path, {'max_workers': 4, 'targets': targets}))
+
+    results = update_datasets(config['targets'], config['max_workers'], max_processes=2,
+                              folder_path=str(tmp_path / 'update'))
+    assert [(result['path'], result['status']) for result in results] \
+        == [(target['path'], status) for target, status in zip(targets, ['updated', 'updated', 'failed'])]
+    assert 'does not exist' in results[2]['error']
+    assert_up_to_date(targets[0]['path'], 3600)
+    assert_up_to_date(targets[1]['path'], 900)
+    assert_up_to_date(str(tmp_path / 'dataset-4h.csv'), 4 * 3600)
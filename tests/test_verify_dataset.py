@@ -0,0 +1,54 @@
+"""
+Finding and repairing holes, duplicated and out-of-order rows of a dataset (see verify_dataset.py).
+"""
+
+import random
+from verify_dataset import scan_dataset, splice_rows, sort_dataset
+
+
+def write_rows(path: str, timestamps: list[int]) -> list[str]:
+    lines = [f'{timestamp},42000.0,42010.0,41990.0,{i}.0\n' for i, timestamp in enumerate(timestamps)]
+    with open(path, 'w') as file:
+        file.writelines(lines)
+    return lines
+
+
+def test_scan_finds_holes_duplicates_and_out_of_order_rows(tmp_path):
+    dataset_path = str(tmp_path / 'dataset-1m.csv')
+    timestamps = list(range(0, 600, 60)) + list(range(900, 1200, 60)) # a hole of 5 rows
+    timestamps.insert(3, 120) # a duplicate
+    timestamps.insert(12, 0) # an out-of-order row
+    write_rows(dataset_path, timestamps)
+
+    for chunk_rows in [1, 4, 1000]: # the chunk boundaries must not matter
+        report = scan_dataset(dataset_path, '1m', chunk_rows)
+        assert (report['rows'], report['first_timestamp'], report['last_timestamp']) == (17, 0, 1140)
+        assert report['duplicates'] == [120]
+        assert report['out_of_order'] == [(12, 0)]
+        assert report['missing'] == [(600, 840), (60, 900)] # the out-of-order row looks like a hole too
+
+
+def test_splice_inserts_the_missing_rows_into_place(tmp_path):
+    dataset_path, new_rows_path = str(tmp_path / 'dataset-1m.csv'), str(tmp_path / 'new_rows.csv')
+    dataset_lines = write_rows(dataset_path, [0, 60, 60, 120, 420, 480, 720])
+    new_lines = write_rows(new_rows_path, list(range(0, 780, 60)))
+
+    assert splice_rows(dataset_path, new_rows_path, ranges=[(180, 360), (540, 600)]) == 6
+    lines = open(dataset_path, 'r').readlines()
+    assert lines == dataset_lines[:2] + dataset_lines[3:4] + new_lines[3:7] + dataset_lines[4:6] + new_lines[9:11] \
+        + dataset_lines[6:]
+    assert scan_dataset(dataset_path, '1m') == {'rows': 12, 'first_timestamp': 0, 'last_timestamp': 720,
+                                                'missing': [(660, 660)], 'duplicates': [], 'out_of_order': []}
+
+
+def test_sort_is_stable_across_runs(tmp_path):
+    dataset_path = str(tmp_path / 'dataset-1m.csv')
+    timestamps = [60 * random.Random(0).randrange(100) for _ in range(1000)]
+    random.Random(1).shuffle(timestamps)
+    lines = write_rows(dataset_path, timestamps)
+    with open(dataset_path, 'a') as file:
+        file.write('\n') # a blank line is dropped
+
+    sort_dataset(dataset_path, chunk_rows=64)
+    assert open(dataset_path, 'r').readlines() == sorted(lines, key=lambda line: int(line.split(',')[0]))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['dataset-1m.csv', 'dataset-1m.csv.committed']
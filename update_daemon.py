@@ -0,0 +1,112 @@
+"""
+A long-running updater that stays resident and appends new daily files as soon as binance publishes them.
+
+Instead of running update_dataset.py -update from cron (which fails if binance has not published the file of
+yesterday yet, and pays the interpreter startup, the pandas import and cold connections on every run),
+watch_datasets() keeps one warm connection pool, checks with cheap HEAD requests whether the next daily file of
+each dataset exists, and runs the update of the datasets whose next file is available.
+
+Usage example:
+python update_dataset.py -watch -batch config.json -interval 300
+"""
+
+import time
+import random
+from fetch_data import create_session, file_exists, generate_url_and_file_name
+from update_journal import load_journal
+from update_dataset import get_last_timestamp, update_datasets
+from binary_store import get_store_path
+from datetime_utils import timestamp_to_UTC, get_next_day_date, get_previous_day_date, get_today_date, time_frame_to_seconds
+
+
+def get_next_daily_url(asset_pair: str, time_frame: str, dataset_path: str, store_path: str = None):
+    """
+    Returns the url of the next daily file of a dataset (the day after its last row, or the day of its last row if the
+    dataset ends in the middle of this day), or None if this day is not over yet (binance publishes the daily file
+    of a day after the day is over).
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        dataset_path (str)
+        store_path (str): see update_dataset.get_last_timestamp()
+    Returns:
+        str or None
+    """
+    last_timestamp = get_last_timestamp(dataset_path, store_path)
+    if last_timestamp is None:
+        raise Exception(f'Error: {dataset_path} is empty, it needs a full download.')
+    yy, mm, dd, _, _, _ = timestamp_to_UTC(last_timestamp)
+    if (last_timestamp + time_frame_to_seconds(time_frame)) % (24 * 60 * 60) == 0:
+        yy_next, mm_next, dd_next = get_next_day_date(yy, mm, dd)
+    else:
+        yy_next, mm_next, dd_next = yy, mm, dd
+    yy_today, mm_today, dd_today = get_today_date()
+    if (yy_next, mm_next, dd_next) > get_previous_day_date(yy_today, mm_today, dd_today):
+        return None
+    url, _ = generate_url_and_file_name(asset_pair, time_frame, yy_next, mm_next, dd_next)
+    return url
+
+
+def get_due_targets(targets: list[dict], session) -> list[dict]:
+    """
+    Returns the targets (see update_dataset.update_datasets()) that can be updated now: targets with an unfinished
+    update (see update_journal.py), and targets whose next daily file is published.
+    """
+    due = []
+    for target in targets:
+        if load_journal(target['path']) is not None:
+            due.append(target)
+            continue
+        store_path = get_store_path(target['path']) if target.get('store', False) else None
+        try:
+            url = get_next_daily_url(target['asset_pair'], target['time_frame'], target['path'], store_path)
+            if url is not None and file_exists(url, session, retries=2):
+                due.append(target)
+        except Exception as e:
+            print(f"Could not check {target['path']}: {e}")
+    return due
+
+
+def watch_datasets(targets: list[dict], poll_interval: float = 300, jitter: float = 0.2, max_workers: int = 8,
+                   max_processes: int = None, cache_dir: str = None, cache_max_bytes: int = None,
+                   max_polls: int = None) -> None:
+    """
+    Keeps the datasets of :param targets up to date until it gets interrupted (Ctrl+C).
+    Every poll checks which targets are due (see get_due_targets()) and updates them with update_datasets().
+    Between two polls it waits :param poll_interval seconds, randomly shortened or extended by up to
+    :param jitter * :param poll_interval seconds (so many watchers do not hit binance at the same moment).
+    All requests use the same pooled session.
+
+    Args:
+        targets (list[dict]): see update_dataset.update_datasets()
+        poll_interval (float): seconds between two polls
+        jitter (float): relative random variation of :param poll_interval
+        max_workers (int): number of concurrent downloads
+        max_processes (int): see update_dataset.update_datasets()
+        cache_dir (str): folder of the download cache (None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+        max_polls (int): stops after this number of polls (None for running until interrupted)
+    Returns:
+        None
+    """
+    session = create_session(max_workers)
+    polls = 0
+    try:
+        while max_polls is None or polls < max_polls:
+            polls += 1
+            due = get_due_targets(targets, session)
+            if due:
+                print(f'{len(due)} of {len(targets)} datasets have new data.')
+                results = update_datasets(due, max_workers, max_processes, cache_dir=cache_dir,
+                                          cache_max_bytes=cache_max_bytes, session=session)
+                for result in results:
+                    print(f"{result['asset_pair']} {result['time_frame']} {result['path']}: {result['status']}" +
+                          (f" ({result['error']})" if result['error'] is not None else ''))
+            if max_polls is not None and polls >= max_polls:
+                break
+            time.sleep(poll_interval * (1 + random.uniform(-jitter, jitter)))
+    except KeyboardInterrupt:
+        print('Watching stopped.')
+    finally:
+        session.close()
@@ -1,19 +1,114 @@
 import os
+import json
 import shutil
 import datetime
 import argparse
-from fetch_data import download_range_days, download_range_months
-from reformat_data import reformat_binance_vision_kline_files
-from csv_utils import get_lastline, concat_files
-from datetime_utils import timestamp_to_UTC, get_next_day_date, get_previous_day_date, get_today_date, get_last_day_of_month
+import threading
+from contextlib import ExitStack
+from zipfile import ZipFile, BadZipFile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fetch_data import create_session, fetch_file, download_files, generate_url_and_file_name, available_time_frames
+from reformat_data import reformat_binance_vision_kline_files, reformat_binance_vision_kline_file, reformat_binance_vision_kline_file_exact
+from csv_utils import get_lastline, concat_files, recover_interrupted_append
+from update_journal import create_journal, load_journal, set_unit_state, delete_journal, get_journal_path
+from csv_index import build_index, get_index_path
+from verify_dataset import scan_dataset, splice_rows, sort_dataset
+from resample import resample_dataset
+from feature_store import update_features, get_feature_store_path
+from sqlite_sink import get_database_path, get_database_last_timestamp, append_csv_to_database, import_csv_to_database
+from dataset_lock import writer_lock
+from compressed_dataset import get_compressed_path, is_compressed_dataset, get_compressed_last_timestamp, append_csv_to_compressed, import_csv_to_compressed, recover_interrupted_frame
+from download_cache import default_cache_dir
+from metrics import timed, add_hook, create_json_log_hook, run_profiled
+from binary_store import get_store_last_timestamp, append_csv_to_store, import_csv_to_store, get_store_path
+from datetime_utils import timestamp_to_UTC, timestamp_to_utc_datetime, get_next_day_date, get_previous_day_date, get_today_date, get_last_day_of_month, time_frame_to_seconds
 
 dataset_PATH: str = './dataset-5m.csv'
 
-def get_download_plan(yy_start: int, mm_start: int, dd_start: int, 
-                      yy_last: int, mm_last: int, dd_last: int):
+# cost model of the download planner (see plan_downloads()):
+request_cost_bytes: int = 256 * 1024 # one more request costs about as much time as downloading this many bytes
+zip_bytes_per_row: int = 45 # estimated size of one candle in the zip files of binance
+monthly_publication_lag_days: int = 5 # binance publishes the monthly file of a month within the first days of the next month
+
+
+def _date_to_day(yy: int, mm: int, dd: int) -> int:
+    """
+    Returns the number of the day since 1970-01-01.
+    """
+    return datetime.date(yy, mm, dd).toordinal() - 719163 # 719163 = datetime.date(1970, 1, 1).toordinal()
+
+
+def _day_to_date(day: int) -> list[int]:
+    """
+    Returns the date [yy, mm, dd] of a day number (see _date_to_day()).
+    """
+    date = datetime.date.fromordinal(day + 719163)
+    return [date.year, date.month, date.day]
+
+
+def plan_downloads(day_ranges: list[tuple[int, int]], time_frame: str = '1m', today: tuple[int, int, int] = None) -> list[dict]:
+    """
+    Calculates the days and months that should be downloaded to cover any set of missing days (e.g., the days after
+    the last row of a dataset, or the holes of a dataset).
+    For every month with missing days, the monthly file is chosen if it is already published and cheaper than the
+    daily files of the missing days, otherwise the daily files are chosen. The cost of a download is
+    request_cost_bytes (the cost of one more request) + its estimated size (zip_bytes_per_row * rows). So a month
+    with many missing days gets one monthly file instead of many small daily files (the rows that are not missing
+    are skipped when the data gets appended or spliced), and a month with few missing days (or of a fine time frame
+    like 1s, whose monthly file is large) gets its daily files.
+    The monthly file of a month counts as published :param monthly_publication_lag_days days after the month.
+    The planner works month by month (not day by day), so its time only depends on the number of months.
+
+    Args:
+        day_ranges (list[tuple[int, int]]): [(first missing day, last missing day)] (days since 1970-01-01, in any order,
+                                            may overlap)
+        time_frame (str): e.g., '1m' (for the estimated size of the files)
+        today (tuple[int, int, int]): (yy, mm, dd), default: get_today_date()
+    Returns:
+        [dict] (list of dicts, sorted by date, see get_download_plan())
+    """
+    if today is None:
+        today = get_today_date()
+    today_day = _date_to_day(*today)
+    rows_per_day = max(1, 24 * 60 * 60 // time_frame_to_seconds(time_frame))
+    day_bytes = rows_per_day * zip_bytes_per_row
+
+    # the missing days of every month, as runs of consecutive days:
+    months = {} # {(yy, mm): [[first day, last day]]}
+    for first_day, last_day in sorted(day_ranges):
+        day = first_day
+        while day <= last_day:
+            yy, mm, _ = _day_to_date(day)
+            _, _, last_day_of_month = get_last_day_of_month(yy, mm)
+            run_end = min(last_day, _date_to_day(yy, mm, last_day_of_month))
+            runs = months.setdefault((yy, mm), [])
+            if runs and day <= runs[-1][1] + 1:
+                runs[-1][1] = max(runs[-1][1], run_end)
+            else:
+                runs.append([day, run_end])
+            day = run_end + 1
+
+    download_plan = []
+    for (yy, mm), runs in sorted(months.items()):
+        _, _, last_day_of_month = get_last_day_of_month(yy, mm)
+        published = today_day - _date_to_day(yy, mm, last_day_of_month) > monthly_publication_lag_days
+        missing_days = sum(last_day - first_day + 1 for first_day, last_day in runs)
+        daily_cost = missing_days * (request_cost_bytes + day_bytes)
+        monthly_cost = request_cost_bytes + last_day_of_month * day_bytes
+        if published and monthly_cost <= daily_cost:
+            download_plan.append({'data_type': 'm', 'start_date': [yy, mm], 'end_date': []})
+        else:
+            for first_day, last_day in runs:
+                download_plan.append({'data_type': 'd', 'start_date': _day_to_date(first_day), 'end_date': _day_to_date(last_day)})
+    return download_plan
+
+
+def get_download_plan(yy_start: int, mm_start: int, dd_start: int,
+                      yy_last: int, mm_last: int, dd_last: int, time_frame: str = '1m', today: tuple[int, int, int] = None):
     """
     Depending on the start date (given by yy_start, mm_start, dd_start) and the last date given by
-    (yy_last, mm_last, dd_last), this function calculates the days and months that should be downloaded.
+    (yy_last, mm_last, dd_last), this function calculates the days and months that should be downloaded
+    (see plan_downloads()).
 
     Args:
         yy_start (int)
@@ -22,6 +117,8 @@ def get_download_plan(yy_start: int, mm_start: int, dd_start: int,
         yy_last (int)
         mm_last (int)
         dd_last (int)
+        time_frame (str): see plan_downloads()
+        today (tuple[int, int, int]): see plan_downloads()
     Returns:
         [dict] (list of dicts)
         dict: {
@@ -30,111 +127,967 @@ def get_download_plan(yy_start: int, mm_start: int, dd_start: int,
             'end_date' = [yy, mm, dd] or []
         }
     """
-    start_date = datetime.datetime(yy_start, mm_start, dd_start)
-    end_date = datetime.datetime(yy_last, mm_last, dd_last)
-    if start_date < end_date:
-        download_plan = []
-        temp_date = start_date - datetime.timedelta(days=1) # gets the date before start date
-        while temp_date != end_date:
-            temp_date = temp_date + datetime.timedelta(days=1) # gets next day date 
-            _, _, temp_date_ldm =  get_last_day_of_month(temp_date.year, temp_date.month)
-            if temp_date.day == 1 and (datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm) < end_date or 
-                                    datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm) == end_date):
-                download_plan.append({
-                    'data_type' : 'm',
-                    'start_date' : [temp_date.year, temp_date.month],
-                    'end_date' : []
-                })
-                temp_date = datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm)
-            elif temp_date.year == end_date.year and temp_date.month == end_date.month:
-                download_plan.append({
-                    'data_type' : 'd',
-                    'start_date' : [temp_date.year, temp_date.month, temp_date.day],
-                    'end_date' : [end_date.year, end_date.month, end_date.day]
-                })
-                temp_date = end_date
-            else:
-                download_plan.append({
-                    'data_type' : 'd',
-                    'start_date' : [temp_date.year, temp_date.month, temp_date.day],
-                    'end_date' : [temp_date.year, temp_date.month, temp_date_ldm]
-                })
-                temp_date = datetime.datetime(temp_date.year, temp_date.month, temp_date_ldm)
-        
-        return download_plan
+    start_day = _date_to_day(yy_start, mm_start, dd_start)
+    last_day = _date_to_day(yy_last, mm_last, dd_last)
+    if start_day < last_day:
+        return plan_downloads([(start_day, last_day)], time_frame, today)
     else:
         raise Exception('start_date >= last_date')
 
 
-def update_my_btcusdt_data(time_frame: str, PATH_Binance_spot_BTCUSDT_Xm: str) -> None:
+def plan_date_range(yy_start: int, mm_start: int, dd_start: int,
+                    yy_last: int, mm_last: int, dd_last: int, time_frame: str = '1m') -> list[dict]:
     """
-    This function downloads binance spot BTCUSDT (time_frame: 1m or 5m) data, reformats it, 
-    and appends it to PATH_Binance_spot_BTCUSDT_Xm.
-    It looks what is the last row of PATH_Binance_spot_BTCUSDT_Xm, and downloads all the data
+    Same as get_download_plan(), but also accepts a range of a single day (start date == last date).
+    """
+    if (yy_start, mm_start, dd_start) == (yy_last, mm_last, dd_last):
+        return [{'data_type': 'd', 'start_date': [yy_start, mm_start, dd_start], 'end_date': [yy_last, mm_last, dd_last]}]
+    return get_download_plan(yy_start, mm_start, dd_start, yy_last, mm_last, dd_last, time_frame)
+
+
+def get_download_list(asset_pair: str, time_frame: str, download_plan: list[dict], folder_path: str) -> list[tuple[str, str]]:
+    """
+    Expands a download plan (see get_download_plan()) into the list of the single files that should be downloaded.
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        download_plan (list[dict])
+        folder_path (str): folder in which the files should be saved
+    Returns:
+        [(url, download_path)] (list of tuples of str, in the order of the plan)
+    """
+    downloads = []
+    for dict in download_plan:
+        if dict['data_type'] == 'd':
+            date = datetime.datetime(*dict['start_date'])
+            end_date = datetime.datetime(*dict['end_date'])
+            while date <= end_date:
+                url, file_name = generate_url_and_file_name(asset_pair, time_frame, date.year, date.month, date.day)
+                downloads.append((url, folder_path + '/' + file_name))
+                date = date + datetime.timedelta(days=1)
+        else:
+            # dict['data_type'] = 'm'
+            url, file_name = generate_url_and_file_name(asset_pair, time_frame, dict['start_date'][0], dict['start_date'][1], None)
+            downloads.append((url, folder_path + '/' + file_name))
+    return downloads
+
+
+def get_last_timestamp(dataset_path: str, store_path: str = None, database_path: str = None) -> int:
+    """
+    Gets the last timestamp of a dataset. The last timestamp of a compressed dataset is read from its frame index
+    (see compressed_dataset.py). If :param store_path is given, the last timestamp is read from the
+    binary store (see binary_store.py), which is created from the csv file if it does not exist.
+    If :param database_path is given, the last timestamp is read from the SQLite database (see sqlite_sink.py)
+    with a single MAX() query, and the database is created from the csv file if it does not exist.
+
+    Args:
+        dataset_path (str)
+        store_path (str)
+        database_path (str)
+    Returns:
+        int: unix in seconds, or None if the dataset is empty
+    """
+    if is_compressed_dataset(dataset_path):
+        dataset_last_timestamp = get_compressed_last_timestamp(dataset_path)
+    else:
+        last_line = get_lastline(dataset_path)
+        dataset_last_timestamp = int(last_line.split(',')[0]) if last_line.strip() != '' else None
+    last_timestamp = None
+    if store_path is not None:
+        if not os.path.exists(store_path):
+            import_csv_to_store(dataset_path, store_path)
+        last_timestamp = get_store_last_timestamp(store_path)
+        if last_timestamp != dataset_last_timestamp:
+            raise Exception(f'Error: {store_path} is not in sync with {dataset_path}. Import the csv file again.')
+    if database_path is not None:
+        if not os.path.exists(database_path):
+            import_csv_to_database(dataset_path, database_path)
+        last_timestamp = get_database_last_timestamp(database_path)
+        if last_timestamp != dataset_last_timestamp:
+            raise Exception(f'Error: {database_path} is not in sync with {dataset_path}. Import the csv file again.')
+    if last_timestamp is not None:
+        return last_timestamp
+    return dataset_last_timestamp
+
+
+def plan_update(asset_pair: str, time_frame: str, dataset_path: str, folder_path: str,
+                store_path: str = None, database_path: str = None) -> list[tuple[str, str]]:
+    """
+    Calculates the files that are needed to update a dataset, from the day after its last row
+    until the last available daily historic data of https://data.binance.vision (the day before today).
+    If the last row of the dataset is not the last candle of its day (e.g., the dataset ends in the middle of a day),
+    the plan starts with this day, and its rows that are already in the dataset are skipped when it gets appended
+    (see csv_utils.concat_files() with merge=True).
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        dataset_path (str)
+        folder_path (str): folder in which the files should be saved
+        store_path (str): see get_last_timestamp()
+        database_path (str): see get_last_timestamp()
+    Returns:
+        [(url, download_path)] (see get_download_list())
+    """
+    # get the last timestamp of the dataset to figure out the data range, that is needed to download:
+    last_timestamp = get_last_timestamp(dataset_path, store_path, database_path)
+    if last_timestamp is None:
+        raise Exception(f'Error: {dataset_path} is empty, it needs a full download.')
+    date_range = get_missing_date_range(time_frame, last_timestamp)
+    if date_range is None:
+        raise Exception(f'Dataset {str(dataset_path)} is already up to date.')
+
+    download_plan = plan_date_range(*date_range, time_frame)
+    return get_download_list(asset_pair, time_frame, download_plan, folder_path)
+
+
+def get_missing_date_range(time_frame: str, last_timestamp: int):
+    """
+    Returns the range of days that is missing after the last row of a dataset, from the day after the last row
+    (or the day of the last row, if it is not the last candle of its day) until the last available daily
+    historic data of https://data.binance.vision (the day before today).
+
+    Args:
+        time_frame (str): e.g., '1m'
+        last_timestamp (int): unix in seconds
+    Returns:
+        (yy_start, mm_start, dd_start, yy_last, mm_last, dd_last), or None if the dataset is up to date (its last row
+        is the last candle of yesterday, or a candle of today, whose daily file is not published yet)
+    """
+    yy, mm, dd, _, _, _ =  timestamp_to_UTC(last_timestamp)
+    day_is_complete = (last_timestamp + time_frame_to_seconds(time_frame)) % (24 * 60 * 60) == 0
+
+    # get next day in calender (or the same day, if it is not complete):
+    if day_is_complete:
+        yy_start, mm_start, dd_start =  get_next_day_date(yy, mm, dd)
+    else:
+        yy_start, mm_start, dd_start = yy, mm, dd
+
+    # get the end date of the download range (the day before today):
+    yy_today, mm_today, dd_today = get_today_date()
+    yy_last, mm_last, dd_last = get_previous_day_date(yy_today, mm_today, dd_today)
+
+    if (yy_start, mm_start, dd_start) > (yy_last, mm_last, dd_last):
+        return None
+    return yy_start, mm_start, dd_start, yy_last, mm_last, dd_last
+
+
+def get_update_status(asset_pair: str, time_frame: str, dataset_path: str, with_plan: bool = False) -> dict:
+    """
+    Returns whether a dataset is up to date, and optionally the files that an update would download, without
+    downloading anything. Only the last line of the dataset (or the last record of the frame index of a compressed
+    dataset) is read (see get_last_timestamp()), and neither pandas nor requests are imported, so this is cheap
+    enough for health checks of many datasets.
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        dataset_path (str)
+        with_plan (bool): also return the planned downloads (see get_download_plan())
+    Returns:
+        dict: {
+            'asset_pair' = str
+            'time_frame' = str
+            'path' = str
+            'last_timestamp' = int (unix in seconds) or None (if the dataset is empty)
+            'last_utc' = str (e.g., '2024-01-31 23:55:00') or None (if the dataset is empty)
+            'up_to_date' = bool
+            'empty' = bool (True if the dataset has no rows, it needs a full download instead of an update)
+            'interrupted_update' = bool (True if the dataset has a journal of an interrupted update, see update_journal.py)
+            'downloads' = [{'url': str, 'file_name': str}] (only if :param with_plan is True, empty for an empty dataset)
+        }
+    """
+    last_timestamp = get_last_timestamp(dataset_path)
+    empty = last_timestamp is None
+    date_range = get_missing_date_range(time_frame, last_timestamp) if not empty else None
+    status = {
+        'asset_pair': asset_pair,
+        'time_frame': time_frame,
+        'path': dataset_path,
+        'last_timestamp': last_timestamp,
+        'last_utc': timestamp_to_utc_datetime(last_timestamp).strftime('%Y-%m-%d %H:%M:%S') if not empty else None,
+        'up_to_date': not empty and date_range is None,
+        'empty': empty,
+        'interrupted_update': os.path.exists(get_journal_path(dataset_path)),
+    }
+    if with_plan:
+        downloads = []
+        if date_range is not None:
+            for url, download_path in get_download_list(asset_pair, time_frame, plan_date_range(*date_range, time_frame), '.'):
+                downloads.append({'url': url, 'file_name': os.path.basename(download_path)})
+        status['downloads'] = downloads
+    return status
+
+
+def prepare_update(asset_pair: str, time_frame: str, dataset_path: str, folder_path: str,
+                   store_path: str = None, exact: bool = False, database_path: str = None) -> dict:
+    """
+    Returns the journal of the update of a dataset (see update_journal.py). If the dataset has a journal
+    of an interrupted update, this update is resumed. Otherwise a new update is planned with plan_update().
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        dataset_path (str)
+        folder_path (str): folder for the downloaded files of a new update
+        store_path (str): see get_last_timestamp()
+        exact (bool): reformat the files of a new update with reformat_binance_vision_kline_file_exact()
+        database_path (str): SQLite database that gets the new rows of a new update too (see sqlite_sink.py)
+    Returns:
+        dict: the journal
+    """
+    journal = load_journal(dataset_path)
+    if journal is not None:
+        if journal['asset_pair'] != asset_pair or journal['time_frame'] != time_frame:
+            raise Exception(f"Error: {dataset_path} has an unfinished update of {journal['asset_pair']} {journal['time_frame']}.")
+        print(f'Resuming the unfinished update of {dataset_path}.')
+        os.makedirs(journal['folder_path'], exist_ok=True)
+        return journal
+
+    # the last row of the dataset is only reliable after an interrupted append was rolled back:
+    _recover_interrupted_append(dataset_path)
+    downloads = plan_update(asset_pair, time_frame, dataset_path, folder_path, store_path, database_path)
+    os.makedirs(folder_path, exist_ok=True)
+    return create_journal(dataset_path, asset_pair, time_frame, folder_path, downloads, exact, database_path)
+
+
+def _recover_interrupted_append(dataset_path: str) -> None:
+    """
+    Rolls back an interrupted append to the dataset (see csv_utils.recover_interrupted_append() and
+    compressed_dataset.recover_interrupted_frame()).
+    """
+    if is_compressed_dataset(dataset_path):
+        recover_interrupted_frame(dataset_path)
+    else:
+        recover_interrupted_append(dataset_path)
+
+
+def get_pending_downloads(journal: dict) -> list[int]:
+    """
+    Returns the numbers of the units of the journal that still have to be downloaded.
+    """
+    return [i for i, unit in enumerate(journal['units']) if unit['state'] == 'planned']
+
+
+def mark_downloads(journal: dict, units: list[int], results: list[dict]) -> list[dict]:
+    """
+    Marks the successfully downloaded units of the journal as 'downloaded'.
+
+    Args:
+        journal (dict)
+        units (list[int]): numbers of the downloaded units
+        results (list[dict]): results of download_files() (or fetch_file()) of :param units, in the same order
+    Returns:
+        [dict]: the failed downloads
+    """
+    failed = []
+    for i, result in zip(units, results):
+        if result['ok']:
+            set_unit_state(journal, i, 'downloaded')
+        else:
+            failed.append(result)
+            print(f"Could not download {result['url']}: {result['error']}")
+    return failed
+
+
+def _verify_unit(journal: dict, i: int) -> bool:
+    """
+    Checks the downloaded zip file of the unit number :param i (CRC check) and marks it as 'verified'.
+    A corrupted file is deleted and the unit is set back to 'planned', so the next run downloads it again.
+    """
+    unit = journal['units'][i]
+    try:
+        with ZipFile(unit['path'], 'r') as zip:
+            valid = zip.testzip() is None
+    except BadZipFile:
+        valid = False
+    if valid:
+        set_unit_state(journal, i, 'verified')
+    else:
+        print(f"{unit['path']} is corrupted, it gets downloaded again by the next run.")
+        # the state is saved before the file is deleted, so an interrupted run never leaves a state without its file:
+        set_unit_state(journal, i, 'planned')
+        os.remove(unit['path'])
+    return valid
+
+
+def _reformat_unit(journal: dict, i: int) -> None:
+    """
+    Reformats the verified zip file of the unit number :param i into its own csv file and marks it as 'reformatted'.
+    """
+    unit = journal['units'][i]
+    csv_path = unit['path'].replace('.zip', '.csv')
+    reformat = reformat_binance_vision_kline_file_exact if journal.get('exact', False) else reformat_binance_vision_kline_file
+    with open(csv_path, 'w') as csv_file:
+        reformat(unit['path'], csv_file)
+    # saved before the zip file is deleted (see _verify_unit()):
+    set_unit_state(journal, i, 'reformatted', csv_path=csv_path)
+    os.remove(unit['path'])
+
+
+def _append_unit(journal: dict, i: int, dataset_path: str, store_path: str = None) -> None:
+    """
+    Appends the reformated csv file of the unit number :param i to the dataset (and the binary store and the
+    SQLite database of the journal) and marks it as 'appended'.
+    """
+    unit = journal['units'][i]
+    if unit['base_size'] is None:
+        set_unit_state(journal, i, 'reformatted', base_size=os.path.getsize(dataset_path))
+    # if the dataset is not at its recorded size anymore, the unit was already appended to it.
+    # Rows that are already in the dataset (e.g., the first part of a day that was not complete) are skipped:
+    if os.path.getsize(dataset_path) == unit['base_size']:
+        if is_compressed_dataset(dataset_path):
+            append_csv_to_compressed(unit['csv_path'], dataset_path, merge=True)
+        else:
+            concat_files([dataset_path, unit['csv_path']], merge=True)
+    # the store is appended in chunks, so an interrupted append can have written a part of the unit. Like the dataset,
+    # the store only gets the rows after its last row, which appends the rest of such a unit:
+    if store_path is not None:
+        append_csv_to_store(unit['csv_path'], store_path, merge=True)
+    # like the dataset, the database only gets the rows after its last row (a monthly file can start before the end of
+    # the dataset), so writing a unit again is harmless:
+    if journal.get('database_path') is not None:
+        append_csv_to_database(unit['csv_path'], journal['database_path'], merge=True)
+    set_unit_state(journal, i, 'appended')
+    os.remove(unit['csv_path'])
+
+
+def _finish_update(journal: dict, dataset_path: str) -> bool:
+    """
+    Deletes the journal and the folder of the downloaded files if all units are appended.
+
+    Returns:
+        bool: True if the update is complete else False.
+    """
+    units = journal['units']
+    if all(unit['state'] == 'appended' for unit in units):
+        delete_journal(dataset_path)
+        shutil.rmtree(journal['folder_path'])
+        print(f'New data appended to {str(dataset_path)}.')
+        return True
+    appended = sum(unit['state'] == 'appended' for unit in units)
+    print(f'{appended} of {len(units)} files appended to {str(dataset_path)}. Run the update again to resume.')
+    return False
+
+
+def apply_update(dataset_path: str, store_path: str = None) -> bool:
+    """
+    Continues the update of a dataset from its journal (see update_journal.py):
+    The downloaded zip files are verified (CRC check), reformated into one csv file per unit, and appended to
+    the dataset (and to the binary store, if :param store_path is given) in the planned order.
+    The appending stops at the first unit that is not reformated yet (e.g., because its download failed), so the
+    dataset never gets a gap. The remaining units are done by the next run.
+    When all units are appended, the journal and the folder of the downloaded files are deleted.
+
+    Args:
+        dataset_path (str)
+        store_path (str)
+    Returns:
+        bool: True if the update is complete else False.
+    """
+    journal = load_journal(dataset_path)
+    units = journal['units']
+    _recover_interrupted_append(dataset_path)
+    if store_path is not None and not os.path.exists(store_path):
+        import_csv_to_store(dataset_path, store_path)
+
+    for i, unit in enumerate(units):
+        if unit['state'] == 'downloaded':
+            _verify_unit(journal, i)
+        if unit['state'] == 'verified':
+            _reformat_unit(journal, i)
+
+    for i, unit in enumerate(units):
+        if unit['state'] == 'appended':
+            continue
+        if unit['state'] != 'reformatted':
+            break
+        _append_unit(journal, i, dataset_path, store_path)
+
+    return _finish_update(journal, dataset_path)
+
+
+def run_update_pipeline(dataset_path: str, store_path: str = None, max_workers: int = 8, decode_workers: int = 1,
+                        max_buffered: int = None, cache_dir: str = None, cache_max_bytes: int = None,
+                        session=None) -> bool:
+    """
+    Continues the update of a dataset from its journal like apply_update(), but downloads, reformats and appends
+    the units at the same time instead of one stage after the other:
+    Up to :param max_workers download threads feed :param decode_workers decode threads (CRC check and reformat),
+    and the calling thread appends the reformated units to the dataset in the planned (= timestamp) order as soon
+    as the next unit is ready. So the network is busy while the data is parsed, and the total time gets close to the
+    longer of the two instead of their sum.
+    At most :param max_buffered units are downloaded or reformated but not appended yet (backpressure), so the
+    memory and disk usage stay bounded if the downloads are faster than the appending.
+    Like apply_update(), the appending stops at the first unit that can not be downloaded or is corrupted. The units
+    that are already in flight are still finished and recorded in the journal, so the next run resumes from there.
+
+    Args:
+        dataset_path (str)
+        store_path (str): see apply_update()
+        max_workers (int): number of concurrent downloads
+        decode_workers (int): number of concurrently reformated files
+        max_buffered (int): maximum number of units waiting for the appender (default: 2 * (max_workers + decode_workers))
+        cache_dir (str): folder of the download cache (None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+        session (requests.Session): if None, a session with a pool of :param max_workers connections is created
+    Returns:
+        bool: True if the update is complete else False.
+    """
+    journal = load_journal(dataset_path)
+    units = journal['units']
+    _recover_interrupted_append(dataset_path)
+    if store_path is not None and not os.path.exists(store_path):
+        import_csv_to_store(dataset_path, store_path)
+    if max_buffered is None:
+        max_buffered = 2 * (max_workers + decode_workers)
+    own_session = session is None
+    if own_session:
+        session = create_session(max_workers)
+
+    slots = threading.Semaphore(max_buffered)
+    stop = threading.Event()
+    ready = threading.Condition()
+    decoded = {} # unit number -> future of decode() (None if the download failed)
+
+    def decode(i: int) -> bool:
+        if units[i]['state'] == 'downloaded' and not _verify_unit(journal, i):
+            return False
+        if units[i]['state'] == 'verified':
+            _reformat_unit(journal, i)
+        return True
+
+    def download(i: int) -> None:
+        future = None
+        try:
+            if units[i]['state'] == 'planned':
+                result = fetch_file(units[i]['url'], units[i]['path'], session, 3, 0.5, cache_dir, cache_max_bytes)
+                if result['ok']:
+                    set_unit_state(journal, i, 'downloaded')
+                else:
+                    print(f"Could not download {result['url']}: {result['error']}")
+            if units[i]['state'] != 'planned':
+                future = decode_executor.submit(decode, i)
+        finally:
+            with ready:
+                decoded[i] = future
+                ready.notify_all()
+
+    def feed() -> None:
+        for i, unit in enumerate(units):
+            if unit['state'] == 'appended':
+                continue
+            slots.acquire()
+            if stop.is_set():
+                return
+            download_executor.submit(download, i)
+
+    download_executor = ThreadPoolExecutor(max_workers=max_workers)
+    decode_executor = ThreadPoolExecutor(max_workers=decode_workers)
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+    try:
+        for i, unit in enumerate(units):
+            if unit['state'] == 'appended':
+                continue
+            with ready:
+                ready.wait_for(lambda: i in decoded)
+            if decoded[i] is None or not decoded[i].result():
+                break
+            _append_unit(journal, i, dataset_path, store_path)
+            slots.release()
+    finally:
+        stop.set()
+        for _ in range(max_buffered):
+            slots.release() # wakes the feeder up if it waits for a slot
+        feeder.join()
+        download_executor.shutdown(wait=True)
+        decode_executor.shutdown(wait=True)
+        if own_session:
+            session.close()
+
+    return _finish_update(journal, dataset_path)
+
+
+def update_dataset(asset_pair: str, time_frame: str, dataset_path: str, max_workers: int = None,
+                   store_path: str = None, folder_path: str = './output', cache_dir: str = None,
+                   cache_max_bytes: int = None, exact: bool = False, database_path: str = None) -> bool:
+    """
+    This function downloads binance spot :param asset_pair data, reformats it, and appends it to :param dataset_path.
+    It looks what is the last row of :param dataset_path, and downloads all the data
     until the last available daily historic data of https://data.binance.vision.
+    The progress is recorded in a journal (see update_journal.py), so if the update gets interrupted
+    (or some files can not be downloaded yet), the next run resumes it and skips the finished work.
+    If :param max_workers is given, the files of the download plan are downloaded concurrently through one
+    pooled session and reformated and appended while the other files are still downloading (see run_update_pipeline()).
+    Files that could not be downloaded are reported instead of stopping the download.
+    The writer lock of the dataset (see dataset_lock.py) is held during the update, so a second update of the same
+    dataset (e.g., from another process) fails instead of appending at the same time.
+    If :param store_path is given, the new data is also appended to this binary store (see binary_store.py), and the
+    last timestamp is read from the store instead of the csv file. The store is created from the csv file if it does not exist.
+    The duration of the stages (plan, download, apply or pipeline) and of the whole update are emitted as metrics records (see metrics.py).
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        dataset_path (str)
+        max_workers (int): number of concurrent downloads (None for sequential downloading)
+        store_path (str): path of a binary store that should be kept in sync with :param dataset_path
+        folder_path (str): temporary folder for the downloaded files (gets deleted at the end)
+        cache_dir (str): folder of the download cache (see download_cache.py, None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+        exact (bool): keep the exact digits of the prices (see reformat_data.reformat_binance_vision_kline_file_exact())
+        database_path (str): path of a SQLite database that should be kept in sync with :param dataset_path
+                             (see sqlite_sink.py, created from the csv file if it does not exist)
+    Returns:
+        bool: True if the dataset is now up to date else False.
+    """
+    with writer_lock(dataset_path, blocking=False), \
+            timed('update', asset_pair=asset_pair, time_frame=time_frame, dataset_path=dataset_path,
+                  up_to_date=False) as update_metrics:
+        with timed('update_stage', dataset_path=dataset_path, stage='plan') as metrics:
+            journal = prepare_update(asset_pair, time_frame, dataset_path, folder_path, store_path, exact, database_path)
+            pending = get_pending_downloads(journal)
+            downloads = [(journal['units'][i]['url'], journal['units'][i]['path']) for i in pending]
+            metrics.update({'units': len(journal['units']), 'pending_downloads': len(pending)})
+
+        if max_workers is not None:
+            # download, reformat and append at the same time:
+            print("Downloading and appending data...")
+            with timed('update_stage', dataset_path=dataset_path, stage='pipeline') as metrics:
+                size = os.path.getsize(dataset_path)
+                update_metrics['up_to_date'] = run_update_pipeline(dataset_path, store_path, max_workers,
+                                                                   cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+                metrics['bytes'] = os.path.getsize(dataset_path) - size
+        else:
+            # download and reformat the data:
+            print("Downloading data...")
+            with timed('update_stage', dataset_path=dataset_path, stage='download') as metrics:
+                results = []
+                for url, path in downloads:
+                    results.append(fetch_file(url, path, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes))
+                    if not results[-1]['ok']:
+                        break
+                failed = mark_downloads(journal, pending, results)
+                metrics.update({'files': len(results), 'failed': len(failed),
+                                'bytes': sum(result['bytes'] for result in results)})
+            print('Download completed.')
+            with timed('update_stage', dataset_path=dataset_path, stage='apply') as metrics:
+                size = os.path.getsize(dataset_path)
+                update_metrics['up_to_date'] = apply_update(dataset_path, store_path)
+                metrics['bytes'] = os.path.getsize(dataset_path) - size
+    if update_metrics['up_to_date']:
+        print(f'Dataset {str(dataset_path)} is now up to date.')
+        return True
+    return False
+
+
+def update_my_btcusdt_data(time_frame: str, PATH_Binance_spot_BTCUSDT_Xm: str, max_workers: int = None,
+                           store_path: str = None, cache_dir: str = None, cache_max_bytes: int = None,
+                           exact: bool = False, database_path: str = None) -> None:
+    """
+    This function downloads binance spot BTCUSDT (time_frame: 1m or 5m) data, reformats it, 
+    and appends it to PATH_Binance_spot_BTCUSDT_Xm (see update_dataset()).
 
     Args:
         time_frame (str): ['1m', '5m']
         PATH_Binance_spot_BTCUSDT_Xm (str)
+        max_workers (int): number of concurrent downloads (None for sequential downloading)
+        store_path (str): path of a binary store that should be kept in sync with PATH_Binance_spot_BTCUSDT_Xm
+        cache_dir (str): folder of the download cache (see download_cache.py, None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+        exact (bool): keep the exact digits of the prices (see update_dataset())
+        database_path (str): path of a SQLite database that should be kept in sync with PATH_Binance_spot_BTCUSDT_Xm
     Returns:
         None
     """
-    if not os.path.exists('./output'):
-        os.mkdir('./output')
+    update_dataset('BTCUSDT', time_frame, PATH_Binance_spot_BTCUSDT_Xm, max_workers, store_path,
+                   cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, exact=exact, database_path=database_path)
 
-    # get the last timestamp of PATH_Binance_spot_BTCUSDT_Xm to figure out the data range, that is needed to download:
-    last_timestamp = get_lastline(PATH_Binance_spot_BTCUSDT_Xm).split(',')[0]
-    yy, mm, dd, _, _, _ =  timestamp_to_UTC(int(last_timestamp))
 
-    # get next day in calender:
-    yy_start, mm_start, dd_start =  get_next_day_date(yy, mm, dd)
+def load_batch_config(config_path: str) -> dict:
+    """
+    Loads a batch config file (json). Example of a config file:
+    {
+        "max_workers": 16,
+        "max_processes": 4,
+        "cache_dir": "./cache",
+        "cache_max_bytes": 10000000000,
+        "targets": [
+            {"asset_pair": "BTCUSDT", "time_frame": "5m", "path": "./dataset-5m.csv"},
+            {"asset_pair": "ETHUSDT", "time_frame": "1m", "path": "./eth-1m.csv", "store": true,
+             "resample": {"15m": "./eth-15m.csv", "1h": "./eth-1h.csv"}}
+        ]
+    }
+    "max_workers" (number of concurrent downloads), "max_processes" (number of datasets that are reformated and
+    appended in parallel), "cache_dir" and "cache_max_bytes" (download cache shared by all datasets),
+    "store" (also update the binary store of the dataset), "resample" (coarser time frames that are built from
+    the dataset after its update, see resample.py), "exact" (keep the exact digits of the prices, see
+    reformat_data.reformat_binance_vision_kline_file_exact()) and "features" (update the feature store of the
+    dataset after its update, see feature_store.py) and "sqlite" (also update the SQLite database of the dataset,
+    see sqlite_sink.py) are optional. A "path" ending with ".gz" is a compressed dataset (see compressed_dataset.py).
 
-    # get the end date of the download range (the day before today):
-    yy_today, mm_today, dd_today = get_today_date()
-    yy_last, mm_last, dd_last = get_previous_day_date(yy_today, mm_today, dd_today)
+    Args:
+        config_path (str)
+    Returns:
+        dict
+    """
+    with open(config_path, 'r') as config_file:
+        config = json.load(config_file)
+    for target in config['targets']:
+        for key in ['asset_pair', 'time_frame', 'path']:
+            if key not in target:
+                raise Exception(f'Error: A target in {config_path} has no "{key}".')
+        if target['time_frame'] not in available_time_frames:
+            raise Exception(f"Error: Time frame {target['time_frame']} is not available.")
+        if is_compressed_dataset(target['path']) and (target.get('resample') or target.get('features', False)):
+            raise Exception(f"Error: {target['path']} is a compressed dataset, it can not be resampled or have features.")
+    return config
 
-    if yy == yy_last and mm == mm_last and dd == dd_last:
-        raise Exception(f'Dataset {str(PATH_Binance_spot_BTCUSDT_Xm)} is already up to date.')
 
-    # download and reformat the data:
-    print("Downloading data...")
-    download_plan = get_download_plan(yy_start, mm_start, dd_start, yy_last, mm_last, dd_last)
+def _apply_update_of_target(dataset_path: str, store_path: str, resample_targets: dict, features: bool = False):
+    """
+    Runs apply_update() (and the resampling and the feature update of the target) in a worker process of
+    update_datasets(), and returns the error message instead of raising it.
+    """
     try:
-        for dict in download_plan:
-            if dict['data_type'] == 'd':
-                yy_start = dict['start_date'][0]
-                mm_start = dict['start_date'][1]
-                dd_start = dict['start_date'][2]
-                yy_last = dict['end_date'][0]
-                mm_last = dict['end_date'][1]
-                dd_last = dict['end_date'][2]
-                download_range_days('BTCUSDT', time_frame, yy_start, mm_start, dd_start, yy_last, mm_last, dd_last, './output')
+        if not apply_update(dataset_path, store_path):
+            return 'The update is incomplete (run the update again to resume).'
+        for time_frame, output_path in resample_targets.items():
+            resample_dataset(dataset_path, output_path, time_frame)
+        if features:
+            update_features(dataset_path)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def update_datasets(targets: list[dict], max_workers: int = 8, max_processes: int = None,
+                    folder_path: str = './output', cache_dir: str = None, cache_max_bytes: int = None,
+                    session = None) -> list[dict]:
+    """
+    Updates many datasets (e.g., hundreds of asset pairs on several time frames) at once.
+    The download plan of every target is calculated from its own last row (or resumed from its journal, see
+    prepare_update()). Then the files of all targets are downloaded through one pool of :param max_workers
+    concurrent downloads, and the reformating and appending runs in parallel (in up to :param max_processes
+    processes) across the datasets.
+    A failing target does not stop the other targets, instead every target gets its own result.
+
+    Args:
+        targets (list[dict]): [{'asset_pair': str, 'time_frame': str, 'path': str, 'store': bool (optional),
+                                'resample': {time_frame: path} (optional), 'exact': bool (optional),
+                                'features': bool (optional), 'sqlite': bool (optional)}]
+        max_workers (int): number of concurrent downloads
+        max_processes (int): number of processes for reformating and appending (None for the number of CPUs)
+        folder_path (str): temporary folder for the downloaded files (gets deleted at the end)
+        cache_dir (str): folder of the download cache shared by all targets (None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+        session (requests.Session): pooled session for the downloads (None for a new session, see download_files())
+    Returns:
+        [dict] (list of dicts, in the same order as :param targets)
+        dict: {
+            'asset_pair' = str
+            'time_frame' = str
+            'path' = str
+            'status' = 'updated' or 'up_to_date' or 'failed'
+            'error' = str or None
+            'failed_downloads' = [str] (urls)
+        }
+    """
+    with ExitStack() as locks: # the writer locks of the datasets (see dataset_lock.py) are held until the end
+        return _update_datasets(targets, max_workers, max_processes, folder_path, cache_dir, cache_max_bytes, session, locks)
+
+
+def _update_datasets(targets: list[dict], max_workers: int, max_processes: int, folder_path: str, cache_dir: str,
+                     cache_max_bytes: int, session, locks: ExitStack) -> list[dict]:
+    """
+    Does the work of update_datasets(). The writer lock of every target (see dataset_lock.py) is added to
+    :param locks before it is prepared, so a target that is being updated by another process fails.
+    """
+    results = []
+    journals = [] # journal of each target (None if the target is up to date or failed)
+    downloads = [] # downloads of all targets
+    download_units = [] # (target number, unit number) of each download
+    for i, target in enumerate(targets):
+        result = {'asset_pair': target['asset_pair'], 'time_frame': target['time_frame'], 'path': target['path'],
+                  'status': None, 'error': None, 'failed_downloads': []}
+        results.append(result)
+        journals.append(None)
+        target_folder = folder_path + '/' + str(i) + '-' + target['asset_pair'] + '-' + target['time_frame']
+        store_path = get_store_path(target['path']) if target.get('store', False) else None
+        try:
+            database_path = get_database_path(target['path']) if target.get('sqlite', False) else None
+            locks.enter_context(writer_lock(target['path'], blocking=False))
+            journals[i] = prepare_update(target['asset_pair'], target['time_frame'], target['path'], target_folder,
+                                         store_path, target.get('exact', False), database_path)
+        except Exception as e:
+            if 'already up to date' in str(e):
+                result['status'] = 'up_to_date'
             else:
-                # dict['data_type'] = 'm'
-                yy_start = dict['start_date'][0]
-                mm_start = dict['start_date'][1]
-                yy_last = yy_start
-                mm_last = mm_start
-                download_range_months('BTCUSDT', time_frame, yy_start, mm_start, yy_last, mm_last, './output')
-    except:
-        pass
+                result['status'] = 'failed'
+                result['error'] = str(e)
+            continue
+        for j in get_pending_downloads(journals[i]):
+            unit = journals[i]['units'][j]
+            downloads.append((unit['url'], unit['path']))
+            download_units.append((i, j))
+
+    print(f'Downloading {len(downloads)} files...')
+    download_results = download_files(downloads, max_workers, session, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
     print('Download completed.')
-    reformat_binance_vision_kline_files('./output', './output/new_data.csv')
 
-    # concat the data to PATH_Binance_spot_BTCUSDT_Xm:
-    concat_files([PATH_Binance_spot_BTCUSDT_Xm, './output/new_data.csv'])
+    # reformat and append the data of the targets in parallel:
+    with ProcessPoolExecutor(max_workers=max_processes) as executor:
+        futures = {}
+        for i, target in enumerate(targets):
+            if journals[i] is None:
+                continue
+            units = [j for (k, j) in download_units if k == i]
+            target_results = [download_results[n] for n, (k, _) in enumerate(download_units) if k == i]
+            failed = mark_downloads(journals[i], units, target_results)
+            results[i]['failed_downloads'] = [result['url'] for result in failed]
+            store_path = get_store_path(target['path']) if target.get('store', False) else None
+            futures[i] = executor.submit(_apply_update_of_target, target['path'], store_path, target.get('resample', {}),
+                                         target.get('features', False))
+        for i, future in futures.items():
+            error = future.result()
+            if error is not None:
+                results[i]['status'] = 'failed'
+                results[i]['error'] = error
+            else:
+                results[i]['status'] = 'updated'
+
+    if os.path.exists(folder_path) and os.listdir(folder_path) == []:
+        os.rmdir(folder_path)
+    return results
+
+
+def repair_dataset(asset_pair: str, time_frame: str, dataset_path: str, max_workers: int = 8,
+                   folder_path: str = './repair', cache_dir: str = None, cache_max_bytes: int = None,
+                   max_processes: int = None) -> dict:
+    """
+    Finds the holes of a dataset (see verify_dataset.scan_dataset()), downloads the days and months that cover
+    the missing ranges (planned with plan_downloads()), and splices the missing rows back into place.
+    Duplicated rows are removed and out-of-order rows are sorted as well.
+    The index, the binary store and the feature store of the dataset (if they exist) are rebuilt afterwards.
+    The writer lock of the dataset (see dataset_lock.py) is held during the repair.
+    Compressed datasets (see compressed_dataset.py) can not be repaired (repair the csv dataset and convert it again).
+
+    Args:
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        dataset_path (str)
+        max_workers (int): number of concurrent downloads
+        folder_path (str): temporary folder for the downloaded files (gets deleted at the end)
+        cache_dir (str): folder of the download cache (None for no caching)
+        cache_max_bytes (int): size limit of the download cache (None for no limit)
+        max_processes (int): number of worker processes that reformat the downloaded files (None for one by one,
+                             see reformat_data.reformat_binance_vision_kline_files())
+    Returns:
+        dict: the report of scan_dataset() before the repair, with the additional key
+              'inserted_rows' = int (number of rows that were spliced into the dataset)
+    """
+    if is_compressed_dataset(dataset_path):
+        raise Exception(f'Error: {dataset_path} is a compressed dataset, only csv datasets can be repaired.')
+    with writer_lock(dataset_path, blocking=False):
+        return _repair_dataset(asset_pair, time_frame, dataset_path, max_workers, folder_path, cache_dir, cache_max_bytes,
+                               max_processes)
+
+
+def _repair_dataset(asset_pair: str, time_frame: str, dataset_path: str, max_workers: int, folder_path: str,
+                    cache_dir: str, cache_max_bytes: int, max_processes: int) -> dict:
+    """
+    Does the work of repair_dataset() (while the writer lock of the dataset is held).
+    """
+    report = scan_dataset(dataset_path, time_frame)
+    report['inserted_rows'] = 0
+    missing = report['missing']
+    if report['out_of_order']:
+        # out-of-order rows look like holes, so the missing ranges are calculated again after sorting:
+        sort_dataset(dataset_path)
+        missing = scan_dataset(dataset_path, time_frame)['missing']
+    if missing or report['duplicates'] or report['out_of_order']:
+        if not os.path.exists(folder_path):
+            os.makedirs(folder_path)
+
+        # the days of the missing ranges (days since 1970-01-01), planned all at once, so a month with many holes
+        # gets one monthly file:
+        day_ranges = [(start // 86400, end // 86400) for start, end in missing]
+        downloads = get_download_list(asset_pair, time_frame, plan_downloads(day_ranges, time_frame), folder_path)
+
+        print(f'Downloading {len(downloads)} files...')
+        for result in download_files(downloads, max_workers, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes):
+            if not result['ok']:
+                print(f"Could not download {result['url']}: {result['error']}")
+        reformat_binance_vision_kline_files(folder_path, folder_path + '/new_data.csv', max_processes)
+        report['inserted_rows'] = splice_rows(dataset_path, folder_path + '/new_data.csv', missing)
+        shutil.rmtree(folder_path)
+
+        # the dataset was rewritten, so its index, binary store and feature store have to be rebuilt:
+        if os.path.exists(get_index_path(dataset_path)):
+            build_index(dataset_path)
+        if os.path.exists(get_store_path(dataset_path)):
+            import_csv_to_store(dataset_path, get_store_path(dataset_path))
+        if os.path.exists(get_database_path(dataset_path)):
+            import_csv_to_database(dataset_path, get_database_path(dataset_path)) # adds the inserted rows (upsert)
+        if os.path.exists(get_feature_store_path(dataset_path)):
+            update_features(dataset_path) # rebuilds the store (the dataset is a new file)
+    print(f"{report['inserted_rows']} rows inserted into {dataset_path}.")
+    return report
+
+
+def print_scan_report(report: dict) -> None:
+    """
+    Prints the report of verify_dataset.scan_dataset() with UTC dates.
+    """
+    def utc(timestamp: int) -> str:
+        return timestamp_to_utc_datetime(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    print(f"Rows: {report['rows']}")
+    if report['rows'] > 0:
+        print(f"First row: {utc(report['first_timestamp'])}, last row: {utc(report['last_timestamp'])}")
+    print(f"Missing ranges: {len(report['missing'])}")
+    for start, end in report['missing']:
+        print(f'  {utc(start)} - {utc(end)}')
+    print(f"Duplicated timestamps: {len(report['duplicates'])}")
+    for timestamp in report['duplicates']:
+        print(f'  {utc(timestamp)}')
+    print(f"Out-of-order rows: {len(report['out_of_order'])}")
+    for row, timestamp in report['out_of_order']:
+        print(f'  row {row}: {utc(timestamp)}')
+
+
+def main(args: argparse.Namespace) -> None:
+    """
+    Runs the actions selected by the command line arguments (see the bottom of this file).
+    """
+    if args.status or args.plan:
+        # only reports (as json on stdout), nothing else is done:
+        if args.batch_config is not None:
+            targets = load_batch_config(args.batch_config)['targets']
+        else:
+            path = get_compressed_path(dataset_PATH) if args.compressed_dataset else dataset_PATH
+            targets = [{'asset_pair': 'BTCUSDT', 'time_frame': '5m', 'path': path}]
+        statuses = []
+        for target in targets:
+            try:
+                statuses.append(get_update_status(target['asset_pair'], target['time_frame'], target['path'], args.plan))
+            except Exception as e:
+                statuses.append({'asset_pair': target['asset_pair'], 'time_frame': target['time_frame'],
+                                 'path': target['path'], 'error': str(e)})
+        print(json.dumps(statuses, indent=4))
+        return
+
+    if args.build_index:
+        build_index(dataset_PATH)
+
+    if args.import_binary_store:
+        import_csv_to_store(dataset_PATH, get_store_path(dataset_PATH))
+
+    if args.compress_dataset:
+        import_csv_to_compressed(dataset_PATH, get_compressed_path(dataset_PATH))
+
+    cache_dir = default_cache_dir if args.download_cache else None
+    cache_max_bytes = args.cache_max_mb * 1024 * 1024 if args.cache_max_mb is not None else None
+
+    if args.verify_dataset:
+        print_scan_report(scan_dataset(dataset_PATH, '5m'))
+
+    if args.repair_dataset:
+        repair_dataset('BTCUSDT', '5m', dataset_PATH, args.max_workers if args.max_workers is not None else 8,
+                       cache_dir=cache_dir, cache_max_bytes=cache_max_bytes, max_processes=args.max_processes)
+
+    if args.update_dataset:
+        store_path = get_store_path(dataset_PATH) if args.binary_store else None
+        database_path = get_database_path(dataset_PATH) if args.sqlite else None
+        path = get_compressed_path(dataset_PATH) if args.compressed_dataset else dataset_PATH
+        update_my_btcusdt_data('5m', path, args.max_workers, store_path, cache_dir, cache_max_bytes,
+                               args.exact_decimals, database_path)
+
+    if args.update_features:
+        update_features(dataset_PATH)
+
+    if args.resample_time_frame is not None:
+        resample_dataset(dataset_PATH, './dataset-' + args.resample_time_frame + '.csv', args.resample_time_frame)
+
+    if args.batch_config is not None and not args.watch:
+        config = load_batch_config(args.batch_config)
+        max_workers = args.max_workers if args.max_workers is not None else config.get('max_workers', 8)
+        if cache_dir is None:
+            cache_dir = config.get('cache_dir', None)
+        if cache_max_bytes is None:
+            cache_max_bytes = config.get('cache_max_bytes', None)
+        max_processes = args.max_processes if args.max_processes is not None else config.get('max_processes', None)
+        results = update_datasets(config['targets'], max_workers, max_processes,
+                                  cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
+        for result in results:
+            print(f"{result['asset_pair']} {result['time_frame']} {result['path']}: {result['status']}" +
+                  (f" ({result['error']})" if result['error'] is not None else ''))
+
+    if args.watch:
+        from update_daemon import watch_datasets
+        if args.batch_config is not None:
+            config = load_batch_config(args.batch_config)
+            targets = config['targets']
+            max_workers = args.max_workers if args.max_workers is not None else config.get('max_workers', 8)
+            max_processes = args.max_processes if args.max_processes is not None else config.get('max_processes', None)
+            if cache_dir is None:
+                cache_dir = config.get('cache_dir', None)
+            if cache_max_bytes is None:
+                cache_max_bytes = config.get('cache_max_bytes', None)
+        else:
+            path = get_compressed_path(dataset_PATH) if args.compressed_dataset else dataset_PATH
+            targets = [{'asset_pair': 'BTCUSDT', 'time_frame': '5m', 'path': path, 'store': args.binary_store,
+                        'exact': args.exact_decimals, 'features': args.update_features, 'sqlite': args.sqlite}]
+            max_workers = args.max_workers if args.max_workers is not None else 8
+            max_processes = args.max_processes
+        watch_datasets(targets, args.poll_interval, max_workers=max_workers, max_processes=max_processes,
+                       cache_dir=cache_dir, cache_max_bytes=cache_max_bytes)
 
-    os.remove('./output/new_data.csv')
-    shutil.rmtree('./output')
-    print(f'New data appended to {str(PATH_Binance_spot_BTCUSDT_Xm)}.')
-    print(f'Dataset {str(PATH_Binance_spot_BTCUSDT_Xm)} is now up to date.')
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
 
+    parser.add_argument('-status','--status', action="store_true", help="Prints as json whether the dataset (or the datasets of -batch) is up to date, without updating anything.")
+    parser.add_argument('-plan','--plan', action="store_true", help="Like -status, but also prints the urls of the files that an update would download.")
     parser.add_argument('-update','--update_dataset', action="store_true", help="Updates Binance spot BTCUSDT 1m and 5m datasets.")
+    parser.add_argument('-batch','--batch_config', type=str, default=None, help="Updates all datasets listed in a json config file (see load_batch_config()).")
+    parser.add_argument('-watch','--watch', action="store_true", help="Stays resident and appends new daily files as soon as binance publishes them (the datasets of -batch, or the default dataset).")
+    parser.add_argument('-interval','--poll_interval', type=float, default=300, help="Seconds between two checks of -watch (default: 300, jittered by +-20%%).")
+    parser.add_argument('-workers','--max_workers', type=int, default=None, help="Number of concurrent downloads (default: sequential downloading).")
+    parser.add_argument('-processes','--max_processes', type=int, default=None, help="Number of worker processes that reformat the downloaded files of -repair, and that update the datasets of -batch and -watch (overrides max_processes of the batch config).")
+    parser.add_argument('-cache','--download_cache', action="store_true", help="Keeps the downloaded files in a verified download cache (./cache), so repeated or failed runs only download what is missing.")
+    parser.add_argument('-cache_size','--cache_max_mb', type=int, default=None, help="Size limit of the download cache in MB (least recently used files are evicted).")
+    parser.add_argument('-store','--binary_store', action="store_true", help="Also appends the new data to the binary store of the dataset (e.g., dataset-5m.bin).")
+    parser.add_argument('-sqlite','--sqlite', action="store_true", help="Also writes the new data into the SQLite database of the dataset (e.g., dataset-5m.sqlite), which is created from the csv file if it does not exist.")
+    parser.add_argument('-index','--build_index', action="store_true", help="Builds the timestamp index of the csv dataset (e.g., dataset-5m.csv.idx), which is then updated on every update.")
+    parser.add_argument('-exact','--exact_decimals', action="store_true", help="Copies the prices with the exact digits of binance (e.g., 42580.00000000 instead of 42580.0), which is also faster.")
+    parser.add_argument('-verify','--verify_dataset', action="store_true", help="Reports missing ranges, duplicated and out-of-order rows of the dataset.")
+    parser.add_argument('-repair','--repair_dataset', action="store_true", help="Downloads the missing ranges of the dataset and splices them into place.")
+    parser.add_argument('-resample','--resample_time_frame', type=str, default=None, help="Builds (or updates) a coarser time frame from the dataset (e.g., -resample 1h creates dataset-1h.csv).")
+    parser.add_argument('-features','--update_features', action="store_true", help="Calculates the features of the new rows of the dataset (returns, rolling mean, volatility, vwap proxy) into dataset-5m.features (see feature_store.py).")
+    parser.add_argument('-compress','--compress_dataset', action="store_true", help="Converts the csv dataset into a compressed dataset with one gzip frame per month (e.g., dataset-5m.csv -> dataset-5m.csv.gz, see compressed_dataset.py).")
+    parser.add_argument('-compressed','--compressed_dataset', action="store_true", help="-update, -watch, -status and -plan use the compressed dataset (e.g., dataset-5m.csv.gz) instead of the csv dataset.")
+    parser.add_argument('-import_store','--import_binary_store', action="store_true", help="Converts the csv dataset into a binary store (e.g., dataset-5m.csv -> dataset-5m.bin).")
+    parser.add_argument('-metrics','--metrics_file', type=str, default=None, help="Writes the metrics records (json lines, see metrics.py) to this file instead of stderr ('off' for no metrics).")
+    parser.add_argument('-profile','--profile', action="store_true", help="Runs under cProfile and prints the slowest functions (the raw profile is saved in ./update.prof).")
 
     args = parser.parse_args()
-    
-    if args.update_dataset:
-        update_my_btcusdt_data('5m', dataset_PATH)
+
+    # the metrics records (see metrics.py) are written to stderr unless they go to a file or are turned off:
+    metrics_file = None
+    if args.metrics_file is None:
+        add_hook(create_json_log_hook())
+    elif args.metrics_file != 'off':
+        metrics_file = open(args.metrics_file, 'a')
+        add_hook(create_json_log_hook(metrics_file))
+
+    try:
+        if args.profile:
+            run_profiled(main, args, output_path='./update.prof')
+        else:
+            main(args)
+    finally:
+        if metrics_file is not None:
+            metrics_file.close()
@@ -0,0 +1,113 @@
+"""
+A persistent journal of the update of a dataset, so that an interrupted update can be resumed.
+
+The journal of './dataset-5m.csv' is stored in './dataset-5m.csv.journal' (json). It contains the planned files
+(units) of the update and the state of every unit:
+planned -> downloaded -> verified -> reformatted -> appended
+A unit is 'verified' when its zip file passed the CRC check, and 'reformatted' when its data was written to
+a reformated csv file next to the zip file. Before a unit gets appended, the size of the dataset (and the length of
+its binary store) is recorded, so a resumed update can tell whether the append of the unit was completed.
+The journal gets deleted when all units are appended.
+"""
+
+import os
+import json
+import threading
+
+states: list[str] = ['planned', 'downloaded', 'verified', 'reformatted', 'appended']
+
+_lock = threading.RLock()
+
+
+def get_journal_path(dataset_path: str) -> str:
+    """
+    Returns the path of the journal of a dataset (e.g., './dataset-5m.csv' -> './dataset-5m.csv.journal').
+    """
+    return dataset_path + '.journal'
+
+
+def save_journal(journal: dict) -> None:
+    """
+    Writes the journal atomically (a crash while saving leaves the previous version of the journal).
+    """
+    journal_path = get_journal_path(journal['dataset_path'])
+    with _lock:
+        with open(journal_path + '.tmp', 'w') as journal_file:
+            json.dump(journal, journal_file, indent=1)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        os.replace(journal_path + '.tmp', journal_path)
+
+
+def create_journal(dataset_path: str, asset_pair: str, time_frame: str, folder_path: str,
+                   downloads: list[tuple[str, str]], exact: bool = False, database_path: str = None) -> dict:
+    """
+    Creates (and saves) the journal of a new update.
+
+    Args:
+        dataset_path (str)
+        asset_pair (str): e.g., 'BTCUSDT'
+        time_frame (str): e.g., '1m'
+        folder_path (str): folder of the downloaded files
+        downloads (list[tuple[str, str]]): the planned files as (url, download_path), in the order of appending
+        exact (bool): reformat the files with reformat_data.reformat_binance_vision_kline_file_exact()
+        database_path (str): SQLite database that gets the appended rows too (see sqlite_sink.py)
+    Returns:
+        dict: {
+            'dataset_path' = str
+            'asset_pair' = str
+            'time_frame' = str
+            'folder_path' = str
+            'exact' = bool
+            'database_path' = str or None
+            'units' = [{'url': str, 'path': str, 'state': str, 'csv_path': str or None, 'base_size': int or None}]
+        }
+    """
+    journal = {
+        'dataset_path': dataset_path,
+        'asset_pair': asset_pair,
+        'time_frame': time_frame,
+        'folder_path': folder_path,
+        'exact': exact,
+        'database_path': database_path,
+        'units': [{'url': url, 'path': path, 'state': 'planned', 'csv_path': None, 'base_size': None}
+                  for url, path in downloads],
+    }
+    save_journal(journal)
+    return journal
+
+
+def load_journal(dataset_path: str):
+    """
+    Loads the journal of a dataset.
+
+    Returns:
+        dict (see create_journal()) or None if the dataset has no journal
+    """
+    journal_path = get_journal_path(dataset_path)
+    if not os.path.exists(journal_path):
+        return None
+    with open(journal_path, 'r') as journal_file:
+        return json.load(journal_file)
+
+
+def set_unit_state(journal: dict, i: int, state: str, **fields) -> None:
+    """
+    Sets the state (and optionally other fields, e.g., csv_path) of the unit number :param i and saves the journal.
+    """
+    if state not in states:
+        raise Exception(f'Error: Unknown state {state}.')
+    # the units can be updated by several threads (see update_dataset.run_update_pipeline()):
+    with _lock:
+        journal['units'][i]['state'] = state
+        journal['units'][i].update(fields)
+        save_journal(journal)
+
+
+def delete_journal(dataset_path: str) -> None:
+    """
+    Deletes the journal of a dataset (after all units are appended).
+    """
+    journal_path = get_journal_path(dataset_path)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
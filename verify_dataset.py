@@ -0,0 +1,165 @@
+"""
+Some functions for finding and repairing holes in the datasets (unix in seconds, open, high, low, close).
+
+The updater only looks at the last row of a dataset, so holes inside the history (e.g., a day that could not be
+downloaded, or an exchange outage) would go unnoticed. scan_dataset() finds missing ranges, duplicated and
+out-of-order rows, and splice_rows() merges downloaded rows back into place.
+The repairing itself (downloading the missing data) is done by update_dataset.repair_dataset().
+"""
+
+import os
+import bisect
+import heapq
+import itertools
+from datetime_utils import time_frame_to_seconds
+from dataset_lock import commit_length
+
+
+def scan_dataset(file_path: str, time_frame: str, chunk_rows: int = 1_000_000) -> dict:
+    """
+    Scans the timestamp column of a dataset in chunks of :param chunk_rows rows and checks the spacing of the
+    timestamps (vectorized) against the spacing of :param time_frame.
+
+    Args:
+        file_path (str)
+        time_frame (str): e.g., '1m'
+        chunk_rows (int)
+    Returns:
+        dict: {
+            'rows' = int
+            'first_timestamp' = int or None
+            'last_timestamp' = int or None
+            'missing' = [(first missing timestamp, last missing timestamp)]
+            'duplicates' = [timestamp] (timestamps that appear more than once)
+            'out_of_order' = [(row number, timestamp)] (rows with a smaller timestamp than the row before)
+        }
+    """
+    import numpy as np
+    import pandas as pd
+
+    step = time_frame_to_seconds(time_frame)
+    report = {'rows': 0, 'first_timestamp': None, 'last_timestamp': None,
+              'missing': [], 'duplicates': [], 'out_of_order': []}
+    if os.path.getsize(file_path) == 0:
+        return report
+
+    previous = None # last timestamp of the previous chunk
+    chunks = pd.read_csv(file_path, header=None, usecols=[0], dtype={0: 'int64'}, chunksize=chunk_rows)
+    for chunk in chunks:
+        timestamps = chunk[0].to_numpy()
+        if previous is None:
+            report['first_timestamp'] = int(timestamps[0])
+        else:
+            timestamps = np.concatenate([[previous], timestamps])
+        # row number of timestamps[0]:
+        first_row = report['rows'] - (1 if previous is not None else 0)
+
+        diffs = np.diff(timestamps)
+        for i in np.flatnonzero(diffs > step):
+            report['missing'].append((int(timestamps[i]) + step, int(timestamps[i + 1]) - step))
+        for i in np.flatnonzero(diffs == 0):
+            report['duplicates'].append(int(timestamps[i]))
+        for i in np.flatnonzero(diffs < 0):
+            report['out_of_order'].append((first_row + int(i) + 1, int(timestamps[i + 1])))
+
+        report['rows'] += len(chunk)
+        previous = int(timestamps[-1])
+    report['last_timestamp'] = previous
+    return report
+
+
+def splice_rows(file_path: str, new_rows_path: str, ranges: list[tuple[int, int]] = None) -> int:
+    """
+    Merges the rows of :param new_rows_path into the dataset :param file_path, ordered by timestamp.
+    Both files must be sorted by timestamp. Rows with a timestamp that already exists are dropped (the first row
+    is kept, so the rows of the dataset win), which also removes duplicated rows of the dataset.
+    The merge is streamed into a temporary file that replaces the dataset at the end, so the memory usage is constant
+    and the dataset is never left half-written.
+
+    Args:
+        file_path (str)
+        new_rows_path (str)
+        ranges (list[tuple[int, int]]): if given, only new rows inside these (first timestamp, last timestamp) ranges are used
+    Returns:
+        int: number of inserted rows
+    """
+    starts = [start for start, _ in ranges] if ranges is not None else None
+
+    def in_ranges(timestamp: int) -> bool:
+        if ranges is None:
+            return True
+        i = bisect.bisect_right(starts, timestamp) - 1
+        return i >= 0 and timestamp <= ranges[i][1]
+
+    def rows(file, is_new: bool):
+        for line in file:
+            if line.strip() == '':
+                continue
+            if not line.endswith('\n'):
+                line += '\n'
+            timestamp = int(line.split(',', 1)[0])
+            if not is_new or in_ranges(timestamp):
+                yield timestamp, is_new, line
+
+    inserted = 0
+    with open(file_path, 'r') as file, open(new_rows_path, 'r') as new_rows, open(file_path + '.tmp', 'w') as output:
+        previous = None
+        # for equal timestamps, heapq.merge() yields the rows of the dataset first (is_new=False):
+        for timestamp, is_new, line in heapq.merge(rows(file, False), rows(new_rows, True)):
+            if timestamp == previous:
+                continue
+            output.write(line)
+            inserted += is_new
+            previous = timestamp
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(file_path + '.tmp', file_path)
+    commit_length(file_path)
+    return inserted
+
+
+def _get_timestamp(line: str) -> int:
+    return int(line.split(',', 1)[0])
+
+
+def sort_dataset(file_path: str, chunk_rows: int = 1_000_000) -> None:
+    """
+    Sorts the rows of a dataset by timestamp (stable, so the first of several rows with the same timestamp stays first).
+    This is only needed if scan_dataset() found out-of-order rows. Runs of :param chunk_rows rows are sorted in memory
+    and written to temporary files, which are then merged like in splice_rows(), so the memory usage does not depend
+    on the size of the dataset.
+
+    Args:
+        file_path (str)
+        chunk_rows (int)
+    Returns:
+        None
+    """
+    run_paths = []
+    try:
+        with open(file_path, 'r') as file:
+            while True:
+                chunk = list(itertools.islice(file, chunk_rows))
+                if not chunk:
+                    break
+                lines = [line if line.endswith('\n') else line + '\n' for line in chunk if line.strip() != '']
+                lines.sort(key=_get_timestamp)
+                run_paths.append(f'{file_path}.{len(run_paths)}.tmp')
+                with open(run_paths[-1], 'w') as run:
+                    run.writelines(lines)
+
+        runs = [open(run_path, 'r') for run_path in run_paths]
+        try:
+            with open(file_path + '.tmp', 'w') as output:
+                # for equal timestamps, heapq.merge() yields the rows of the earlier runs first:
+                output.writelines(heapq.merge(*runs, key=_get_timestamp))
+                output.flush()
+                os.fsync(output.fileno())
+        finally:
+            for run in runs:
+                run.close()
+    finally:
+        for run_path in run_paths:
+            os.remove(run_path)
+    os.replace(file_path + '.tmp', file_path)
+    commit_length(file_path)